@@ -0,0 +1,17 @@
+-- ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+--
+-- Trigram index for the admin user search (GET /admin/users?search=...).
+-- Serves ILIKE '%term%' and word_similarity() ranking over the lowercased
+-- "email first_name last_name" expression used by crud.users.user_search_filter.
+-- The expression must stay identical to models.user.user_search_text for Postgres to use the index.
+-- Fresh installs get the extension and index from the SQLAlchemy models.
+--
+-- CONCURRENTLY avoids locking users against writes, but cannot run inside a transaction block.
+--
+-- Rollback:
+--   DROP INDEX CONCURRENTLY IF EXISTS ix_users_search_trgm;
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_search_trgm
+    ON users USING gin (lower(email || ' ' || first_name || ' ' || last_name) gin_trgm_ops);
@@ -0,0 +1,31 @@
+-- ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+--
+-- Rate limit state for RATE_LIMIT_BACKEND=postgres: one GCRA theoretical arrival time (tat,
+-- epoch seconds) per (bucket, key).
+-- Note: The table is also created from the SQLAlchemy model on startup for fresh installs.
+--
+-- UNLOGGED: writes skip the WAL, and the contents are lost on a crash (which only resets quotas).
+-- A rate_limits table with the former per-hit layout (hits, expires_at) only holds short-lived
+-- quota state: it is dropped and recreated empty.
+-- Idempotent.
+--
+-- Rollback: DROP TABLE IF EXISTS rate_limits;
+
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'rate_limits' AND column_name = 'hits'
+    ) THEN
+        DROP TABLE rate_limits;
+    END IF;
+END $$;
+
+CREATE UNLOGGED TABLE IF NOT EXISTS rate_limits (
+    bucket VARCHAR NOT NULL,
+    key VARCHAR NOT NULL,
+    tat FLOAT NOT NULL,
+    PRIMARY KEY (bucket, key)
+);
+
+CREATE INDEX IF NOT EXISTS ix_rate_limits_tat ON rate_limits(tat);
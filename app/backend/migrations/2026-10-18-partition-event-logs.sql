@@ -0,0 +1,76 @@
+-- ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+--
+-- Convert event_logs (created by 2025-12-30-create-event-logs.sql) into a table range-partitioned
+-- by month on created_at. Fresh installs get the partitioned table from the SQLAlchemy model.
+-- Upcoming partitions are then created by the event log maintenance task, which also applies
+-- EVENT_LOG_RETENTION_MONTHS by dropping (or detaching) whole partitions.
+--
+-- The table is locked while existing rows are copied: run during a quiet period.
+-- Idempotent: does nothing if event_logs is already partitioned.
+--
+-- Rollback (after stopping the backend):
+--   BEGIN;
+--   ALTER SEQUENCE event_logs_id_seq OWNED BY NONE;
+--   DROP TABLE event_logs;
+--   ALTER TABLE event_logs_unpartitioned RENAME TO event_logs;
+--   ALTER SEQUENCE event_logs_id_seq OWNED BY event_logs.id;
+--   (rename the *_unpartitioned indexes back, dropping the suffix)
+--   COMMIT;
+--
+-- Once the new table is verified: DROP TABLE event_logs_unpartitioned;
+
+BEGIN;
+
+DO $$
+DECLARE
+    month_start DATE;
+    last_month DATE;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = to_regclass('event_logs')) IS DISTINCT FROM 'r' THEN
+        RAISE NOTICE 'event_logs is missing or already partitioned, skipping';
+        RETURN;
+    END IF;
+
+    LOCK TABLE event_logs IN ACCESS EXCLUSIVE MODE;
+
+    -- Keep the old table (and its indexes) under new names until the copy is verified
+    ALTER TABLE event_logs RENAME TO event_logs_unpartitioned;
+    ALTER INDEX IF EXISTS event_logs_pkey RENAME TO event_logs_unpartitioned_pkey;
+    ALTER INDEX IF EXISTS ix_event_logs_user_id RENAME TO ix_event_logs_unpartitioned_user_id;
+    ALTER INDEX IF EXISTS ix_event_logs_action RENAME TO ix_event_logs_unpartitioned_action;
+    ALTER INDEX IF EXISTS ix_event_logs_created_at RENAME TO ix_event_logs_unpartitioned_created_at;
+    ALTER INDEX IF EXISTS idx_event_logs_user_created RENAME TO idx_event_logs_unpartitioned_user_created;
+
+    UPDATE event_logs_unpartitioned SET created_at = NOW() WHERE created_at IS NULL;
+
+    -- Same columns, types and defaults (including the id sequence); the partition key must be in the primary key
+    CREATE TABLE event_logs (LIKE event_logs_unpartitioned INCLUDING DEFAULTS) PARTITION BY RANGE (created_at);
+    ALTER TABLE event_logs ALTER COLUMN created_at SET NOT NULL;
+    ALTER TABLE event_logs ADD PRIMARY KEY (id, created_at);
+    ALTER TABLE event_logs ADD FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL;
+    ALTER SEQUENCE event_logs_id_seq OWNED BY event_logs.id;
+
+    -- Indexes on the parent are created on every partition
+    CREATE INDEX ix_event_logs_user_id ON event_logs(user_id);
+    CREATE INDEX ix_event_logs_action ON event_logs(action);
+    CREATE INDEX ix_event_logs_created_at ON event_logs(created_at);
+    CREATE INDEX idx_event_logs_user_created ON event_logs(user_id, created_at DESC);
+
+    -- One partition per month from the oldest event to 3 months ahead, plus a default partition
+    SELECT date_trunc('month', COALESCE(MIN(created_at), NOW()))::DATE INTO month_start FROM event_logs_unpartitioned;
+    last_month := (date_trunc('month', NOW()) + INTERVAL '3 months')::DATE;
+    WHILE month_start <= last_month LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF event_logs FOR VALUES FROM (%L) TO (%L)',
+            'event_logs_' || to_char(month_start, 'YYYY_MM'),
+            month_start,
+            (month_start + INTERVAL '1 month')::DATE
+        );
+        month_start := (month_start + INTERVAL '1 month')::DATE;
+    END LOOP;
+    CREATE TABLE event_logs_default PARTITION OF event_logs DEFAULT;
+
+    INSERT INTO event_logs SELECT * FROM event_logs_unpartitioned;
+END $$;
+
+COMMIT;
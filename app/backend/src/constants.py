@@ -27,6 +27,13 @@ PASSWORD_MIN_LENGTH = 8
 # Stripe
 STRIPE_WEBHOOK_SECRET = os.environ.get("STRIPE_WEBHOOK_SECRET", "")
 
+# Event log partitioning (event_logs is partitioned by month on created_at)
+# Months of partitions created ahead of time, and months of history kept (0 = keep forever)
+EVENT_LOG_PARTITIONS_AHEAD = int(os.environ.get("EVENT_LOG_PARTITIONS_AHEAD") or 3)
+EVENT_LOG_RETENTION_MONTHS = int(os.environ.get("EVENT_LOG_RETENTION_MONTHS") or 0)
+# Detach expired partitions (keeping them as standalone tables for archiving) instead of dropping them
+EVENT_LOG_RETENTION_DETACH = (os.environ.get("EVENT_LOG_RETENTION_DETACH") or "false").lower() == "true"
+
 # Event log types - core events managed by starterpack
 # Projects can extend by creating src/events.py with custom event types
 
@@ -49,6 +56,8 @@ class EventType(StrEnum):
     ADMIN_IMPERSONATE_STOP = "admin.impersonate_stop"
     ADMIN_USER_UPDATE = "admin.user_update"
     ADMIN_USER_DELETE = "admin.user_delete"
+    ADMIN_BROADCAST_CREATE = "admin.broadcast_create"
+    ADMIN_BROADCAST_CANCEL = "admin.broadcast_cancel"
 
 
 # Metadata for event types (labels and categories for UI)
@@ -65,4 +74,6 @@ CORE_EVENT_TYPES = {
     EventType.ADMIN_IMPERSONATE_STOP: {"label": "Impersonation Stopped", "category": "admin"},
     EventType.ADMIN_USER_UPDATE: {"label": "User Updated by Admin", "category": "admin"},
     EventType.ADMIN_USER_DELETE: {"label": "User Deleted by Admin", "category": "admin"},
+    EventType.ADMIN_BROADCAST_CREATE: {"label": "Broadcast Created", "category": "admin"},
+    EventType.ADMIN_BROADCAST_CANCEL: {"label": "Broadcast Cancelled", "category": "admin"},
 }
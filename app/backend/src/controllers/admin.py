@@ -1,31 +1,82 @@
 # ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
 
 """
-Admin controller for user management, impersonation, and event logs.
+Admin controller for user management, impersonation, event logs, and newsletter broadcasts.
 """
 
-from typing import Any
+import os
+import re
+from typing import Any, Literal
 
+from anyio import to_thread
 from fastapi import APIRouter, Depends, HTTPException, Request, status
-from sqlalchemy import func
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from ..constants import EventType
-from ..crud.event_logs import get_events, get_user_events, log_event
-from ..crud.users import delete_user, get_user_by_id, update_user
-from ..helpers.auth import create_access_token, get_current_admin, get_real_admin_id
-from ..helpers.db import get_session
+from ..crud.broadcasts import cancel_broadcast, create_broadcast, get_broadcast, get_broadcasts
+from ..crud.event_logs import (
+    count_events,
+    count_events_async,
+    get_events_after,
+    get_events_after_async,
+    get_events_async,
+    get_recent_events,
+    get_user_events,
+    log_event,
+)
+from ..crud.users import (
+    count_users_capped_async,
+    delete_user,
+    estimate_user_count_async,
+    get_user_by_exact_email_async,
+    get_user_by_id,
+    get_user_counts,
+    update_user,
+    user_search_filter,
+    user_search_rank,
+)
+from ..helpers.auth import create_access_token, get_current_admin, get_real_admin_id, token_cache
+from ..helpers.cache import TTLCache
+from ..helpers.db import get_async_read_session, get_pool_stats, get_read_session, get_session
+from ..helpers.email import broadcast_template_exists
+from ..helpers.email_outbox import email_outbox_worker
+from ..helpers.event_log_buffer import EVENT_LOG_BUFFERED, event_log_buffer
+from ..helpers.last_seen import last_seen_tracker
+from ..helpers.pagination import decode_cursor, encode_cursor
+from ..helpers.password_hashing import password_hasher
+from ..helpers.ratelimit import RateLimit, get_rate_limit_stats
+from ..helpers.stripe import get_stripe_stats
+from ..helpers.stripe_webhooks import stripe_webhook_worker
+from ..helpers.token_revocation import revoke_user_tokens, token_revocations
 from ..models.admin import (
     AdminDashboardStats,
+    AdminSystemStats,
     AdminUserListResponse,
     AdminUserRead,
     AdminUserUpdate,
     ImpersonationResponse,
 )
-from ..models.event_log import EventLogFilter, EventLogListResponse
+from ..models.broadcast import BroadcastCreate, BroadcastRead
+from ..models.event_log import EventLogCursorPage, EventLogFilter, EventLogListResponse
 from ..models.user import UserBase, UserRead
 
-router = APIRouter(prefix="/admin")
+# Rate limit for every admin endpoint (per admin user)
+ADMIN_RATE_LIMIT_PER_MINUTE = 300
+
+router = APIRouter(
+    prefix="/admin",
+    dependencies=[Depends(RateLimit("admin", quota=ADMIN_RATE_LIMIT_PER_MINUTE, key="user"))],
+)
+
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+$")
+
+# Filtered user counts stop at this many rows in `estimate` totals mode
+USER_COUNT_ESTIMATE_CAP = 1000
+
+DASHBOARD_CACHE_TTL_SECONDS = 30
+dashboard_cache = TTLCache(ttl=DASHBOARD_CACHE_TTL_SECONDS, maxsize=1)
 
 
 # ============================================================================
@@ -36,22 +87,50 @@ router = APIRouter(prefix="/admin")
 @router.get("/dashboard", response_model=AdminDashboardStats)
 def get_dashboard_stats(
     *,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
+    admin: UserRead = Depends(get_current_admin),
+):
+    """
+    Get dashboard statistics.
+    Cached for DASHBOARD_CACHE_TTL_SECONDS; admin user updates and deletions invalidate the cache.
+    """
+    stats = dashboard_cache.get("stats")
+    if stats is None:
+        counts = get_user_counts(session)
+        stats = AdminDashboardStats(
+            total_users=counts["total"],
+            admin_users=counts["admins"],
+            premium_users=counts["premium"],
+            recent_events=get_recent_events(session, limit=10),
+        )
+        dashboard_cache.set("stats", stats)
+    return stats
+
+
+@router.get("/system", response_model=AdminSystemStats)
+async def get_system_stats(
+    *,
     admin: UserRead = Depends(get_current_admin),
 ):
-    """Get dashboard statistics."""
-    total_users = session.query(func.count(UserBase.id)).scalar()
-    admin_users = session.query(func.count(UserBase.id)).filter(UserBase.is_admin).scalar()
-    premium_users = session.query(func.count(UserBase.id)).filter(UserBase.is_premium).scalar()
-
-    # Get recent events
-    recent_events, _ = get_events(session, limit=10)
-
-    return AdminDashboardStats(
-        total_users=total_users,
-        admin_users=admin_users,
-        premium_users=premium_users,
-        recent_events=recent_events,
+    """
+    Get runtime statistics for the worker serving this request.
+    Use it to size DB pools against threadpool tokens and the number of uvicorn workers.
+    """
+    limiter = to_thread.current_default_thread_limiter()
+
+    return AdminSystemStats(
+        pid=os.getpid(),
+        db_pools=get_pool_stats(),
+        threadpool={"total_tokens": limiter.total_tokens, "borrowed_tokens": limiter.borrowed_tokens},
+        event_log_buffer={"enabled": EVENT_LOG_BUFFERED, **event_log_buffer.stats()},
+        rate_limit=get_rate_limit_stats(),
+        password_hashing=password_hasher.stats(),
+        token_cache=token_cache.stats(),
+        token_revocations=token_revocations.stats(),
+        last_seen=last_seen_tracker.stats(),
+        email_outbox=email_outbox_worker.stats(),
+        stripe_webhooks=stripe_webhook_worker.stats(),
+        stripe_calls=get_stripe_stats(),
     )
 
 
@@ -61,26 +140,26 @@ def get_dashboard_stats(
 
 
 @router.get("/users", response_model=AdminUserListResponse)
-def list_users(
+async def list_users(
     *,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_read_session),
     admin: UserRead = Depends(get_current_admin),
     search: str | None = None,
     is_admin: bool | None = None,
     is_premium: bool | None = None,
     limit: int = 50,
     offset: int = 0,
+    total_mode: Literal["exact", "estimate"] = "exact",
 ):
-    """List all users with optional search and filters."""
-    query = session.query(UserBase)
-
-    if search:
-        search_pattern = f"%{search}%"
-        query = query.filter(
-            (UserBase.email.ilike(search_pattern))
-            | (UserBase.first_name.ilike(search_pattern))
-            | (UserBase.last_name.ilike(search_pattern))
-        )
+    """
+    List all users with optional search and filters.
+    Search is a case-insensitive substring match on email and name, ranked by similarity;
+    an exact email returns that user alone.
+    With `total_mode=estimate`, the unfiltered total comes from planner statistics and
+    filtered totals are capped at USER_COUNT_ESTIMATE_CAP (see `total_kind` in the response).
+    """
+    query = select(UserBase)
+    is_filtered = bool(search) or is_admin is not None or is_premium is not None
 
     if is_admin is not None:
         query = query.filter(UserBase.is_admin == is_admin)
@@ -88,12 +167,42 @@ def list_users(
     if is_premium is not None:
         query = query.filter(UserBase.is_premium == is_premium)
 
-    total = query.count()
-    users = query.order_by(UserBase.created_at.desc()).offset(offset).limit(limit).all()
+    if search and EMAIL_PATTERN.match(search.strip()):
+        # Exact email fast path: a unique index lookup instead of a fuzzy search
+        user = await get_user_by_exact_email_async(session, query, search)
+        if user:
+            return AdminUserListResponse(
+                items=[AdminUserRead.model_validate(user)] if offset == 0 else [],
+                total=1,
+                limit=limit,
+                offset=offset,
+            )
+
+    order_by = [UserBase.created_at.desc()]
+    if search:
+        query = query.filter(user_search_filter(search))
+        order_by.insert(0, user_search_rank(search).desc())
+
+    total = None
+    total_kind = "exact"
+    if total_mode == "estimate":
+        if is_filtered:
+            total, capped = await count_users_capped_async(session, query, USER_COUNT_ESTIMATE_CAP)
+            total_kind = "lower_bound" if capped else "exact"
+        else:
+            # Small tables are cheap to count exactly, and their statistics may lag behind
+            estimate = await estimate_user_count_async(session)
+            if estimate is not None and estimate >= USER_COUNT_ESTIMATE_CAP:
+                total, total_kind = estimate, "estimate"
+    if total is None:
+        total = await session.scalar(select(func.count()).select_from(query.subquery()))
+
+    users = await session.scalars(query.order_by(*order_by).offset(offset).limit(limit))
 
     return AdminUserListResponse(
         items=[AdminUserRead.model_validate(u) for u in users],
         total=total,
+        total_kind=total_kind,
         limit=limit,
         offset=offset,
     )
@@ -102,7 +211,7 @@ def list_users(
 @router.get("/users/{user_id}", response_model=AdminUserRead)
 def get_user_detail(
     *,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
     admin: UserRead = Depends(get_current_admin),
     user_id: int,
 ):
@@ -151,6 +260,11 @@ def update_user_by_admin(
         user.is_premium = user_update.is_premium
 
     update_user(session, user)
+    dashboard_cache.invalidate()
+
+    # Tokens carry is_admin: revoke them on demotion
+    if changes.get("is_admin", {}).get("from") and not user.is_admin:
+        revoke_user_tokens(session, user_id)
 
     # Log the admin action
     log_event(
@@ -185,16 +299,19 @@ def delete_user_by_admin(
 
     user_email = user.email
 
-    # Log before deletion (so we have the user_id)
+    # Log before deletion (so we have the user_id), unbuffered: the row must exist before the user is deleted
     log_event(
         session,
         action=EventType.ADMIN_USER_DELETE,
         user_id=user_id,
         details={"deleted_email": user_email},
         request=request,
+        buffered=False,
     )
 
     delete_user(session, user)
+    revoke_user_tokens(session, user_id)
+    dashboard_cache.invalidate()
 
 
 # ============================================================================
@@ -288,25 +405,42 @@ def stop_impersonation(
 # ============================================================================
 
 
-@router.get("/events", response_model=EventLogListResponse)
-def list_events(
+@router.get("/events", response_model=EventLogListResponse | EventLogCursorPage)
+async def list_events(
     *,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_read_session),
     admin: UserRead = Depends(get_current_admin),
     user_id: int | None = None,
     action: str | None = None,
     action_prefix: str | None = None,
     limit: int = 50,
     offset: int = 0,
+    pagination: Literal["offset", "cursor"] = "offset",
+    cursor: str | None = None,
+    include_total: bool = False,
 ):
-    """List event logs with optional filtering."""
+    """
+    List event logs with optional filtering.
+    Cursor mode (`pagination=cursor`, or any `cursor`) pages on (created_at, id) and
+    only counts matching events when `include_total` is set.
+    """
     filters = EventLogFilter(
         user_id=user_id,
         action=action,
         action_prefix=action_prefix,
     )
 
-    events, total = get_events(session, filters=filters, limit=limit, offset=offset)
+    if pagination == "cursor" or cursor:
+        after = decode_cursor(cursor) if cursor else None
+        events, next_after = await get_events_after_async(session, filters=filters, limit=limit, after=after)
+        return EventLogCursorPage(
+            items=events,
+            has_more=next_after is not None,
+            next_cursor=encode_cursor(*next_after) if next_after else None,
+            total=await count_events_async(session, filters) if include_total else None,
+        )
+
+    events, total = await get_events_async(session, filters=filters, limit=limit, offset=offset)
 
     return EventLogListResponse(
         items=events,
@@ -316,16 +450,30 @@ def list_events(
     )
 
 
-@router.get("/users/{user_id}/events", response_model=EventLogListResponse)
+@router.get("/users/{user_id}/events", response_model=EventLogListResponse | EventLogCursorPage)
 def get_user_event_log(
     *,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
     admin: UserRead = Depends(get_current_admin),
     user_id: int,
     limit: int = 50,
     offset: int = 0,
+    pagination: Literal["offset", "cursor"] = "offset",
+    cursor: str | None = None,
+    include_total: bool = False,
 ):
-    """Get event log for a specific user."""
+    """Get event log for a specific user. Supports cursor mode like list_events."""
+    if pagination == "cursor" or cursor:
+        filters = EventLogFilter(user_id=user_id)
+        after = decode_cursor(cursor) if cursor else None
+        events, next_after = get_events_after(session, filters=filters, limit=limit, after=after)
+        return EventLogCursorPage(
+            items=events,
+            has_more=next_after is not None,
+            next_cursor=encode_cursor(*next_after) if next_after else None,
+            total=count_events(session, filters) if include_total else None,
+        )
+
     events, total = get_user_events(session, user_id=user_id, limit=limit, offset=offset)
 
     return EventLogListResponse(
@@ -334,3 +482,89 @@ def get_user_event_log(
         limit=limit,
         offset=offset,
     )
+
+
+# ============================================================================
+# Broadcasts
+# ============================================================================
+
+
+@router.post("/broadcasts", response_model=BroadcastRead, status_code=status.HTTP_201_CREATED)
+def create_newsletter_broadcast(
+    *,
+    session: Session = Depends(get_session),
+    request: Request,
+    admin: UserRead = Depends(get_current_admin),
+    broadcast_create: BroadcastCreate,
+):
+    """
+    Send a broadcast template to every user with the newsletter on.
+    It is sent in the background: poll GET /admin/broadcasts/{id} for progress.
+    """
+    if not broadcast_template_exists(broadcast_create.template):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unknown broadcast template")
+
+    broadcast = create_broadcast(
+        session, template=broadcast_create.template, subject=broadcast_create.subject, created_by=admin.id
+    )
+
+    log_event(
+        session,
+        action=EventType.ADMIN_BROADCAST_CREATE,
+        user_id=admin.id,
+        details={"broadcast_id": broadcast.id, "template": broadcast.template, "subject": broadcast.subject},
+        request=request,
+    )
+
+    return BroadcastRead.model_validate(broadcast)
+
+
+@router.get("/broadcasts", response_model=list[BroadcastRead])
+def list_broadcasts(
+    *,
+    session: Session = Depends(get_read_session),
+    admin: UserRead = Depends(get_current_admin),
+):
+    """List the 50 most recent broadcasts and their progress."""
+    return [BroadcastRead.model_validate(broadcast) for broadcast in get_broadcasts(session)]
+
+
+@router.get("/broadcasts/{broadcast_id}", response_model=BroadcastRead)
+def get_broadcast_detail(
+    *,
+    session: Session = Depends(get_read_session),
+    admin: UserRead = Depends(get_current_admin),
+    broadcast_id: int,
+):
+    """Get a broadcast and its progress."""
+    broadcast = get_broadcast(session, broadcast_id)
+    if not broadcast:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Broadcast not found")
+    return BroadcastRead.model_validate(broadcast)
+
+
+@router.post("/broadcasts/{broadcast_id}/cancel", response_model=BroadcastRead)
+def cancel_newsletter_broadcast(
+    *,
+    session: Session = Depends(get_session),
+    request: Request,
+    admin: UserRead = Depends(get_current_admin),
+    broadcast_id: int,
+):
+    """Cancel a pending or running broadcast. A running one stops after its batches in flight."""
+    broadcast = get_broadcast(session, broadcast_id)
+    if not broadcast:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Broadcast not found")
+    if not cancel_broadcast(session, broadcast_id):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Broadcast already ended")
+
+    log_event(
+        session,
+        action=EventType.ADMIN_BROADCAST_CANCEL,
+        user_id=admin.id,
+        details={"broadcast_id": broadcast_id},
+        request=request,
+    )
+
+    session.refresh(broadcast)
+    return BroadcastRead.model_validate(broadcast)
@@ -8,12 +8,13 @@ Extends the core users controller with additional auth features.
 from datetime import UTC, datetime
 
 from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from ..constants import EventType
-from ..crud.event_logs import log_event
-from ..crud.users import get_user_by_email, get_user_by_id, update_user
-from ..helpers.auth import get_current_user, hash_password
+from ..crud.event_logs import log_event, log_event_async
+from ..crud.users import get_user_by_email, get_user_by_id, get_user_by_id_async, update_user, update_user_async
+from ..helpers.auth import get_current_user, hash_password_async
 from ..helpers.auth_tokens import (
     create_email_verification_token,
     create_password_reset_token,
@@ -21,9 +22,10 @@ from ..helpers.auth_tokens import (
     get_email_verification_url,
     get_password_reset_url,
 )
-from ..helpers.db import get_session
+from ..helpers.db import get_async_session, get_session
 from ..helpers.email import send_email_verification_email, send_password_reset_email
-from ..helpers.ratelimit import ensure_rate_limit
+from ..helpers.ratelimit import RateLimit, RateLimits
+from ..helpers.token_revocation import revoke_user_tokens_async
 from ..models.user import (
     AuthMessageResponse,
     EmailVerificationConfirm,
@@ -45,16 +47,34 @@ PASSWORD_RESET_IP_DAILY_LIMIT = 20
     "/auth/send-verification-email",
     response_model=AuthMessageResponse,
     status_code=status.HTTP_200_OK,
+    dependencies=[
+        Depends(
+            RateLimits(
+                # Per-user cooldown and daily limit
+                RateLimit(
+                    "send-verification-email",
+                    quota=1,
+                    duration_minutes=EMAIL_VERIFICATION_COOLDOWN_MINUTES,
+                    key="user",
+                ),
+                RateLimit(
+                    "send-verification-email-daily",
+                    quota=EMAIL_VERIFICATION_DAILY_LIMIT,
+                    duration_minutes=60 * 24,
+                    key="user",
+                ),
+            )
+        )
+    ],
 )
 def send_verification_email(
     *,
-    request: Request,
     session: Session = Depends(get_session),
     current_user: UserRead = Depends(get_current_user),
 ):
     """
     Send (or resend) email verification to the current user.
-    Requires authentication. Rate limited per-user.
+    Requires authentication. Rate limited per-user (see the route's dependencies).
     """
     user = get_user_by_id(session, current_user.id)
     if not user:
@@ -63,35 +83,16 @@ def send_verification_email(
     if user.email_confirmed:
         raise HTTPException(status_code=400, detail="Email already verified")
 
-    # Rate limit: per-user cooldown
-    ensure_rate_limit(
-        action="send-verification-email",
-        quota=1,
-        key=str(user.id),
-        duration_minutes=EMAIL_VERIFICATION_COOLDOWN_MINUTES,
-    )
-
-    # Rate limit: per-user daily limit
-    ensure_rate_limit(
-        action="send-verification-email-daily",
-        quota=EMAIL_VERIFICATION_DAILY_LIMIT,
-        key=str(user.id),
-        duration_minutes=60 * 24,
-    )
-
-    # Generate token and send email
+    # Generate token and queue the email (delivered by the outbox worker)
     token = create_email_verification_token(user.id, user.email)
     verification_url = get_email_verification_url(token)
 
-    try:  # noqa: SIM105
-        send_email_verification_email(
-            to_email=user.email,
-            username=user.first_name,
-            verification_link=verification_url,
-        )
-    except Exception:
-        # Email service might not be configured - that's OK in development
-        pass
+    send_email_verification_email(
+        session,
+        to_email=user.email,
+        username=user.first_name,
+        verification_link=verification_url,
+    )
 
     # Update sent_at timestamp if the column exists
     if hasattr(user, "email_verification_sent_at"):
@@ -144,6 +145,24 @@ def verify_email(
     "/auth/request-password-reset",
     response_model=AuthMessageResponse,
     status_code=status.HTTP_200_OK,
+    dependencies=[
+        Depends(
+            RateLimits(
+                # Per-email cooldown and per-IP daily limit
+                RateLimit(
+                    "password-reset-request",
+                    quota=1,
+                    duration_minutes=PASSWORD_RESET_COOLDOWN_MINUTES,
+                    key="email",
+                ),
+                RateLimit(
+                    "password-reset-request-ip-daily",
+                    quota=PASSWORD_RESET_IP_DAILY_LIMIT,
+                    duration_minutes=60 * 24,
+                ),
+            )
+        )
+    ],
 )
 def request_password_reset(
     *,
@@ -156,23 +175,6 @@ def request_password_reset(
     Always returns success to prevent email enumeration.
     """
     email = body.email.lower()
-    client_ip = request.client.host if request.client else "unknown"
-
-    # Rate limit: per-email cooldown
-    ensure_rate_limit(
-        action="password-reset-request",
-        quota=1,
-        key=email,
-        duration_minutes=PASSWORD_RESET_COOLDOWN_MINUTES,
-    )
-
-    # Rate limit: per-IP daily limit
-    ensure_rate_limit(
-        action="password-reset-request-ip-daily",
-        quota=PASSWORD_RESET_IP_DAILY_LIMIT,
-        key=client_ip,
-        duration_minutes=60 * 24,
-    )
 
     user = get_user_by_email(session, email)
 
@@ -181,15 +183,12 @@ def request_password_reset(
         token = create_password_reset_token(user.id)
         reset_url = get_password_reset_url(token)
 
-        try:  # noqa: SIM105
-            send_password_reset_email(
-                to_email=user.email,
-                username=user.first_name,
-                reset_link=reset_url,
-            )
-        except Exception:
-            # Email service might not be configured
-            pass
+        send_password_reset_email(
+            session,
+            to_email=user.email,
+            username=user.first_name,
+            reset_link=reset_url,
+        )
 
         # Log password reset request
         log_event(session, action=EventType.USER_PASSWORD_RESET_REQUEST, user_id=user.id, request=request)
@@ -202,10 +201,10 @@ def request_password_reset(
     response_model=AuthMessageResponse,
     status_code=status.HTTP_200_OK,
 )
-def reset_password(
+async def reset_password(
     *,
     request: Request,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     body: PasswordResetConfirmJWT,
 ):
     """
@@ -215,7 +214,7 @@ def reset_password(
     if not payload:
         raise HTTPException(status_code=400, detail="Invalid or expired token")
 
-    user = get_user_by_id(session, payload["user_id"])
+    user = await get_user_by_id_async(session, payload["user_id"])
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -223,10 +222,13 @@ def reset_password(
     if len(body.password) < 8:
         raise HTTPException(status_code=400, detail="Password must be at least 8 characters")
 
-    user.hashed_password = hash_password(body.password)
-    update_user(session, user)
+    user.hashed_password = await hash_password_async(body.password)
+    await update_user_async(session, user)
+
+    # Sign out every session opened with the previous password
+    await revoke_user_tokens_async(session, user.id)
 
     # Log password reset
-    log_event(session, action=EventType.USER_PASSWORD_RESET, user_id=user.id, request=request)
+    await log_event_async(session, action=EventType.USER_PASSWORD_RESET, user_id=user.id, request=request)
 
     return AuthMessageResponse(message="Password reset successfully")
@@ -2,30 +2,39 @@
 
 from datetime import UTC, datetime
 
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from ..constants import JWT_ACCESS_TOKEN_EXPIRE_MINUTES, PUBLIC_URL, EventType
-from ..crud.event_logs import log_event
+from ..crud.event_logs import log_event, log_event_async
 from ..crud.users import (
-    create_user,
-    get_user_by_email,
+    create_user_async,
+    get_user_by_email_async,
     get_user_by_id,
+    get_user_by_id_async,
     is_email_taken,
+    is_email_taken_async,
     update_user,
+    update_user_async,
 )
 from ..helpers import stripe as stripe_helper
 from ..helpers.auth import (
     create_access_token,
-    decode_access_token,
     get_current_user,
-    hash_password,
+    get_real_admin_id,
+    get_token_payload,
+    hash_password_async,
     oauth2_scheme,
-    verify_password,
+    verify_password_async,
 )
-from ..helpers.db import get_session
+from ..helpers.db import get_async_session, get_read_session, get_session, mark_recent_write
+from ..helpers.password_hashing import DUMMY_PASSWORD_HASH, needs_rehash
+from ..helpers.ratelimit import RateLimit
+from ..helpers.token_revocation import revoke_user_tokens
 from ..models.user import (
+    AuthMessageResponse,
     UserBase,
     UserChangeInfo,
     UserChangePassword,
@@ -36,41 +45,49 @@ from ..models.user import (
 
 router = APIRouter()
 
+# Rate limit constants (per client IP)
+LOGIN_RATE_LIMIT_PER_MINUTE = 10
+REGISTER_RATE_LIMIT_PER_HOUR = 5
+
 RESET_PASSWORD_BASE_URL = f"{PUBLIC_URL}/reset-password"
 
 
 @router.post(
-    "/users", response_model=UserTokenUpdate, status_code=status.HTTP_201_CREATED
+    "/users",
+    response_model=UserTokenUpdate,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(RateLimit("register", quota=REGISTER_RATE_LIMIT_PER_HOUR, duration_minutes=60))],
 )
-def register_user(*, request: Request, session: Session = Depends(get_session), user_create: UserCreate):
+async def register_user(
+    *,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    session: AsyncSession = Depends(get_async_session),
+    user_create: UserCreate,
+):
     user_create.email = user_create.email.lower()
-    if is_email_taken(session, user_create.email):
+    if await is_email_taken_async(session, user_create.email):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT, detail="Email already registered"
         )
 
     user = UserBase(
         email=user_create.email,
-        hashed_password=hash_password(user_create.password),
+        hashed_password=await hash_password_async(user_create.password),
         first_name=user_create.first_name,
         last_name=user_create.last_name,
     )
-    create_user(session, user)
-
-    # Create Stripe customer and free subscription for the new user
-    if stripe_helper.is_enabled():
-        user.stripe_id = stripe_helper.sync_customer(
-            user_id=user.id,
-            email=user.email,
-            name=f"{user.first_name} {user.last_name}",
-        )
-        stripe_helper.create_subscription(user.stripe_id)
-        update_user(session, user)
+    await create_user_async(session, user)
+    mark_recent_write(user.id)
+
+    # Create Stripe customer and free subscription for the new user, after the response
+    if stripe_helper.is_enabled() and stripe_helper.STRIPE_SIGNUP_PROVISIONING == "background":
+        background_tasks.add_task(stripe_helper.provision_customer_async, user.id)
 
     token = create_access_token(UserRead.model_validate(user))
 
     # Log the registration event
-    log_event(session, action=EventType.USER_REGISTER, user_id=user.id, request=request)
+    await log_event_async(session, action=EventType.USER_REGISTER, user_id=user.id, request=request)
 
     return UserTokenUpdate(
         access_token=token.access_token,
@@ -80,31 +97,61 @@ def register_user(*, request: Request, session: Session = Depends(get_session),
 
 
 @router.post(
-    "/users/login", response_model=UserTokenUpdate, status_code=status.HTTP_200_OK
+    "/users/login",
+    response_model=UserTokenUpdate,
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(RateLimit("login", quota=LOGIN_RATE_LIMIT_PER_MINUTE))],
 )
-def login_user(
+async def login_user(
     *,
     request: Request,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     form_data: OAuth2PasswordRequestForm = Depends(),
 ):
     # Lowercase the username (email in this case) for case-insensitive login
     email = form_data.username.lower()
     password = form_data.password
 
-    user = get_user_by_email(session, email)
+    user = await get_user_by_email_async(session, email)
 
-    if not user or not verify_password(password, user.hashed_password):
+    if not user:
+        # Spend the same bcrypt time as for an existing account: response times must not tell
+        # which emails are registered
+        await verify_password_async(password, DUMMY_PASSWORD_HASH)
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email or password")
+    if not await verify_password_async(password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email or password"
         )
 
+    # Upgrade legacy HMAC (or lower cost) hashes while the plain password is known
+    if needs_rehash(user.hashed_password):
+        user.hashed_password = await hash_password_async(password)
+        await update_user_async(session, user)
+
     # Log the login event
-    log_event(session, action=EventType.USER_LOGIN, user_id=user.id, request=request)
+    await log_event_async(session, action=EventType.USER_LOGIN, user_id=user.id, request=request)
 
     return create_access_token(UserRead.model_validate(user))
 
 
+@router.post("/users/logout", response_model=AuthMessageResponse, status_code=status.HTTP_200_OK)
+def logout_user(
+    *,
+    session: Session = Depends(get_session),
+    current_user: UserRead = Depends(get_current_user),
+    real_admin_id: int | None = Depends(get_real_admin_id),
+):
+    """
+    Log out: revoke every access token of the current user (all their sessions).
+    An admin logging out while impersonating only discards their impersonation token:
+    the impersonated user stays signed in.
+    """
+    if not real_admin_id:
+        revoke_user_tokens(session, current_user.id)
+    return AuthMessageResponse(message="Logged out")
+
+
 @router.get("/users/me", response_model=UserRead, status_code=status.HTTP_200_OK)
 def get_me(*, current_user: UserRead = Depends(get_current_user)):
     """
@@ -114,18 +161,17 @@ def get_me(*, current_user: UserRead = Depends(get_current_user)):
 
 
 @router.post("/users/me/token", response_model=UserTokenUpdate, status_code=status.HTTP_200_OK)
-def refresh_token(
+async def refresh_token(
     *,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     current_user: UserRead = Depends(get_current_user),
     token: str = Depends(oauth2_scheme),
+    payload: dict = Depends(get_token_payload),
 ):
     """
     Refresh the current user's token.
     Rate limited: won't issue new token if current one is less than 5 minutes old.
     """
-    # Decode current token to check creation time
-    payload = decode_access_token(token)
 
     # Check if token was issued less than 5 minutes ago
     token_exp = payload.get("exp", 0)
@@ -145,7 +191,7 @@ def refresh_token(
         )
 
     # Fetch fresh user data and issue new token
-    user = get_user_by_id(session, current_user.id)
+    user = await get_user_by_id_async(session, current_user.id)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
@@ -155,7 +201,7 @@ def refresh_token(
 @router.get("/users/{user_id}", response_model=UserRead, status_code=status.HTTP_200_OK)
 def get_user(
     *,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
     user_id: int,
     current_user: UserRead = Depends(get_current_user),
 ):
@@ -214,23 +260,23 @@ def update_me(
     response_model=UserRead,
     status_code=status.HTTP_200_OK,
 )
-def update_my_password(
+async def update_my_password(
     *,
     request: Request,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user_change_pwd: UserChangePassword,
     current_user: UserRead = Depends(get_current_user),
 ):
     """
     Update the password of the currently authenticated user.
     """
-    user = get_user_by_id(session, current_user.id)
+    user = await get_user_by_id_async(session, current_user.id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
 
-    if not verify_password(user_change_pwd.old_password, user.hashed_password):
+    if not await verify_password_async(user_change_pwd.old_password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid current password"
         )
@@ -241,10 +287,10 @@ def update_my_password(
             detail="New password must be different from the old one",
         )
 
-    user.hashed_password = hash_password(user_change_pwd.new_password)
-    update_user(session, user)
+    user.hashed_password = await hash_password_async(user_change_pwd.new_password)
+    await update_user_async(session, user)
 
     # Log password change
-    log_event(session, action=EventType.USER_PASSWORD_CHANGE, user_id=user.id, request=request)
+    await log_event_async(session, action=EventType.USER_PASSWORD_CHANGE, user_id=user.id, request=request)
 
     return UserRead.model_validate(user)
@@ -32,6 +32,7 @@ from .models.admin import (
     ImpersonationResponse,
 )
 from .models.event_log import (
+    EventLogCursorPage,
     EventLogFilter,
     EventLogListResponse,
     EventLogRead,
@@ -60,6 +61,7 @@ Models = (
     | EventLogRead
     | EventLogFilter
     | EventLogListResponse
+    | EventLogCursorPage
 )
 
 if __name__ == "__main__":
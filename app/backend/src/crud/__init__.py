@@ -2,20 +2,34 @@
 
 from .users import (
     create_user,
+    create_user_async,
     get_user_by_email,
+    get_user_by_email_async,
     get_user_by_id,
+    get_user_by_id_async,
     is_email_taken,
+    is_email_taken_async,
     reset_password,
+    reset_password_async,
     set_password_reset_token,
+    set_password_reset_token_async,
     update_user,
+    update_user_async,
 )
 
 __all__ = [
     "create_user",
+    "create_user_async",
     "get_user_by_email",
+    "get_user_by_email_async",
     "get_user_by_id",
+    "get_user_by_id_async",
     "is_email_taken",
+    "is_email_taken_async",
     "reset_password",
+    "reset_password_async",
     "set_password_reset_token",
+    "set_password_reset_token_async",
     "update_user",
+    "update_user_async",
 ]
@@ -0,0 +1,150 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+import datetime
+from collections.abc import Iterator
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session
+
+from ..models.broadcast import BroadcastBase
+from ..models.user import UserBase
+
+
+def create_broadcast(session: Session, template: str, subject: str, created_by: int | None) -> BroadcastBase:
+    broadcast = BroadcastBase(template=template, subject=subject, created_by=created_by)
+    session.add(broadcast)
+    session.commit()
+    session.refresh(broadcast)
+    return broadcast
+
+
+def get_broadcast(session: Session, broadcast_id: int) -> BroadcastBase | None:
+    return session.get(BroadcastBase, broadcast_id)
+
+
+def get_broadcasts(session: Session, limit: int = 50) -> list[BroadcastBase]:
+    """Most recent broadcasts first."""
+    return list(session.scalars(select(BroadcastBase).order_by(BroadcastBase.id.desc()).limit(limit)))
+
+
+def claim_broadcast(session: Session, lease_seconds: float) -> dict | None:
+    """
+    Claim the oldest pending broadcast, or a running one whose worker stopped sending heartbeats
+    for `lease_seconds`. Returns its row (including the checkpoint to resume from), or None.
+    """
+    now = datetime.datetime.now(datetime.UTC)
+    claimable = (
+        select(BroadcastBase.id)
+        .where(
+            or_(
+                BroadcastBase.status == "pending",
+                (BroadcastBase.status == "running")
+                & (BroadcastBase.updated_at < now - datetime.timedelta(seconds=lease_seconds)),
+            )
+        )
+        .order_by(BroadcastBase.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    claimed = session.execute(
+        update(BroadcastBase)
+        .where(BroadcastBase.id == claimable.scalar_subquery())
+        .values(status="running", started_at=now, updated_at=now)
+        .returning(
+            BroadcastBase.id,
+            BroadcastBase.template,
+            BroadcastBase.subject,
+            BroadcastBase.last_user_id,
+            BroadcastBase.sent_count,
+            BroadcastBase.failed_count,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    row = claimed.mappings().first()
+    session.commit()
+    return dict(row) if row else None
+
+
+def checkpoint_broadcast(
+    session: Session,
+    broadcast_id: int,
+    last_user_id: int,
+    sent: int,
+    failed: int,
+    batches: int,
+    recipients_per_second: float,
+    error: str | None = None,
+) -> bool:
+    """
+    Record progress (counts are increments) and renew the lease.
+    Returns False if the broadcast is no longer running (cancelled, or taken over by another worker).
+    """
+    values = {
+        "last_user_id": last_user_id,
+        "sent_count": BroadcastBase.sent_count + sent,
+        "failed_count": BroadcastBase.failed_count + failed,
+        "batch_count": BroadcastBase.batch_count + batches,
+        "recipients_per_second": recipients_per_second,
+        "updated_at": datetime.datetime.now(datetime.UTC),
+    }
+    if error is not None:
+        values["last_error"] = error
+    result = session.execute(
+        update(BroadcastBase)
+        .where(BroadcastBase.id == broadcast_id, BroadcastBase.status == "running")
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    session.commit()
+    return result.rowcount > 0
+
+
+def finish_broadcast(session: Session, broadcast_id: int, error: str | None = None) -> None:
+    """Mark a running broadcast as done, or failed with `error`."""
+    now = datetime.datetime.now(datetime.UTC)
+    values = {"status": "failed", "last_error": error} if error else {"status": "done"}
+    session.execute(
+        update(BroadcastBase)
+        .where(BroadcastBase.id == broadcast_id, BroadcastBase.status == "running")
+        .values(updated_at=now, finished_at=now, **values)
+        .execution_options(synchronize_session=False)
+    )
+    session.commit()
+
+
+def release_broadcast(session: Session, broadcast_id: int) -> None:
+    """Put a running broadcast back to pending (e.g. on shutdown) so any worker resumes it right away."""
+    session.execute(
+        update(BroadcastBase)
+        .where(BroadcastBase.id == broadcast_id, BroadcastBase.status == "running")
+        .values(status="pending", updated_at=datetime.datetime.now(datetime.UTC))
+        .execution_options(synchronize_session=False)
+    )
+    session.commit()
+
+
+def cancel_broadcast(session: Session, broadcast_id: int) -> bool:
+    """Cancel a pending or running broadcast. Returns False if it already ended."""
+    now = datetime.datetime.now(datetime.UTC)
+    result = session.execute(
+        update(BroadcastBase)
+        .where(BroadcastBase.id == broadcast_id, BroadcastBase.status.in_(["pending", "running"]))
+        .values(status="cancelled", updated_at=now, finished_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    session.commit()
+    return result.rowcount > 0
+
+
+def iter_newsletter_recipients(session: Session, after_user_id: int, batch_size: int) -> Iterator[list]:
+    """
+    Stream opted-in users with id > after_user_id, in id order, as lists of up to `batch_size`
+    (id, email, first_name, last_name) rows. Uses a server-side cursor: only one batch is in memory.
+    """
+    result = session.execute(
+        select(UserBase.id, UserBase.email, UserBase.first_name, UserBase.last_name)
+        .where(UserBase.newsletter_on.is_(True), UserBase.id > after_user_id)
+        .order_by(UserBase.id)
+        .execution_options(yield_per=batch_size)
+    )
+    yield from result.partitions()
@@ -0,0 +1,108 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+import datetime
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from ..models.email_outbox import EmailOutboxBase
+
+
+def create_outbox_email(session: Session, to_email: str, subject: str, body: str, html_body: str | None) -> None:
+    """Queue an email for delivery."""
+    session.add(EmailOutboxBase(to_email=to_email, subject=subject, body=body, html_body=html_body))
+    session.commit()
+
+
+def fail_abandoned_outbox_emails(session: Session, max_attempts: int) -> int:
+    """
+    Mark failed the emails whose last allowed attempt never recorded an outcome (the worker died
+    or crashed while delivering them, and their lease expired). Returns the count.
+    """
+    now = datetime.datetime.now(datetime.UTC)
+    result = session.execute(
+        update(EmailOutboxBase)
+        .where(
+            EmailOutboxBase.status == "sending",
+            EmailOutboxBase.next_attempt_at <= now,
+            EmailOutboxBase.attempts >= max_attempts,
+        )
+        .values(
+            status="failed",
+            last_error=func.coalesce(EmailOutboxBase.last_error, "Delivery abandoned: no outcome recorded"),
+        )
+    )
+    session.commit()
+    return result.rowcount
+
+
+def claim_outbox_emails(session: Session, limit: int, lease_seconds: float, max_attempts: int) -> list[dict]:
+    """
+    Claim up to `limit` due emails with attempts left for delivery, skipping rows claimed by other workers.
+    Claimed emails are due again after `lease_seconds` if the worker dies before recording the outcome.
+    """
+    now = datetime.datetime.now(datetime.UTC)
+    due = (
+        select(EmailOutboxBase.id)
+        .where(
+            EmailOutboxBase.status.in_(["pending", "sending"]),
+            EmailOutboxBase.next_attempt_at <= now,
+            EmailOutboxBase.attempts < max_attempts,
+        )
+        .order_by(EmailOutboxBase.next_attempt_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    claimed = session.execute(
+        update(EmailOutboxBase)
+        .where(EmailOutboxBase.id.in_(due.scalar_subquery()))
+        .values(
+            status="sending",
+            attempts=EmailOutboxBase.attempts + 1,
+            next_attempt_at=now + datetime.timedelta(seconds=lease_seconds),
+        )
+        .returning(
+            EmailOutboxBase.id,
+            EmailOutboxBase.to_email,
+            EmailOutboxBase.subject,
+            EmailOutboxBase.body,
+            EmailOutboxBase.html_body,
+            EmailOutboxBase.attempts,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    rows = [dict(row) for row in claimed.mappings()]
+    session.commit()
+    return rows
+
+
+def mark_outbox_email_sent(session: Session, email_id: int) -> None:
+    session.execute(
+        update(EmailOutboxBase)
+        .where(EmailOutboxBase.id == email_id)
+        .values(status="sent", sent_at=datetime.datetime.now(datetime.UTC), last_error=None)
+    )
+    session.commit()
+
+
+def mark_outbox_email_failed(session: Session, email_id: int, error: str, retry_at: datetime.datetime | None) -> None:
+    """Record a failed attempt: retried at `retry_at`, or failed for good if None."""
+    values = {"status": "pending", "next_attempt_at": retry_at} if retry_at else {"status": "failed"}
+    session.execute(update(EmailOutboxBase).where(EmailOutboxBase.id == email_id).values(last_error=error, **values))
+    session.commit()
+
+
+def count_outbox_emails(session: Session) -> dict[str, int]:
+    """Number of emails per status."""
+    return dict(
+        session.execute(select(EmailOutboxBase.status, func.count()).group_by(EmailOutboxBase.status)).tuples().all()
+    )
+
+
+def delete_sent_outbox_emails(session: Session, before: datetime.datetime) -> int:
+    """Delete emails sent before `before`. Returns the count."""
+    result = session.execute(
+        delete(EmailOutboxBase).where(EmailOutboxBase.status == "sent", EmailOutboxBase.sent_at < before)
+    )
+    session.commit()
+    return result.rowcount
@@ -4,14 +4,70 @@
 CRUD operations for event logs.
 """
 
+import datetime
+import logging
+import re
 from typing import Any
 
 from fastapi import Request
-from sqlalchemy import func
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from ..helpers.event_log_buffer import EVENT_LOG_BUFFERED, event_log_buffer
 from ..models.event_log import EventLogBase, EventLogFilter, EventLogRead
 
+logger = logging.getLogger(__name__)
+
+
+def _event_values(
+    action: str,
+    user_id: int | None,
+    details: dict[str, Any] | None,
+    request: Request | None,
+) -> dict[str, Any]:
+    """Build event log column values, extracting IP and user agent from the request if given."""
+    ip_address = None
+    user_agent = None
+
+    if request:
+        # Get client IP (handle proxies)
+        forwarded = request.headers.get("X-Forwarded-For")
+        ip_address = forwarded.split(",")[0].strip() if forwarded else request.client.host if request.client else None
+
+        user_agent = request.headers.get("User-Agent")
+
+    return dict(
+        user_id=user_id,
+        action=action,
+        details=details or {},
+        ip_address=ip_address,
+        user_agent=user_agent,
+    )
+
+
+def _buffer_event(values: dict[str, Any]) -> bool:
+    """Queue an event in the buffered writer. Returns True if the buffer should be flushed."""
+    # Timestamp now rather than at flush time
+    return event_log_buffer.add({**values, "created_at": datetime.datetime.now()})
+
+
+def _apply_filters(query, filters: EventLogFilter | None):
+    """Apply event log filters to a legacy Query or a 2.0-style Select."""
+    if filters:
+        if filters.user_id is not None:
+            query = query.filter(EventLogBase.user_id == filters.user_id)
+        if filters.action is not None:
+            query = query.filter(EventLogBase.action == filters.action)
+        if filters.action_prefix is not None:
+            query = query.filter(EventLogBase.action.startswith(filters.action_prefix))
+        if filters.from_date is not None:
+            query = query.filter(EventLogBase.created_at >= filters.from_date)
+        if filters.to_date is not None:
+            query = query.filter(EventLogBase.created_at <= filters.to_date)
+    return query
+
 
 def log_event(
     session: Session,
@@ -19,7 +75,8 @@ def log_event(
     user_id: int | None = None,
     details: dict[str, Any] | None = None,
     request: Request | None = None,
-) -> EventLogBase:
+    buffered: bool | None = None,
+) -> EventLogBase | None:
     """
     Log an event to the database.
 
@@ -29,27 +86,20 @@ def log_event(
         user_id: ID of the user the event is about (optional)
         details: Additional event details as JSON (optional)
         request: FastAPI request object to extract IP and user agent (optional)
+        buffered: Queue the event for a bulk insert instead of writing it now.
+            Defaults to EVENT_LOG_BUFFERED. Pass False when the created row is needed.
 
     Returns:
-        The created event log entry
+        The created event log entry, or None if the event was buffered
     """
-    ip_address = None
-    user_agent = None
+    values = _event_values(action, user_id, details, request)
 
-    if request:
-        # Get client IP (handle proxies)
-        forwarded = request.headers.get("X-Forwarded-For")
-        ip_address = forwarded.split(",")[0].strip() if forwarded else request.client.host if request.client else None
-
-        user_agent = request.headers.get("User-Agent")
+    if EVENT_LOG_BUFFERED if buffered is None else buffered:
+        if _buffer_event(values):
+            event_log_buffer.flush(blocking=False)
+        return None
 
-    event = EventLogBase(
-        user_id=user_id,
-        action=action,
-        details=details or {},
-        ip_address=ip_address,
-        user_agent=user_agent,
-    )
+    event = EventLogBase(**values)
     session.add(event)
     session.commit()
     session.refresh(event)
@@ -74,19 +124,7 @@ def get_events(
     Returns:
         Tuple of (list of events, total count)
     """
-    query = session.query(EventLogBase)
-
-    if filters:
-        if filters.user_id is not None:
-            query = query.filter(EventLogBase.user_id == filters.user_id)
-        if filters.action is not None:
-            query = query.filter(EventLogBase.action == filters.action)
-        if filters.action_prefix is not None:
-            query = query.filter(EventLogBase.action.startswith(filters.action_prefix))
-        if filters.from_date is not None:
-            query = query.filter(EventLogBase.created_at >= filters.from_date)
-        if filters.to_date is not None:
-            query = query.filter(EventLogBase.created_at <= filters.to_date)
+    query = _apply_filters(session.query(EventLogBase), filters)
 
     # Get total count before pagination
     total = query.count()
@@ -123,6 +161,47 @@ def get_user_events(
     return [EventLogRead.model_validate(e) for e in events], total
 
 
+def _keyset_page(query, after: tuple[datetime.datetime, int] | None, limit: int):
+    """Order newest first and fetch one extra row to know whether another page exists."""
+    if after is not None:
+        query = query.filter(tuple_(EventLogBase.created_at, EventLogBase.id) < after)
+    return query.order_by(EventLogBase.created_at.desc(), EventLogBase.id.desc()).limit(limit + 1)
+
+
+def _to_page(events, limit: int) -> tuple[list[EventLogRead], tuple[datetime.datetime, int] | None]:
+    items = [EventLogRead.model_validate(e) for e in events[:limit]]
+    after = (items[-1].created_at, items[-1].id) if len(events) > limit else None
+    return items, after
+
+
+def get_events_after(
+    session: Session,
+    filters: EventLogFilter | None = None,
+    limit: int = 50,
+    after: tuple[datetime.datetime, int] | None = None,
+) -> tuple[list[EventLogRead], tuple[datetime.datetime, int] | None]:
+    """
+    Get a page of event logs using keyset pagination on (created_at, id).
+    Cost does not depend on how deep the page is, and no count is run.
+
+    Args:
+        session: Database session
+        filters: Optional filters to apply
+        limit: Maximum number of results
+        after: (created_at, id) of the last event of the previous page
+
+    Returns:
+        Tuple of (list of events, sort key to pass as `after` for the next page or None if this is the last page)
+    """
+    query = _keyset_page(_apply_filters(session.query(EventLogBase), filters), after, limit)
+    return _to_page(query.all(), limit)
+
+
+def count_events(session: Session, filters: EventLogFilter | None = None) -> int:
+    """Count event logs matching the filters."""
+    return _apply_filters(session.query(EventLogBase), filters).count()
+
+
 def get_recent_events(
     session: Session,
     limit: int = 10,
@@ -158,3 +237,233 @@ def get_event_stats(session: Session) -> dict[str, int]:
         .all()
     )
     return {r.category: r.count for r in results}
+
+
+# ============================================================================
+# Async variants (for `async def` endpoints using get_async_session)
+# ============================================================================
+
+
+async def log_event_async(
+    session: AsyncSession,
+    action: str,
+    user_id: int | None = None,
+    details: dict[str, Any] | None = None,
+    request: Request | None = None,
+    buffered: bool | None = None,
+) -> EventLogBase | None:
+    """Log an event to the database. See log_event."""
+    values = _event_values(action, user_id, details, request)
+
+    if EVENT_LOG_BUFFERED if buffered is None else buffered:
+        if _buffer_event(values):
+            await run_in_threadpool(event_log_buffer.flush, False)
+        return None
+
+    event = EventLogBase(**values)
+    session.add(event)
+    await session.commit()
+    await session.refresh(event)
+    return event
+
+
+async def get_events_async(
+    session: AsyncSession,
+    filters: EventLogFilter | None = None,
+    limit: int = 50,
+    offset: int = 0,
+) -> tuple[list[EventLogRead], int]:
+    """Get event logs with optional filtering. See get_events."""
+    query = _apply_filters(select(EventLogBase), filters)
+
+    total = await session.scalar(select(func.count()).select_from(query.subquery()))
+    events = await session.scalars(query.order_by(EventLogBase.created_at.desc()).offset(offset).limit(limit))
+
+    return [EventLogRead.model_validate(e) for e in events], total
+
+
+async def get_user_events_async(
+    session: AsyncSession,
+    user_id: int,
+    limit: int = 50,
+    offset: int = 0,
+) -> tuple[list[EventLogRead], int]:
+    """Get events for a specific user. See get_user_events."""
+    return await get_events_async(session, EventLogFilter(user_id=user_id), limit=limit, offset=offset)
+
+
+async def get_events_after_async(
+    session: AsyncSession,
+    filters: EventLogFilter | None = None,
+    limit: int = 50,
+    after: tuple[datetime.datetime, int] | None = None,
+) -> tuple[list[EventLogRead], tuple[datetime.datetime, int] | None]:
+    """Get a page of event logs using keyset pagination. See get_events_after."""
+    query = _keyset_page(_apply_filters(select(EventLogBase), filters), after, limit)
+    return _to_page((await session.scalars(query)).all(), limit)
+
+
+async def count_events_async(session: AsyncSession, filters: EventLogFilter | None = None) -> int:
+    """Count event logs matching the filters."""
+    return await session.scalar(
+        select(func.count()).select_from(_apply_filters(select(EventLogBase), filters).subquery())
+    )
+
+
+async def get_recent_events_async(
+    session: AsyncSession,
+    limit: int = 10,
+) -> list[EventLogRead]:
+    """Get the most recent events (for dashboard)."""
+    events = await session.scalars(select(EventLogBase).order_by(EventLogBase.created_at.desc()).limit(limit))
+    return [EventLogRead.model_validate(e) for e in events]
+
+
+async def get_event_stats_async(session: AsyncSession) -> dict[str, int]:
+    """Get event statistics for dashboard. See get_event_stats."""
+    category = func.split_part(EventLogBase.action, ".", 1).label("category")
+    results = await session.execute(select(category, func.count().label("count")).group_by(category))
+    return {r.category: r.count for r in results}
+
+
+# ============================================================================
+# Partition management (event_logs is range-partitioned by month on created_at)
+# ============================================================================
+
+_PARTITION_NAME = re.compile(r"^event_logs_(\d{4})_(\d{2})$")
+
+
+def _month_start(date: datetime.date, offset: int = 0) -> datetime.date:
+    """First day of the month `offset` months away from `date`."""
+    month_index = date.year * 12 + date.month - 1 + offset
+    return datetime.date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def _partition_name(month: datetime.date) -> str:
+    return f"event_logs_{month.year:04d}_{month.month:02d}"
+
+
+def _lock_partitions(session: Session) -> bool:
+    """
+    Serialize partition maintenance across workers (lock held until commit).
+
+    Returns:
+        False if event_logs is not partitioned yet (see migrations/2026-10-18-partition-event-logs.sql)
+    """
+    session.execute(text("SELECT pg_advisory_xact_lock(hashtext('event_logs_partitions'))"))
+    relkind = session.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass('event_logs')")).scalar()
+    if relkind != "p":
+        logger.warning("event_logs is not a partitioned table, skipping partition maintenance")
+        return False
+    return True
+
+
+def list_event_log_partitions(session: Session) -> list[str]:
+    """Names of the partitions attached to event_logs."""
+    return list(
+        session.execute(
+            text(
+                "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = to_regclass('event_logs') ORDER BY c.relname"
+            )
+        ).scalars()
+    )
+
+
+def ensure_event_log_partitions(session: Session, months_ahead: int) -> list[str]:
+    """
+    Create the monthly partitions from the current month up to `months_ahead` months ahead,
+    plus a default partition catching rows outside any monthly range. Rows of a new month
+    already in the default partition are moved to the month's partition.
+
+    Returns:
+        Names of the partitions created
+    """
+    if not _lock_partitions(session):
+        session.rollback()
+        return []
+
+    existing = set(list_event_log_partitions(session))
+    created = []
+
+    if "event_logs_default" not in existing:
+        session.execute(text("CREATE TABLE event_logs_default PARTITION OF event_logs DEFAULT"))
+        created.append("event_logs_default")
+
+    today = datetime.date.today()
+    for offset in range(months_ahead + 1):
+        month = _month_start(today, offset)
+        name = _partition_name(month)
+        if name in existing:
+            continue
+        _create_month_partition(session, name, month, _month_start(month, 1))
+        created.append(name)
+
+    session.commit()
+    return created
+
+
+def _create_month_partition(session: Session, name: str, start: datetime.date, end: datetime.date) -> None:
+    """
+    Create the partition for [start, end). Postgres refuses to create it while the default partition
+    holds rows of that range: the default partition is then detached, its rows in the range moved
+    to the new partition and the default partition attached back, all within the caller's transaction.
+    """
+    bounds = {"start": start, "end": end}
+    create = text(f"CREATE TABLE {name} PARTITION OF event_logs FOR VALUES FROM ('{start}') TO ('{end}')")
+    in_default = session.execute(
+        text("SELECT EXISTS (SELECT 1 FROM event_logs_default WHERE created_at >= :start AND created_at < :end)"),
+        bounds,
+    ).scalar()
+    if not in_default:
+        session.execute(create)
+        return
+
+    columns = ", ".join(column.name for column in EventLogBase.__table__.columns)
+    session.execute(text("ALTER TABLE event_logs DETACH PARTITION event_logs_default"))
+    session.execute(create)
+    moved = session.execute(
+        text(
+            f"WITH moved AS (DELETE FROM event_logs_default WHERE created_at >= :start AND created_at < :end "
+            f"RETURNING {columns}) INSERT INTO event_logs ({columns}) SELECT {columns} FROM moved"
+        ),
+        bounds,
+    ).rowcount
+    session.execute(text("ALTER TABLE event_logs ATTACH PARTITION event_logs_default DEFAULT"))
+    logger.info(f"Moved {moved} event logs from event_logs_default to {name}")
+
+
+def drop_expired_event_log_partitions(session: Session, retention_months: int, detach: bool = False) -> list[str]:
+    """
+    Drop (or detach) the monthly partitions entirely older than `retention_months` months.
+    The current month is never counted, so retention_months=12 keeps the last 12 full months.
+
+    Args:
+        session: Database session
+        retention_months: Months of history to keep (0 or less keeps everything)
+        detach: Detach partitions, leaving them as standalone tables, instead of dropping them
+
+    Returns:
+        Names of the partitions removed from event_logs
+    """
+    if retention_months <= 0:
+        return []
+    if not _lock_partitions(session):
+        session.rollback()
+        return []
+
+    cutoff = _month_start(datetime.date.today(), -retention_months)
+    removed = []
+
+    for name in list_event_log_partitions(session):
+        match = _PARTITION_NAME.match(name)
+        if not match or datetime.date(int(match[1]), int(match[2]), 1) >= cutoff:
+            continue
+        if detach:
+            session.execute(text(f"ALTER TABLE event_logs DETACH PARTITION {name}"))
+        else:
+            session.execute(text(f"DROP TABLE {name}"))
+        removed.append(name)
+
+    session.commit()
+    return removed
@@ -0,0 +1,153 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+import datetime
+
+from sqlalchemy import delete, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, aliased
+
+from ..models.stripe_webhook_event import StripeWebhookEventBase
+
+UNFINISHED_STATUSES = ("pending", "processing")
+
+
+def _event_values(event: dict) -> dict:
+    """Inbox row of a raw Stripe event (parsed JSON)."""
+    obj = event.get("data", {}).get("object", {})
+    customer_id = obj.get("id") if obj.get("object") == "customer" else obj.get("customer")
+    return {
+        "id": event["id"],
+        "type": event.get("type", ""),
+        "customer_id": customer_id if isinstance(customer_id, str) else None,
+        "payload": event,
+        "stripe_created_at": datetime.datetime.fromtimestamp(event.get("created") or 0, datetime.UTC),
+    }
+
+
+async def store_webhook_event_async(session: AsyncSession, event: dict) -> bool:
+    """Store a received event. Returns False if it was already stored (redelivery)."""
+    statement = (
+        insert(StripeWebhookEventBase)
+        .values(**_event_values(event))
+        .on_conflict_do_nothing(index_elements=[StripeWebhookEventBase.id])
+    )
+    result = await session.execute(statement)
+    await session.commit()
+    return result.rowcount > 0
+
+
+def store_webhook_events(session: Session, events: list[dict], requeue: bool = False) -> int:
+    """
+    Store events fetched from the Stripe API (replays). Events already stored are skipped, or
+    queued again for processing with `requeue`. Returns the number of events queued.
+    """
+    if not events:
+        return 0
+    statement = insert(StripeWebhookEventBase).values(
+        [{**_event_values(event), "next_attempt_at": datetime.datetime.now(datetime.UTC)} for event in events]
+    )
+    if requeue:
+        statement = statement.on_conflict_do_update(
+            index_elements=[StripeWebhookEventBase.id],
+            set_={
+                "status": "pending",
+                "attempts": 0,
+                "next_attempt_at": statement.excluded.next_attempt_at,
+                "last_error": None,
+                "processed_at": None,
+            },
+            # Do not steal an event being processed
+            where=StripeWebhookEventBase.status != "processing",
+        )
+    else:
+        statement = statement.on_conflict_do_nothing(index_elements=[StripeWebhookEventBase.id])
+    result = session.execute(statement)
+    session.commit()
+    return result.rowcount
+
+
+def claim_webhook_events(session: Session, limit: int, lease_seconds: float) -> list[dict]:
+    """
+    Claim up to `limit` due events for processing, skipping rows claimed by other workers.
+    Only the oldest unfinished event of each customer can be claimed, so the events of a customer
+    are processed one at a time, in creation order, across all workers. Claimed events are due
+    again after `lease_seconds` if the worker dies before recording the outcome.
+    """
+    now = datetime.datetime.now(datetime.UTC)
+    earlier = aliased(StripeWebhookEventBase)
+    event = StripeWebhookEventBase
+    due = (
+        select(event.id)
+        .where(
+            event.status.in_(UNFINISHED_STATUSES),
+            event.next_attempt_at <= now,
+            ~select(earlier.id)
+            .where(
+                earlier.customer_id == event.customer_id,
+                earlier.status.in_(UNFINISHED_STATUSES),
+                tuple_(earlier.stripe_created_at, earlier.id) < tuple_(event.stripe_created_at, event.id),
+            )
+            .exists(),
+        )
+        .order_by(event.stripe_created_at, event.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    claimed = session.execute(
+        update(event)
+        .where(event.id.in_(due.scalar_subquery()))
+        .values(
+            status="processing",
+            attempts=event.attempts + 1,
+            next_attempt_at=now + datetime.timedelta(seconds=lease_seconds),
+        )
+        .returning(event.id, event.type, event.customer_id, event.payload, event.attempts)
+        .execution_options(synchronize_session=False)
+    )
+    rows = [dict(row) for row in claimed.mappings()]
+    session.commit()
+    return rows
+
+
+def mark_webhook_event_processed(session: Session, event_id: str) -> None:
+    session.execute(
+        update(StripeWebhookEventBase)
+        .where(StripeWebhookEventBase.id == event_id)
+        .values(status="processed", processed_at=datetime.datetime.now(datetime.UTC), last_error=None)
+    )
+    session.commit()
+
+
+def mark_webhook_event_failed(session: Session, event_id: str, error: str, retry_at: datetime.datetime | None) -> None:
+    """Record a failed attempt: retried at `retry_at`, or failed for good if None."""
+    values = {"status": "pending", "next_attempt_at": retry_at} if retry_at else {"status": "failed"}
+    session.execute(
+        update(StripeWebhookEventBase).where(StripeWebhookEventBase.id == event_id).values(last_error=error, **values)
+    )
+    session.commit()
+
+
+def requeue_failed_webhook_events(session: Session, since: datetime.datetime | None = None) -> int:
+    """Queue failed events (received after `since`) for processing again. Returns the count."""
+    statement = update(StripeWebhookEventBase).where(StripeWebhookEventBase.status == "failed")
+    if since is not None:
+        statement = statement.where(StripeWebhookEventBase.received_at >= since)
+    result = session.execute(
+        statement.values(
+            status="pending", attempts=0, next_attempt_at=datetime.datetime.now(datetime.UTC), last_error=None
+        )
+    )
+    session.commit()
+    return result.rowcount
+
+
+def delete_processed_webhook_events(session: Session, before: datetime.datetime) -> int:
+    """Delete events processed before `before`. Returns the count."""
+    result = session.execute(
+        delete(StripeWebhookEventBase).where(
+            StripeWebhookEventBase.status == "processed", StripeWebhookEventBase.processed_at < before
+        )
+    )
+    session.commit()
+    return result.rowcount
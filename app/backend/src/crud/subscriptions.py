@@ -0,0 +1,54 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+import datetime
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..models.subscription import CustomerSyncBase, SubscriptionBase
+
+
+def upsert_subscription(session: Session, values: dict) -> bool:
+    """
+    Insert or update a mirrored subscription, unless the stored state was observed later.
+    Returns whether the row was written.
+    """
+    values = {**values, "synced_at": datetime.datetime.now(datetime.UTC)}
+    statement = insert(SubscriptionBase).values(**values)
+    statement = statement.on_conflict_do_update(
+        index_elements=[SubscriptionBase.id],
+        set_={name: statement.excluded[name] for name in values if name != "id"},
+        where=SubscriptionBase.observed_at <= statement.excluded.observed_at,
+    )
+    result = session.execute(statement)
+    session.commit()
+    return result.rowcount > 0
+
+
+def get_customer_subscriptions(session: Session, customer_id: str) -> list[SubscriptionBase]:
+    """Every mirrored subscription of a Stripe customer."""
+    return list(session.scalars(select(SubscriptionBase).where(SubscriptionBase.customer_id == customer_id)))
+
+
+def mark_customer_synced(session: Session, customer_id: str) -> None:
+    """Record that the customer's subscriptions were just fetched from Stripe, whether or not there were any."""
+    values = {"customer_id": customer_id, "synced_at": datetime.datetime.now(datetime.UTC)}
+    statement = insert(CustomerSyncBase).values(**values)
+    statement = statement.on_conflict_do_update(
+        index_elements=[CustomerSyncBase.customer_id], set_={"synced_at": statement.excluded.synced_at}
+    )
+    session.execute(statement)
+    session.commit()
+
+
+def get_customer_synced_at(session: Session, customer_id: str) -> datetime.datetime | None:
+    """When the customer's subscriptions were last fetched from Stripe, if ever."""
+    return session.scalar(select(CustomerSyncBase.synced_at).where(CustomerSyncBase.customer_id == customer_id))
+
+
+async def get_customer_subscriptions_async(session: AsyncSession, customer_id: str) -> list[SubscriptionBase]:
+    """Async variant of get_customer_subscriptions."""
+    result = await session.scalars(select(SubscriptionBase).where(SubscriptionBase.customer_id == customer_id))
+    return list(result)
@@ -0,0 +1,57 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+import datetime
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..models.token_revocation import TokenRevocationBase
+
+
+def upsert_token_revocation(session: Session, user_id: int, revoked_before: datetime.datetime) -> None:
+    """Revoke the user's tokens issued before `revoked_before`, replacing any earlier revocation."""
+    statement = insert(TokenRevocationBase).values(user_id=user_id, revoked_before=revoked_before)
+    statement = statement.on_conflict_do_update(
+        index_elements=[TokenRevocationBase.user_id],
+        set_={"revoked_before": statement.excluded.revoked_before},
+    )
+    session.execute(statement)
+    session.commit()
+
+
+def get_token_revocations_since(session: Session, since: datetime.datetime) -> list[tuple[int, datetime.datetime]]:
+    """(user_id, revoked_before) of the revocations made after `since`."""
+    return list(
+        session.execute(
+            select(TokenRevocationBase.user_id, TokenRevocationBase.revoked_before).where(
+                TokenRevocationBase.revoked_before > since
+            )
+        ).tuples()
+    )
+
+
+async def upsert_token_revocation_async(session: AsyncSession, user_id: int, revoked_before: datetime.datetime) -> None:
+    """Async variant of upsert_token_revocation."""
+    statement = insert(TokenRevocationBase).values(user_id=user_id, revoked_before=revoked_before)
+    statement = statement.on_conflict_do_update(
+        index_elements=[TokenRevocationBase.user_id],
+        set_={"revoked_before": statement.excluded.revoked_before},
+    )
+    await session.execute(statement)
+    await session.commit()
+
+
+async def get_token_revocation_async(session: AsyncSession, user_id: int) -> datetime.datetime | None:
+    """The user's revocation time, if any."""
+    return (
+        await session.execute(select(TokenRevocationBase.revoked_before).where(TokenRevocationBase.user_id == user_id))
+    ).scalar_one_or_none()
+
+
+def delete_token_revocations_before(session: Session, before: datetime.datetime) -> int:
+    """Delete revocations older than `before` (every token they revoke has expired). Returns the count."""
+    result = session.execute(delete(TokenRevocationBase).where(TokenRevocationBase.revoked_before < before))
+    session.commit()
+    return result.rowcount
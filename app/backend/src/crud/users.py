@@ -1,9 +1,14 @@
 # ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
 
-from sqlalchemy import select
+import datetime
+from collections.abc import Iterator
+
+from sqlalchemy import Select, func, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from ..models.user import UserBase
+from ..models.subscription import SubscriptionBase
+from ..models.user import UserBase, user_search_text
 
 
 def get_user_by_email(session: Session, email: str) -> UserBase | None:
@@ -69,3 +74,156 @@ def set_user_premium_status(session: Session, user: UserBase, is_premium: bool)
     """Update a user's premium status."""
     user.is_premium = is_premium
     session.commit()
+
+
+def iter_stripe_premium_status(session: Session, batch_size: int) -> Iterator:
+    """
+    Stream (id, stripe_id, is_premium) of every user with a Stripe customer.
+    Uses a server-side cursor: only `batch_size` rows are in memory.
+    """
+    result = session.execute(
+        select(UserBase.id, UserBase.stripe_id, UserBase.is_premium)
+        .where(UserBase.stripe_id.is_not(None))
+        .execution_options(yield_per=batch_size)
+    )
+    yield from result
+
+
+def set_users_premium_status(
+    session: Session, user_ids: list[int], is_premium: bool, mirrored_before: datetime.datetime
+) -> int:
+    """
+    Set is_premium on the given users in one statement. Users whose subscriptions were mirrored
+    at or after `mirrored_before` (by a webhook or refresh) are skipped: their status is more recent.
+    Returns the number of users updated.
+    """
+    mirrored_since = (
+        select(SubscriptionBase.id)
+        .where(SubscriptionBase.customer_id == UserBase.stripe_id, SubscriptionBase.synced_at >= mirrored_before)
+        .exists()
+    )
+    result = session.execute(
+        update(UserBase)
+        .where(UserBase.id.in_(user_ids), UserBase.is_premium.is_distinct_from(is_premium), ~mirrored_since)
+        .values(is_premium=is_premium)
+        .execution_options(synchronize_session=False)
+    )
+    session.commit()
+    return result.rowcount
+
+
+def get_user_counts(session: Session) -> dict[str, int]:
+    """Count all, admin and premium users in a single pass over the table."""
+    row = session.execute(
+        select(
+            func.count(UserBase.id).label("total"),
+            func.count(UserBase.id).filter(UserBase.is_admin).label("admins"),
+            func.count(UserBase.id).filter(UserBase.is_premium).label("premium"),
+        )
+    ).one()
+    return {"total": row.total, "admins": row.admins, "premium": row.premium}
+
+
+# ============================================================================
+# Async variants (for `async def` endpoints using get_async_session)
+# ============================================================================
+
+
+async def get_user_by_email_async(session: AsyncSession, email: str) -> UserBase | None:
+    """Retrieve a user by their email."""
+    return (await session.execute(select(UserBase).where(UserBase.email == email))).scalar_one_or_none()
+
+
+async def create_user_async(session: AsyncSession, user: UserBase) -> None:
+    """Add a new user to the database."""
+    session.add(user)
+    await session.commit()
+
+
+async def get_user_by_id_async(session: AsyncSession, user_id: int) -> UserBase | None:
+    """Retrieve a user by their ID."""
+    return await session.get(UserBase, user_id)
+
+
+async def update_user_async(session: AsyncSession, user: UserBase) -> None:
+    """Commit changes to an existing user."""
+    await session.commit()
+
+
+async def delete_user_async(session: AsyncSession, user: UserBase) -> None:
+    """Delete a user from the database."""
+    await session.delete(user)
+    await session.commit()
+
+
+async def is_email_taken_async(session: AsyncSession, email: str) -> bool:
+    """Check if an email is already registered in the database."""
+    return await get_user_by_email_async(session, email) is not None
+
+
+async def set_password_reset_token_async(session: AsyncSession, user: UserBase, token: str) -> None:
+    """Set a password reset token for a user."""
+    user.password_reset_token = token
+    await session.commit()
+
+
+async def reset_password_async(session: AsyncSession, user: UserBase, new_password: str) -> None:
+    """Reset a user's password and clear their reset token."""
+    user.hashed_password = new_password
+    user.password_reset_token = None
+    await session.commit()
+
+
+async def get_user_by_stripe_id_async(session: AsyncSession, stripe_id: str) -> UserBase | None:
+    """Retrieve a user by their Stripe customer ID."""
+    return (await session.execute(select(UserBase).where(UserBase.stripe_id == stripe_id))).scalar_one_or_none()
+
+
+async def set_user_premium_status_async(session: AsyncSession, user: UserBase, is_premium: bool) -> None:
+    """Update a user's premium status."""
+    user.is_premium = is_premium
+    await session.commit()
+
+
+async def estimate_user_count_async(session: AsyncSession) -> int | None:
+    """
+    Estimate the number of users from planner statistics (pg_class.reltuples), without scanning the table.
+    Returns None if the table has never been analyzed.
+    """
+    estimate = await session.scalar(text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass('users')"))
+    return estimate if estimate is not None and estimate >= 0 else None
+
+
+async def count_users_capped_async(session: AsyncSession, query: Select, cap: int) -> tuple[int, bool]:
+    """
+    Count the rows of a user query, stopping after `cap` rows.
+
+    Returns:
+        Tuple of (count, whether the cap was reached, i.e. there are at least `count` rows)
+    """
+    count = await session.scalar(select(func.count()).select_from(query.limit(cap + 1).subquery()))
+    return min(count, cap), count > cap
+
+
+def _escape_like(term: str) -> str:
+    """Escape LIKE wildcards with "/" (avoids backslash quoting differences between connections)."""
+    return term.replace("/", "//").replace("%", "/%").replace("_", "/_")
+
+
+def user_search_filter(term: str):
+    """
+    Match users whose email or name contains `term` (case-insensitive).
+    Backed by the ix_users_search_trgm trigram index.
+    """
+    return user_search_text.ilike(f"%{_escape_like(term.strip().lower())}%", escape="/")
+
+
+def user_search_rank(term: str):
+    """Relevance of a user for `term` (pg_trgm word similarity), higher is better."""
+    return func.word_similarity(term.strip().lower(), user_search_text)
+
+
+async def get_user_by_exact_email_async(session: AsyncSession, query: Select, email: str) -> UserBase | None:
+    """Find the user of a query with exactly this email (unique index lookup)."""
+    emails = {email.strip(), email.strip().lower()}
+    return (await session.scalars(query.where(UserBase.email.in_(emails)))).first()
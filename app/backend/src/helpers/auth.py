@@ -1,48 +1,102 @@
 # ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
 
 import hashlib
-import hmac
 import os
 from datetime import UTC, datetime, timedelta
 
 import jwt
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, Request
 from fastapi.security import OAuth2PasswordBearer
 
 from ..constants import (
     JWT_ACCESS_TOKEN_EXPIRE_MINUTES,
     JWT_ALGORITHM,
     JWT_SECRET_KEY,
-    PASSWORD_HASH_SECRET_KEY,
 )
 from ..models.user import UserBase, UserRead, UserTokenUpdate
+from .cache import TTLCache
+from .db import mark_recent_write
 from .exception import InvalidTokenException
+from .last_seen import last_seen_tracker
+from .password_hashing import password_hasher
+from .token_revocation import token_revocations
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/login")
 
+# Verified token payloads, keyed by the token's SHA-256 and kept until the token expires (per worker)
+TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE") or 10000)
+token_cache = TTLCache(ttl=JWT_ACCESS_TOKEN_EXPIRE_MINUTES * 60, maxsize=TOKEN_CACHE_SIZE)
+
 
 def hash_password(password: str) -> str:
     """
-    Hash the password using HMAC with a secret key.
+    Hash the password with peppered bcrypt in the password hashing pool.
+    Blocks the calling thread: use hash_password_async from async endpoints.
     """
-    return hmac.new(PASSWORD_HASH_SECRET_KEY, password.encode("utf-8"), hashlib.sha256).hexdigest()
+    return password_hasher.hash(password)
 
 
 def verify_password(password: str, hashed_password: str) -> bool:
     """
-    Verify if the provided password matches the hashed password.
+    Verify if the provided password matches the hashed password (bcrypt or legacy HMAC).
+    Blocks the calling thread: use verify_password_async from async endpoints.
+    """
+    return password_hasher.verify(password, hashed_password)
+
+
+async def hash_password_async(password: str) -> str:
+    """
+    Hash the password with peppered bcrypt in the password hashing pool.
     """
-    return hmac.compare_digest(hashed_password, hash_password(password))
+    return await password_hasher.hash_async(password)
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserRead:
+async def verify_password_async(password: str, hashed_password: str) -> bool:
+    """
+    Verify if the provided password matches the hashed password (bcrypt or legacy HMAC).
+    """
+    return await password_hasher.verify_async(password, hashed_password)
+
+
+def get_request_token_payload(request: Request, token: str) -> dict:
+    """
+    Decode the token at most once per request: the payload is memoized on request.state.
+    Raises InvalidTokenException if the token is expired or invalid.
+    """
+    payloads = getattr(request.state, "token_payloads", None)
+    if payloads is None:
+        payloads = request.state.token_payloads = {}
+    if token not in payloads:
+        payloads[token] = decode_access_token(token)
+    return payloads[token]
+
+
+async def get_token_payload(request: Request, token: str = Depends(oauth2_scheme)) -> dict:
+    """
+    Get the verified payload of the bearer token.
+    Raises InvalidTokenException if the token is expired, invalid or revoked.
+    """
+    payload = get_request_token_payload(request, token)
+    if await token_revocations.is_revoked(payload):
+        raise InvalidTokenException("Token has been revoked")
+    return payload
+
+
+async def get_current_user(request: Request, token_decoded: dict = Depends(get_token_payload)) -> UserRead:
     """
     Get the current user from the JWT token.
 
     Decodes the JWT, retrieves the user by email, and returns the user.
     If the user is not found or the token is invalid, raises an exception.
-    """
-    token_decoded = decode_access_token(token)
+    Records the user on request.state and their activity for last_seen_at (except while
+    impersonated), and pins their reads to the primary database for a short while when the
+    request may write (non-safe HTTP method).
+    """
+    request.state.user_id = token_decoded["id"]
+    if not token_decoded["data"].get("real_admin_id"):
+        last_seen_tracker.touch(token_decoded["id"])
+    if request.method not in ("GET", "HEAD", "OPTIONS"):
+        mark_recent_write(token_decoded["id"])
     return UserRead(
         id=token_decoded["id"],
         email=token_decoded["sub"],
@@ -64,24 +118,24 @@ async def get_current_admin(current_user: UserRead = Depends(get_current_user))
     return current_user
 
 
-async def get_real_admin_id(token: str = Depends(oauth2_scheme)) -> int | None:
+async def get_real_admin_id(token_decoded: dict = Depends(get_token_payload)) -> int | None:
     """
     Get the real admin ID from an impersonation token.
 
     Returns the real_admin_id if the token contains impersonation info, else None.
     """
-    token_decoded = decode_access_token(token)
     return token_decoded["data"].get("real_admin_id")
 
 
-def get_current_user_optional(
+async def get_current_user_optional(
+    request: Request,
     token: str | None = Depends(oauth2_scheme),
 ) -> UserBase | None:
     """
     Retrieve the current user if the token is provided, otherwise return None.
     If no token is passed, the user is considered unauthenticated.
     """
-    return get_current_user(token) if token else None
+    return await get_current_user(request, await get_token_payload(request, token)) if token else None
 
 
 def create_access_token(
@@ -97,7 +151,8 @@ def create_access_token(
         user: The user to create the token for (the admin when impersonating)
         impersonating_as: If set, the token will contain impersonation info for this user
     """
-    exp = datetime.now(UTC) + timedelta(minutes=JWT_ACCESS_TOKEN_EXPIRE_MINUTES)
+    now = datetime.now(UTC)
+    exp = now + timedelta(minutes=JWT_ACCESS_TOKEN_EXPIRE_MINUTES)
 
     # When impersonating, the token represents the target user but tracks the admin
     effective_user = impersonating_as if impersonating_as else user
@@ -107,6 +162,7 @@ def create_access_token(
         "id": effective_user.id,  # Top-level claim for user ID
         "sub": effective_user.email,  # OAuth2 subject (typically email or UUID)
         "exp": int(exp.timestamp()),  # Expiration timestamp
+        "iat": now.timestamp(),  # Issue time, compared with revocations (sub-second so a new login is never revoked)
         "data": {  # Encapsulated custom claims
             "email": effective_user.email,
             "first_name": effective_user.first_name,
@@ -122,7 +178,7 @@ def create_access_token(
 
     token_parsed = dict(
         user=effective_user,
-        created_at=datetime.now(UTC),
+        created_at=now,
         expires_at=exp,
         real_admin_id=user.id if impersonating_as else None,
     )
@@ -135,9 +191,15 @@ def decode_access_token(token: str) -> dict:
     Decode and validate a JWT token.
 
     Returns the token's payload if valid, otherwise raises an exception if the token is expired or invalid.
+    Verified payloads are cached until the token expires: callers must not modify them.
     """
+    key = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(key)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+        token_cache.set(key, payload, expires_at=payload.get("exp"))
         return payload
     except jwt.ExpiredSignatureError:
         raise InvalidTokenException("Token has expired") from None
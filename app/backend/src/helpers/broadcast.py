@@ -0,0 +1,175 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+"""
+Newsletter broadcasts to every user with newsletter_on.
+
+A broadcast is created by an admin (POST /admin/broadcasts) and sent by the broadcast task of
+whichever worker claims it. The template is rendered once with recipient placeholders, opted-in
+users are streamed in id order with a server-side cursor, and each batch of BROADCAST_BATCH_SIZE
+recipients is one provider call (Mailgun recipient variables), EMAIL_BROADCAST_CONCURRENCY calls
+at a time. Progress and throughput are checkpointed after each batch, in order, so an interrupted
+run resumes after the last fully sent batch (a few batches may be sent twice, never skipped).
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from ..crud.broadcasts import (
+    checkpoint_broadcast,
+    claim_broadcast,
+    finish_broadcast,
+    iter_newsletter_recipients,
+    release_broadcast,
+)
+from .db import SessionLocal
+from .email import EMAIL_BROADCAST_CONCURRENCY, EmailDeliveryError, email_backend, render_broadcast
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+BROADCAST_BATCH_SIZE = min(1000, int(os.environ.get("BROADCAST_BATCH_SIZE") or 1000))  # Mailgun allows 1000
+BROADCAST_POLL_SECONDS = 30
+BROADCAST_LEASE_SECONDS = 300  # A running broadcast without checkpoint for this long is taken over
+BROADCAST_MAX_ATTEMPTS = 5  # Per batch, for retryable errors (rate limits, 5xx, network)
+BROADCAST_RETRY_MAX_SECONDS = 60
+
+
+class BroadcastSender:
+    """Sends claimed broadcasts with a bounded number of batches in flight."""
+
+    def __init__(self, concurrency: int, batch_size: int):
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self._executor = ThreadPoolExecutor(concurrency, thread_name_prefix="broadcast")
+        self._run_lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def _send_batch(
+        self, subject: str, body: str, html_body: str | None, recipients: list[dict]
+    ) -> tuple[int, str | None] | None:
+        """
+        Send one batch, retrying retryable errors. Returns (failed recipients, error),
+        or None if the sender is shutting down before the batch could be sent.
+        """
+        attempt = 1
+        while True:
+            if self._stopping.is_set():
+                return None
+            try:
+                return email_backend.send_batch(recipients, subject, body, html_body), None
+            except EmailDeliveryError as e:
+                if not e.retryable or attempt == BROADCAST_MAX_ATTEMPTS:
+                    logger.error(f"Broadcast batch of {len(recipients)} failed after {attempt} attempts: {e}")
+                    return len(recipients), str(e)
+                self._stopping.wait(min(BROADCAST_RETRY_MAX_SECONDS, 2**attempt))
+                attempt += 1
+            except Exception as e:
+                # Unexpected errors (bad header, template, bug) would fail again: the batch is failed
+                logger.error(f"Broadcast batch of {len(recipients)} crashed: {e}")
+                return len(recipients), str(e)
+
+    def run(self) -> int | None:
+        """
+        Claim and send one broadcast. Returns its id, or None if there was nothing to send.
+        Concurrent calls in the same process return immediately.
+        """
+        if not self._run_lock.acquire(blocking=False):
+            return None
+        try:
+            with SessionLocal() as session:
+                broadcast = claim_broadcast(session, BROADCAST_LEASE_SECONDS)
+            if broadcast is None:
+                return None
+            self._send(broadcast)
+            return broadcast["id"]
+        finally:
+            self._run_lock.release()
+
+    def _send(self, broadcast: dict) -> None:
+        broadcast_id = broadcast["id"]
+        try:
+            body, html_body = render_broadcast(broadcast["template"])
+        except Exception as e:
+            with SessionLocal() as session:
+                finish_broadcast(session, broadcast_id, error=f"Rendering failed: {e}")
+            return
+
+        logger.info(f"Sending broadcast {broadcast_id} after user {broadcast['last_user_id']}")
+        started = time.monotonic()
+        sent_this_run = 0
+        # Batches in flight, in user id order: (future, last user id of the batch, batch size)
+        in_flight: deque[tuple[Future, int, int]] = deque()
+
+        def complete_oldest() -> bool:
+            """Wait for the oldest batch and checkpoint it. Returns False if the broadcast must stop."""
+            nonlocal sent_this_run
+            future, last_user_id, size = in_flight.popleft()
+            outcome = future.result()
+            if outcome is None:
+                return False  # Not sent: later batches must not be checkpointed past it
+            failed, error = outcome
+            sent_this_run += size - failed
+            with SessionLocal() as session:
+                return checkpoint_broadcast(
+                    session,
+                    broadcast_id,
+                    last_user_id=last_user_id,
+                    sent=size - failed,
+                    failed=failed,
+                    batches=1,
+                    recipients_per_second=sent_this_run / max(time.monotonic() - started, 1e-3),
+                    error=error,
+                )
+
+        running = True
+        stream_error = None
+        try:
+            # Separate session: the server-side cursor stays open while checkpoints are committed
+            with SessionLocal() as stream_session:
+                for rows in iter_newsletter_recipients(stream_session, broadcast["last_user_id"], self.batch_size):
+                    recipients = [
+                        {"email": row.email, "first_name": row.first_name, "last_name": row.last_name or ""}
+                        for row in rows
+                    ]
+                    future = self._executor.submit(self._send_batch, broadcast["subject"], body, html_body, recipients)
+                    in_flight.append((future, rows[-1].id, len(rows)))
+                    if len(in_flight) >= self.concurrency:
+                        running = complete_oldest()
+                    if not running or self._stopping.is_set():
+                        break
+        except Exception as e:
+            # Without this, the broadcast would stay running and crash again on every takeover
+            logger.error(f"Broadcast {broadcast_id} stream failed: {e}")
+            stream_error = f"Sending failed: {e}"
+
+        # Once a batch is not checkpointed, later ones are not either (they are sent again on resume)
+        while in_flight:
+            if running:
+                running = complete_oldest()
+            else:
+                in_flight.popleft()[0].result()
+
+        with SessionLocal() as session:
+            if self._stopping.is_set():
+                release_broadcast(session, broadcast_id)
+                logger.info(f"Broadcast {broadcast_id} paused for shutdown")
+            elif not running:
+                logger.info(f"Broadcast {broadcast_id} stopped: cancelled or taken over")
+            elif stream_error:
+                finish_broadcast(session, broadcast_id, error=stream_error)
+            else:
+                finish_broadcast(session, broadcast_id)
+                logger.info(f"Broadcast {broadcast_id} done in {time.monotonic() - started:.0f}s")
+
+    def shutdown(self) -> None:
+        """Stop after the batches in flight (checkpointed, and released to be resumed by any worker)."""
+        self._stopping.set()
+        with self._run_lock:
+            self._executor.shutdown(wait=True)
+
+
+broadcast_sender = BroadcastSender(EMAIL_BROADCAST_CONCURRENCY, BROADCAST_BATCH_SIZE)
@@ -1,17 +1,225 @@
 # ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
 
 import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
 
-from sqlalchemy import create_engine
+from fastapi import Request
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from ..constants import IS_PROD
 
 Base = declarative_base()
 
-db_url = f"postgresql://{os.environ["APP_DB_USER"]}:{os.environ["APP_DB_PASSWORD"]}@db/{os.environ["APP_DB_NAME"]}"
-engine = create_engine(db_url, echo=True)
+db_credentials = f"{os.environ["APP_DB_USER"]}:{os.environ["APP_DB_PASSWORD"]}@db/{os.environ["APP_DB_NAME"]}"
+
+# Optional streaming replica (same credentials and database name) used by read-only endpoints
+DB_REPLICA_HOST = os.environ.get("APP_DB_REPLICA_HOST", "")
+DB_REPLICA_STICKY_SECONDS = float(os.environ.get("DB_REPLICA_STICKY_SECONDS") or 10)
+
+# Engine profile (per engine, so one uvicorn worker holds at most pool_size + max_overflow connections per engine)
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE") or 5)
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW") or 10)
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT") or 30)
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE") or 1800)
+DB_POOL_PRE_PING = (os.environ.get("DB_POOL_PRE_PING") or "true").lower() == "true"
+DB_STATEMENT_CACHE_SIZE = int(os.environ.get("DB_STATEMENT_CACHE_SIZE") or 500)
+DB_ECHO = (os.environ.get("DB_ECHO") or ("false" if IS_PROD else "true")).lower() == "true"
+
+
+class _PoolWaitStats:
+    """Thread-safe accumulator for time spent waiting on pool checkouts."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float, timed_out: bool) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += int(timed_out)
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+
+class _InstrumentedPoolMixin:
+    """Measures how long each checkout waits for a connection (including connection establishment)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = _PoolWaitStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            timed_out = True
+            raise
+        finally:
+            self.wait_stats.record(time.perf_counter() - start, timed_out)
+
+    def recreate(self):
+        # Keep accumulated stats when the pool is recreated (e.g. after engine.dispose())
+        pool = super().recreate()
+        pool.wait_stats = self.wait_stats
+        return pool
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncAdaptedQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+_engine_options = dict(
+    echo=DB_ECHO,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+    query_cache_size=DB_STATEMENT_CACHE_SIZE,
+)
+
+# Sync engine (psycopg2) used by regular `def` endpoints running in the threadpool
+db_url = f"postgresql://{db_credentials}"
+engine = create_engine(db_url, poolclass=InstrumentedQueuePool, **_engine_options)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine (asyncpg) used by `async def` endpoints running on the event loop.
+# Objects stay usable after commit since lazy loading is not available in async code.
+async_db_url = f"postgresql+asyncpg://{db_credentials}?prepared_statement_cache_size={DB_STATEMENT_CACHE_SIZE}"
+async_engine = create_async_engine(async_db_url, poolclass=InstrumentedAsyncAdaptedQueuePool, **_engine_options)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+# Engines reported by get_pool_stats(), by name
+pooled_engines = {
+    "primary": engine,
+    "primary_async": async_engine.sync_engine,
+}
+
+# Users who wrote recently -> monotonic deadline until which their reads stay on the primary.
+# Tracked per worker process: a read served by another worker may still hit a lagging replica.
+_recent_writers: dict[int, float] = {}
+_RECENT_WRITERS_PRUNE_SIZE = 10_000
+
+
+def mark_recent_write(user_id: int) -> None:
+    """Keep the user's reads on the primary for DB_REPLICA_STICKY_SECONDS (read-your-writes)."""
+    if not DB_REPLICA_HOST:
+        return
+    now = time.monotonic()
+    if len(_recent_writers) >= _RECENT_WRITERS_PRUNE_SIZE:
+        for expired_user_id in [uid for uid, deadline in _recent_writers.items() if deadline < now]:
+            _recent_writers.pop(expired_user_id, None)
+    _recent_writers[user_id] = now + DB_REPLICA_STICKY_SECONDS
+
+
+def _wrote_recently(user_id: int | None) -> bool:
+    deadline = _recent_writers.get(user_id)
+    return deadline is not None and deadline >= time.monotonic()
+
+
+class RoutingSession(Session):
+    """
+    Session for read-only endpoints.
+    Statements go to the replica, unless the session is flushing or the authenticated caller
+    wrote recently (see mark_recent_write). The caller is resolved lazily from request.state,
+    which get_current_user fills in before the endpoint body runs.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        request = self.info.get("request")
+        user_id = getattr(request.state, "user_id", None) if request else None
+        if self._flushing or _wrote_recently(user_id):
+            return self.info["primary"]
+        return self.info["replica"]
+
+
+if DB_REPLICA_HOST:
+    replica_credentials = db_credentials.replace("@db/", f"@{DB_REPLICA_HOST}/", 1)
+    replica_engine = create_engine(
+        f"postgresql://{replica_credentials}", poolclass=InstrumentedQueuePool, **_engine_options
+    )
+    async_replica_engine = create_async_engine(
+        f"postgresql+asyncpg://{replica_credentials}?prepared_statement_cache_size={DB_STATEMENT_CACHE_SIZE}",
+        poolclass=InstrumentedAsyncAdaptedQueuePool,
+        **_engine_options,
+    )
+    ReadSessionLocal = sessionmaker(
+        class_=RoutingSession,
+        autocommit=False,
+        autoflush=False,
+        info={"primary": engine, "replica": replica_engine},
+    )
+    AsyncReadSessionLocal = async_sessionmaker(
+        sync_session_class=RoutingSession,
+        autoflush=False,
+        expire_on_commit=False,
+        info={"primary": async_engine.sync_engine, "replica": async_replica_engine.sync_engine},
+    )
+    pooled_engines["replica"] = replica_engine
+    pooled_engines["replica_async"] = async_replica_engine.sync_engine
+else:
+    async_replica_engine = None
+    ReadSessionLocal = SessionLocal
+    AsyncReadSessionLocal = AsyncSessionLocal
+
+
+def get_pool_stats() -> dict[str, dict]:
+    """
+    Snapshot of every connection pool in this worker.
+
+    Returns:
+        Dict of engine name -> pool size, checked out/in connections, overflow in use and checkout wait times
+    """
+    stats = {}
+    for name, pooled_engine in pooled_engines.items():
+        pool = pooled_engine.pool
+        wait_stats = pool.wait_stats
+        stats[name] = {
+            "pool_size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(0, pool.overflow()),
+            "checkouts": wait_stats.checkouts,
+            "timeouts": wait_stats.timeouts,
+            "wait_avg_ms": wait_stats.total_wait / wait_stats.checkouts * 1000 if wait_stats.checkouts else 0.0,
+            "wait_max_ms": wait_stats.max_wait * 1000,
+        }
+    return stats
+
+
+@contextmanager
+def advisory_lock(name: str) -> Iterator[bool]:
+    """
+    Try to take a Postgres advisory lock named `name`, held for the duration of the block on a
+    dedicated connection (outside any transaction). Yields False if another process holds it.
+    The lock is released with the connection if the process dies.
+    """
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        acquired = connection.execute(text("SELECT pg_try_advisory_lock(hashtext(:name))"), {"name": name}).scalar()
+        try:
+            yield bool(acquired)
+        finally:
+            if acquired:
+                connection.execute(text("SELECT pg_advisory_unlock(hashtext(:name))"), {"name": name})
+
 
 def create_db_and_tables():
     Base.metadata.create_all(engine)
@@ -20,3 +228,23 @@ def create_db_and_tables():
 def get_session():
     with SessionLocal() as session:
         yield session
+
+
+async def get_async_session():
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+def get_read_session(request: Request):
+    """
+    Session for read-only endpoints, served by the replica when APP_DB_REPLICA_HOST is set.
+    Endpoints using it must not write.
+    """
+    with ReadSessionLocal(info={"request": request}) as session:
+        yield session
+
+
+async def get_async_read_session(request: Request):
+    """Async variant of get_read_session."""
+    async with AsyncReadSessionLocal(info={"request": request}) as session:
+        yield session
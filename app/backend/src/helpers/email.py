@@ -2,15 +2,32 @@
 
 """
 Email helper module with Jinja2 template support.
-Provides functions for sending transactional emails via Mailgun.
+Transactional emails are queued in the email_outbox table from request handlers, and delivered
+in the background by the outbox worker (helpers.email_outbox) with the backend set by EMAIL_BACKEND:
+- mailgun: Mailgun HTTP API (default when MAILGUN_API_KEY is set)
+- file: .eml files in EMAIL_FILE_DIR (default otherwise)
+- smtp: plain SMTP to EMAIL_SMTP_HOST:EMAIL_SMTP_PORT, e.g. a local Mailpit
+Newsletter broadcasts (helpers.broadcast) send one message per batch of recipients with Mailgun
+recipient variables, and one message per recipient with the other backends.
 """
 
+import abc
+import html
+import json
 import logging
 import os
+import smtplib
+import time
+import uuid
+from email.message import EmailMessage
 from pathlib import Path
 
 import requests
 from jinja2 import Environment, FileSystemLoader, TemplateNotFound
+from requests.adapters import HTTPAdapter
+from sqlalchemy.orm import Session
+
+from ..crud.email_outbox import create_outbox_email
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +39,18 @@ MAILGUN_FROM_NAME = os.environ.get("MAILGUN_FROM_NAME", "App")
 MAILGUN_FROM_EMAIL = f"no-reply@{MAILGUN_DOMAIN}" if MAILGUN_DOMAIN else ""
 MAILGUN_API_BASEURL = f"https://api.eu.mailgun.net/v3/{MAILGUN_DOMAIN}"
 
+EMAIL_BACKEND = os.environ.get("EMAIL_BACKEND") or ("mailgun" if MAILGUN_ENABLED else "file")
+EMAIL_FROM = f"{MAILGUN_FROM_NAME} <{MAILGUN_FROM_EMAIL or 'no-reply@localhost'}>"
+EMAIL_FILE_DIR = os.environ.get("EMAIL_FILE_DIR") or "/tmp/emails"
+EMAIL_SMTP_HOST = os.environ.get("EMAIL_SMTP_HOST") or "localhost"
+EMAIL_SMTP_PORT = int(os.environ.get("EMAIL_SMTP_PORT") or 1025)
+EMAIL_TIMEOUT_SECONDS = 10
+EMAIL_WORKER_CONCURRENCY = int(os.environ.get("EMAIL_WORKER_CONCURRENCY") or 4)  # Parallel deliveries per worker
+EMAIL_BROADCAST_CONCURRENCY = int(os.environ.get("EMAIL_BROADCAST_CONCURRENCY") or 4)  # Parallel broadcast batches
+
+# Per-recipient variables available to broadcast templates, as `recipient.<name>`
+RECIPIENT_VARIABLES = ("email", "first_name", "last_name")
+
 PUBLIC_URL = os.environ.get("PUBLIC_URL", "")
 APP_NAME = os.environ.get("APP_NAME", "App")
 
@@ -62,6 +91,192 @@ def _render_template(name: str, **context) -> str | None:
     return template.render(**default_context, **context)
 
 
+class EmailDeliveryError(Exception):
+    """Delivery failure. `retryable` failures (network, rate limits, 5xx) are retried by the outbox."""
+
+    def __init__(self, message: str, retryable: bool):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def _build_message(to_email: str, subject: str, body: str, html_body: str | None) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = EMAIL_FROM
+    message["To"] = to_email
+    message["Subject"] = subject
+    message.set_content(body)
+    if html_body:
+        message.add_alternative(html_body, subtype="html")
+    return message
+
+
+def _recipient_placeholders(prefix: str = "") -> dict[str, str]:
+    return {name: f"%recipient.{prefix}{name}%" for name in RECIPIENT_VARIABLES}
+
+
+def _recipient_values(recipient: dict[str, str]) -> dict[str, str]:
+    """Values of the placeholders rendered by render_broadcast: raw for text, escaped for HTML."""
+    values = {name: recipient.get(name) or "" for name in RECIPIENT_VARIABLES}
+    return values | {f"html_{name}": html.escape(value) for name, value in values.items()}
+
+
+def _substitute(template: str, values: dict[str, str]) -> str:
+    for name, value in values.items():
+        template = template.replace(f"%recipient.{name}%", value)
+    return template
+
+
+class EmailBackend(abc.ABC):
+    """Delivers one message. Raises EmailDeliveryError on failure."""
+
+    name = ""
+
+    @abc.abstractmethod
+    def send(self, to_email: str, subject: str, body: str, html_body: str | None = None) -> None:
+        """Send one message, raising EmailDeliveryError (retryable or not) if it could not be delivered."""
+
+    def send_batch(self, recipients: list[dict[str, str]], subject: str, body: str, html_body: str | None) -> int:
+        """
+        Send a message rendered by render_broadcast to each recipient (dicts of RECIPIENT_VARIABLES).
+        Returns the number of recipients that could not be sent to; raises EmailDeliveryError if the
+        whole batch failed. Default: one message per recipient, failures are counted.
+        """
+        failed = 0
+        for recipient in recipients:
+            values = _recipient_values(recipient)
+            try:
+                self.send(
+                    recipient["email"],
+                    _substitute(subject, values),
+                    _substitute(body, values),
+                    _substitute(html_body, values) if html_body else None,
+                )
+            except EmailDeliveryError as e:
+                logger.warning(f"Broadcast email to {recipient['email']} failed: {e}")
+                failed += 1
+        return failed
+
+
+class MailgunBackend(EmailBackend):
+    """Mailgun HTTP API over a pooled keep-alive session shared by the delivery threads."""
+
+    name = "mailgun"
+
+    def __init__(self, pool_size: int):
+        self.http = requests.Session()
+        self.http.auth = ("api", MAILGUN_API_KEY)
+        self.http.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+
+    def send(self, to_email: str, subject: str, body: str, html_body: str | None = None) -> None:
+        data = {
+            "from": EMAIL_FROM,
+            "to": [to_email],
+            "subject": subject,
+            "text": body,
+        }
+        if html_body:
+            data["html"] = html_body
+        self.post_message(data)
+
+    def send_batch(self, recipients: list[dict[str, str]], subject: str, body: str, html_body: str | None) -> int:
+        """One API call per batch (up to 1000 recipients): Mailgun substitutes the recipient variables."""
+        data = {
+            "from": EMAIL_FROM,
+            "to": [recipient["email"] for recipient in recipients],
+            "subject": subject,
+            "text": body,
+            # Also makes Mailgun send one message per recipient instead of one message to all of them
+            "recipient-variables": json.dumps(
+                {recipient["email"]: _recipient_values(recipient) for recipient in recipients}
+            ),
+        }
+        if html_body:
+            data["html"] = html_body
+        self.post_message(data)
+        return 0
+
+    def post_message(self, data: dict) -> None:
+        """POST a message to the Mailgun API, classifying errors."""
+        try:
+            response = self.http.post(f"{MAILGUN_API_BASEURL}/messages", data=data, timeout=EMAIL_TIMEOUT_SECONDS)
+        except requests.RequestException as e:
+            raise EmailDeliveryError(f"Mailgun request error: {e}", retryable=True) from e
+
+        if response.status_code != 200:
+            retryable = response.status_code == 429 or response.status_code >= 500
+            raise EmailDeliveryError(f"Mailgun error: {response.status_code} - {response.text}", retryable=retryable)
+
+
+class FileBackend(EmailBackend):
+    """Writes each message as an .eml file (development and tests)."""
+
+    name = "file"
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+
+    def send(self, to_email: str, subject: str, body: str, html_body: str | None = None) -> None:
+        message = _build_message(to_email, subject, body, html_body)
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            (self.directory / f"{time.time_ns()}-{uuid.uuid4().hex[:8]}.eml").write_bytes(bytes(message))
+        except OSError as e:
+            raise EmailDeliveryError(f"Could not write email file: {e}", retryable=True) from e
+
+
+class SmtpBackend(EmailBackend):
+    """Plain SMTP without authentication, for a local catcher such as Mailpit (development and tests)."""
+
+    name = "smtp"
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+
+    def send(self, to_email: str, subject: str, body: str, html_body: str | None = None) -> None:
+        message = _build_message(to_email, subject, body, html_body)
+        try:
+            with smtplib.SMTP(self.host, self.port, timeout=EMAIL_TIMEOUT_SECONDS) as smtp:
+                smtp.send_message(message)
+        except smtplib.SMTPResponseException as e:
+            raise EmailDeliveryError(
+                f"SMTP error: {e.smtp_code} {e.smtp_error}", retryable=400 <= e.smtp_code < 500
+            ) from e
+        except (OSError, smtplib.SMTPException) as e:
+            raise EmailDeliveryError(f"SMTP error: {e}", retryable=True) from e
+
+
+def _create_backend(name: str) -> EmailBackend:
+    if name == "mailgun":
+        return MailgunBackend(EMAIL_WORKER_CONCURRENCY + EMAIL_BROADCAST_CONCURRENCY)
+    if name == "file":
+        return FileBackend(EMAIL_FILE_DIR)
+    if name == "smtp":
+        return SmtpBackend(EMAIL_SMTP_HOST, EMAIL_SMTP_PORT)
+    raise ValueError(f"Unknown EMAIL_BACKEND: {name}")
+
+
+email_backend = _create_backend(EMAIL_BACKEND)
+
+
+def render_broadcast(template: str) -> tuple[str, str | None]:
+    """
+    Render a broadcast once for all recipients: templates/email/broadcast/<template>.txt (required)
+    and .html (optional), with `recipient.<name>` rendered as Mailgun-style `%recipient.<name>%`
+    placeholders (HTML-escaped values in the HTML part). Broadcast subjects may use the same placeholders.
+    Returns (text body, HTML body).
+    """
+    text_body = _render_template(f"broadcast/{template}.txt", recipient=_recipient_placeholders())
+    if text_body is None:
+        raise ValueError(f"Broadcast template not found: broadcast/{template}.txt")
+    html_body = _render_template(f"broadcast/{template}.html", recipient=_recipient_placeholders("html_"))
+    return text_body, html_body
+
+
+def broadcast_template_exists(template: str) -> bool:
+    return _get_template(f"broadcast/{template}.txt") is not None
+
+
 def send_email(
     to_email: str,
     subject: str,
@@ -70,7 +285,8 @@ def send_email(
     raise_on_error: bool = True,
 ) -> bool:
     """
-    Send an email via Mailgun.
+    Send an email right away with the configured backend.
+    Request handlers should use queue_email instead, delivered in the background by the outbox worker.
 
     Args:
         to_email: Recipient email address
@@ -82,60 +298,44 @@ def send_email(
     Returns:
         True if email was sent successfully, False otherwise
     """
-    if not MAILGUN_ENABLED:
-        logger.warning(f"Email disabled, skipping: {to_email} - {subject}")
-        if raise_on_error:
-            raise ValueError("Email service not configured (MAILGUN_API_KEY missing)")
-        return False
-
-    data = {
-        "from": f"{MAILGUN_FROM_NAME} <{MAILGUN_FROM_EMAIL}>",
-        "to": [to_email],
-        "subject": subject,
-        "text": body,
-    }
-
-    if html_body:
-        data["html"] = html_body
-
     try:
-        response = requests.post(
-            f"{MAILGUN_API_BASEURL}/messages",
-            auth=("api", MAILGUN_API_KEY),
-            data=data,
-            timeout=30,
-        )
-
-        if response.status_code != 200:
-            logger.error(f"Mailgun error: {response.status_code} - {response.text}")
-            if raise_on_error:
-                raise ValueError(f"Failed to send email: {response.status_code}")
-            return False
-
+        email_backend.send(to_email, subject, body, html_body)
         return True
-
-    except requests.RequestException as e:
-        logger.error(f"Mailgun request error: {e}")
+    except EmailDeliveryError as e:
+        logger.error(str(e))
         if raise_on_error:
             raise
         return False
 
 
+def queue_email(
+    session: Session,
+    to_email: str,
+    subject: str,
+    body: str,
+    html_body: str | None = None,
+) -> None:
+    """
+    Add an email to the outbox and commit the session.
+    The outbox worker (tasks.email_outbox) delivers it with retries.
+    """
+    create_outbox_email(session, to_email=to_email, subject=subject, body=body, html_body=html_body)
+
+
 def send_password_reset_email(
+    session: Session,
     to_email: str,
     username: str,
     reset_link: str,
-) -> bool:
+) -> None:
     """
-    Send a password reset email.
+    Queue a password reset email.
 
     Args:
+        session: Database session the email is queued with
         to_email: Recipient email address
         username: User's display name
         reset_link: Password reset URL
-
-    Returns:
-        True if email was sent successfully
     """
     context = {
         "username": username,
@@ -158,7 +358,8 @@ This link will expire in 1 hour.
 If you didn't request this, you can ignore this email.
 """
 
-    return send_email(
+    queue_email(
+        session,
         to_email=to_email,
         subject="Reset Your Password",
         body=text_body,
@@ -167,20 +368,19 @@ If you didn't request this, you can ignore this email.
 
 
 def send_email_verification_email(
+    session: Session,
     to_email: str,
     username: str,
     verification_link: str,
-) -> bool:
+) -> None:
     """
-    Send an email verification email.
+    Queue an email verification email.
 
     Args:
+        session: Database session the email is queued with
         to_email: Recipient email address
         username: User's display name
         verification_link: Email verification URL
-
-    Returns:
-        True if email was sent successfully
     """
     context = {
         "username": username,
@@ -199,7 +399,8 @@ Thank you for signing up! Please verify your email by clicking the link below:
 This link will expire in 24 hours.
 """
 
-    return send_email(
+    queue_email(
+        session,
         to_email=to_email,
         subject="Verify Your Email Address",
         body=text_body,
@@ -208,18 +409,17 @@ This link will expire in 24 hours.
 
 
 def send_welcome_email(
+    session: Session,
     to_email: str,
     username: str,
-) -> bool:
+) -> None:
     """
-    Send a welcome email after registration.
+    Queue a welcome email after registration.
 
     Args:
+        session: Database session the email is queued with
         to_email: Recipient email address
         username: User's display name
-
-    Returns:
-        True if email was sent successfully
     """
     context = {
         "username": username,
@@ -236,10 +436,10 @@ Welcome to {APP_NAME}! Your account has been created successfully.
 Get started: {PUBLIC_URL}
 """
 
-    return send_email(
+    queue_email(
+        session,
         to_email=to_email,
         subject=f"Welcome to {APP_NAME}!",
         body=text_body,
         html_body=html_body,
-        raise_on_error=False,  # Welcome emails are not critical
     )
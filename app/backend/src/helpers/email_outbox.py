@@ -0,0 +1,156 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+"""
+Background delivery of the email outbox.
+Each run claims due emails (FOR UPDATE SKIP LOCKED, so several uvicorn workers can deliver
+concurrently), sends them with bounded concurrency through the configured email backend, paced
+by a token bucket for the provider's rate limit, and records the outcome. Retryable failures are
+retried with exponential backoff, up to EMAIL_MAX_ATTEMPTS.
+"""
+
+import datetime
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ..crud.email_outbox import (
+    claim_outbox_emails,
+    fail_abandoned_outbox_emails,
+    mark_outbox_email_failed,
+    mark_outbox_email_sent,
+)
+from .db import SessionLocal
+from .email import EMAIL_WORKER_CONCURRENCY, EmailDeliveryError, email_backend
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+EMAIL_OUTBOX_POLL_SECONDS = int(os.environ.get("EMAIL_OUTBOX_POLL_SECONDS") or 2)
+EMAIL_OUTBOX_BATCH_SIZE = 100  # Emails claimed per run
+EMAIL_OUTBOX_LEASE_SECONDS = 300  # Claimed emails are retried after this if their worker died
+EMAIL_OUTBOX_RETENTION_DAYS = int(os.environ.get("EMAIL_OUTBOX_RETENTION_DAYS") or 7)  # Sent emails kept
+EMAIL_MAX_ATTEMPTS = int(os.environ.get("EMAIL_MAX_ATTEMPTS") or 8)
+EMAIL_RETRY_BASE_SECONDS = 30
+EMAIL_RETRY_MAX_SECONDS = 3600
+EMAIL_RATE_PER_SECOND = float(os.environ.get("EMAIL_RATE_PER_SECOND") or 10)  # Per uvicorn worker
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, up to `burst` at once."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1) -> None:
+        """Take tokens, sleeping until they are available."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter, in seconds, after `attempts` failed attempts."""
+    return min(EMAIL_RETRY_MAX_SECONDS, EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1)) * random.uniform(0.5, 1)
+
+
+class EmailOutboxWorker:
+    """Delivers claimed outbox emails on a bounded thread pool."""
+
+    def __init__(self, concurrency: int, rate_per_second: float):
+        self._executor = ThreadPoolExecutor(concurrency, thread_name_prefix="email-outbox")
+        self._bucket = TokenBucket(rate_per_second, burst=max(1.0, rate_per_second))
+        self._run_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._stats_lock = threading.Lock()
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    def _deliver(self, email: dict) -> None:
+        self._bucket.acquire()
+        try:
+            email_backend.send(email["to_email"], email["subject"], email["body"], email["html_body"])
+        except Exception as e:
+            # Unexpected errors (template, address, bug) are retried like retryable delivery errors
+            retryable = e.retryable if isinstance(e, EmailDeliveryError) else True
+            retry = retryable and email["attempts"] < EMAIL_MAX_ATTEMPTS
+            retry_at = (
+                datetime.datetime.now(datetime.UTC) + datetime.timedelta(seconds=retry_delay(email["attempts"]))
+                if retry
+                else None
+            )
+            log = logger.warning if isinstance(e, EmailDeliveryError) else logger.error
+            log(f"Email {email['id']} attempt {email['attempts']} failed ({'retrying' if retry else 'giving up'}): {e}")
+            with SessionLocal() as session:
+                mark_outbox_email_failed(session, email["id"], str(e), retry_at)
+            with self._stats_lock:
+                if retry:
+                    self.retried += 1
+                else:
+                    self.failed += 1
+            return
+
+        with SessionLocal() as session:
+            mark_outbox_email_sent(session, email["id"])
+        with self._stats_lock:
+            self.sent += 1
+
+    def run(self) -> int:
+        """
+        Deliver due emails until none is left or the worker shuts down. Returns the number of
+        emails processed. Concurrent calls in the same process return immediately.
+        """
+        if not self._run_lock.acquire(blocking=False):
+            return 0
+        try:
+            with SessionLocal() as session:
+                abandoned = fail_abandoned_outbox_emails(session, EMAIL_MAX_ATTEMPTS)
+            if abandoned:
+                logger.error(f"Gave up on {abandoned} emails whose last attempt recorded no outcome")
+                with self._stats_lock:
+                    self.failed += abandoned
+            processed = 0
+            while not self._stopping.is_set():
+                with SessionLocal() as session:
+                    emails = claim_outbox_emails(
+                        session, EMAIL_OUTBOX_BATCH_SIZE, EMAIL_OUTBOX_LEASE_SECONDS, EMAIL_MAX_ATTEMPTS
+                    )
+                if not emails:
+                    return processed
+                for future in [self._executor.submit(self._deliver, email) for email in emails]:
+                    try:
+                        future.result()
+                    except Exception as e:
+                        # Outcome not recorded: retried when its lease expires (or failed if it was the last attempt)
+                        logger.error(f"Email delivery crashed: {e}")
+                processed += len(emails)
+            return processed
+        finally:
+            self._run_lock.release()
+
+    def shutdown(self) -> None:
+        """Stop after the emails in flight (a run in progress claims no more)."""
+        self._stopping.set()
+        with self._run_lock:
+            self._executor.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {"backend": email_backend.name, "sent": self.sent, "retried": self.retried, "failed": self.failed}
+
+
+email_outbox_worker = EmailOutboxWorker(EMAIL_WORKER_CONCURRENCY, EMAIL_RATE_PER_SECOND)
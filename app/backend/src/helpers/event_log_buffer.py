@@ -0,0 +1,138 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+"""
+In-process buffer for event log writes.
+Events are queued in memory and written with one multi-row INSERT when the buffer reaches
+EVENT_LOG_BUFFER_FLUSH_SIZE, every EVENT_LOG_FLUSH_SECONDS (scheduled task) and on shutdown.
+Enable with EVENT_LOG_BUFFERED=true.
+
+A batch rejected by the database because of some of its rows is written again row by row: rows
+about a user deleted since they were queued lose their user_id (as ON DELETE SET NULL would have
+done), other rejected rows are dropped, so one bad row cannot block the buffer.
+"""
+
+import logging
+import os
+import threading
+from typing import Any
+
+from sqlalchemy import Connection, insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from ..models.event_log import EventLogBase
+from .db import engine
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+EVENT_LOG_BUFFERED = (os.environ.get("EVENT_LOG_BUFFERED") or "false").lower() == "true"
+EVENT_LOG_BUFFER_FLUSH_SIZE = int(os.environ.get("EVENT_LOG_BUFFER_FLUSH_SIZE") or 200)
+EVENT_LOG_BUFFER_MAX_SIZE = int(os.environ.get("EVENT_LOG_BUFFER_MAX_SIZE") or 10_000)
+EVENT_LOG_FLUSH_SECONDS = int(os.environ.get("EVENT_LOG_FLUSH_SECONDS") or 2)
+
+
+class EventLogBuffer:
+    """Thread-safe queue of event log rows, flushed in bulk."""
+
+    def __init__(self, flush_size: int, max_size: int):
+        self.flush_size = flush_size
+        self.max_size = max_size
+        self._rows: list[dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self.dropped = 0
+        self.flushed = 0
+        self.flush_failures = 0
+
+    def add(self, row: dict[str, Any]) -> bool:
+        """
+        Queue a row. Drops it if the buffer is full.
+
+        Returns:
+            True if the buffer reached its flush size and should be flushed
+        """
+        with self._lock:
+            if len(self._rows) >= self.max_size:
+                self.dropped += 1
+                return False
+            self._rows.append(row)
+            return len(self._rows) >= self.flush_size
+
+    def _insert_one_by_one(self, connection: Connection, rows: list[dict[str, Any]]) -> int:
+        """Insert rows one at a time (a savepoint each), dropping the rejected ones. Returns the count inserted."""
+        inserted = 0
+        for row in rows:
+            # A user deleted after the event was queued: keep the event, without its user
+            attempts = [row, {**row, "user_id": None}] if row.get("user_id") is not None else [row]
+            for attempt in attempts:
+                try:
+                    with connection.begin_nested():
+                        connection.execute(insert(EventLogBase.__table__), [attempt])
+                    inserted += 1
+                    break
+                except IntegrityError:
+                    continue
+                except DataError:
+                    break
+            else:
+                logger.error(f"Dropped event log row rejected by the database: {row['action']}")
+        with self._lock:
+            self.dropped += len(rows) - inserted
+        return inserted
+
+    def flush(self, blocking: bool = True) -> int:
+        """
+        Write all queued rows in one transaction. If the database rejects some rows, the batch is
+        written row by row instead and the rejected rows are dropped.
+        On other failures (e.g. database unavailable), rows are put back (up to max_size) for the next flush.
+
+        Args:
+            blocking: Wait for a flush already in progress instead of returning immediately
+
+        Returns:
+            Number of rows written
+        """
+        if not self._flush_lock.acquire(blocking=blocking):
+            return 0
+        try:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return 0
+
+            try:
+                try:
+                    with engine.begin() as connection:
+                        connection.execute(insert(EventLogBase.__table__), rows)
+                    written = len(rows)
+                except (IntegrityError, DataError) as e:
+                    logger.warning(f"Event log batch rejected, writing its {len(rows)} events one by one: {e.orig}")
+                    with engine.begin() as connection:
+                        written = self._insert_one_by_one(connection, rows)
+            except Exception as e:
+                logger.error(f"Event log flush failed ({len(rows)} events): {e}")
+                with self._lock:
+                    self.flush_failures += 1
+                    requeued = rows[: max(0, self.max_size - len(self._rows))]
+                    self.dropped += len(rows) - len(requeued)
+                    self._rows = requeued + self._rows
+                return 0
+
+            with self._lock:
+                self.flushed += written
+            return written
+        finally:
+            self._flush_lock.release()
+
+    def stats(self) -> dict[str, int]:
+        """Queue depth and counters since startup."""
+        with self._lock:
+            return {
+                "queued": len(self._rows),
+                "dropped": self.dropped,
+                "flushed": self.flushed,
+                "flush_failures": self.flush_failures,
+            }
+
+
+event_log_buffer = EventLogBuffer(EVENT_LOG_BUFFER_FLUSH_SIZE, EVENT_LOG_BUFFER_MAX_SIZE)
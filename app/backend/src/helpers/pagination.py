@@ -0,0 +1,33 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+"""
+Opaque cursors for keyset pagination.
+A cursor encodes the sort key of the last item of a page, e.g. (created_at, id).
+"""
+
+import base64
+import datetime
+import json
+
+from fastapi import HTTPException, status
+
+
+def encode_cursor(created_at: datetime.datetime, item_id: int) -> str:
+    """Encode a (created_at, id) sort key as an opaque URL-safe cursor."""
+    raw = json.dumps([created_at.isoformat(), item_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime.datetime, int]:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Raises:
+        HTTPException 400 if the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, item_id = json.loads(raw)
+        return datetime.datetime.fromisoformat(created_at), int(item_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor") from None
@@ -0,0 +1,141 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+"""
+Password hashing with bcrypt, offloaded to a small dedicated process pool.
+
+bcrypt is deliberately slow (~100+ ms per hash at the default cost), so it runs outside of the
+worker process: the event loop and the GIL stay free for other requests. The number of hashes
+queued or running per worker is capped; beyond it, requests are shed with a 503 instead of piling
+up behind the pool.
+
+The password is first peppered with HMAC-SHA256 (USERS_PASSWORD_HASH_SECRET_KEY), and the
+base64 digest is what bcrypt hashes: a leaked database alone is not enough to brute-force
+passwords, and long passwords are not truncated by bcrypt's 72-byte limit.
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import bcrypt
+from fastapi import HTTPException, status
+
+from ..constants import PASSWORD_HASH_SECRET_KEY
+
+# Configuration
+PASSWORD_HASH_ROUNDS = int(os.environ.get("PASSWORD_HASH_ROUNDS") or 12)  # bcrypt cost factor (log2 of iterations)
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS") or 2)  # Hashing processes per uvicorn worker
+PASSWORD_HASH_MAX_QUEUE = int(os.environ.get("PASSWORD_HASH_MAX_QUEUE") or 32)  # Hashes queued or running, per worker
+
+
+def _pepper(password: str) -> bytes:
+    return base64.b64encode(hmac.new(PASSWORD_HASH_SECRET_KEY, password.encode("utf-8"), hashlib.sha256).digest())
+
+
+# Verified against when the account does not exist, so that a failed login takes as long either way
+DUMMY_PASSWORD_HASH = bcrypt.hashpw(_pepper(os.urandom(16).hex()), bcrypt.gensalt(PASSWORD_HASH_ROUNDS)).decode()
+
+
+def legacy_hash_password(password: str) -> str:
+    """
+    Former password hash: a single HMAC-SHA256, hex encoded.
+    Only used to verify hashes stored before bcrypt, which are upgraded on the next login.
+    """
+    return hmac.new(PASSWORD_HASH_SECRET_KEY, password.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def is_legacy_hash(hashed_password: str) -> bool:
+    return not hashed_password.startswith("$2")
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """Whether the hash should be replaced: legacy HMAC hash, or bcrypt cost below PASSWORD_HASH_ROUNDS."""
+    if is_legacy_hash(hashed_password):
+        return True
+    # Format: $2b$<cost>$<salt and hash>
+    return int(hashed_password.split("$")[2]) < PASSWORD_HASH_ROUNDS
+
+
+class PasswordHasher:
+    """
+    Bounded process pool running bcrypt.
+
+    Only bcrypt's own functions are sent to the pool, so the spawned processes import bcrypt
+    and nothing of the application.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._executor: ProcessPoolExecutor | None = None
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+
+    def _submit(self, fn, *args) -> Future:
+        with self._lock:
+            if self._in_flight >= self.max_queue:
+                self._rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Server busy, please retry",
+                    headers={"Retry-After": "1"},
+                )
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            self._in_flight += 1
+            future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future: Future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._completed += 1
+
+    def hash(self, password: str) -> str:
+        """Hash a password. Blocks the calling thread (use from sync endpoints)."""
+        return self._submit(bcrypt.hashpw, _pepper(password), bcrypt.gensalt(PASSWORD_HASH_ROUNDS)).result().decode()
+
+    def verify(self, password: str, hashed_password: str) -> bool:
+        """Verify a password against a bcrypt or legacy hash. Blocks the calling thread (use from sync endpoints)."""
+        if is_legacy_hash(hashed_password):
+            return hmac.compare_digest(hashed_password, legacy_hash_password(password))
+        return self._submit(bcrypt.checkpw, _pepper(password), hashed_password.encode()).result()
+
+    async def hash_async(self, password: str) -> str:
+        """Hash a password without blocking the event loop."""
+        future = self._submit(bcrypt.hashpw, _pepper(password), bcrypt.gensalt(PASSWORD_HASH_ROUNDS))
+        return (await asyncio.wrap_future(future)).decode()
+
+    async def verify_async(self, password: str, hashed_password: str) -> bool:
+        """Verify a password against a bcrypt or legacy hash without blocking the event loop."""
+        if is_legacy_hash(hashed_password):
+            return hmac.compare_digest(hashed_password, legacy_hash_password(password))
+        return await asyncio.wrap_future(self._submit(bcrypt.checkpw, _pepper(password), hashed_password.encode()))
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+
+# Process-wide hasher
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE)
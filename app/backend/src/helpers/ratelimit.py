@@ -1,69 +1,412 @@
 # ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
 
+"""
+Rate limiting with the generic cell rate algorithm (GCRA): each key stores a single
+theoretical arrival time (TAT), so checks cost O(1) in time and memory whatever the quota.
+A quota of N per window allows a burst of N, then one more hit every window / N seconds.
+
+Storage is pluggable, selected with RATE_LIMIT_BACKEND:
+- memory: in-process dict, quotas are per worker process (default)
+- shared: SQLite database in shared memory (RATE_LIMIT_SHARED_PATH), shared by the workers of one host
+- postgres: UNLOGGED rate_limits table, shared by every worker and host
+"""
+
+import abc
+import hashlib
+import heapq
+import math
+import os
+import sqlite3
+import sys
+import threading
 import time
+from dataclasses import dataclass
+from typing import Literal
+
+from fastapi import HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import text
+
+from ..models.rate_limit import RateLimitBase
+from .auth import get_request_token_payload
+from .db import engine
+from .exception import InvalidTokenException
+
+# Configuration
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND") or "memory"
+RATE_LIMIT_SHARED_PATH = os.environ.get("RATE_LIMIT_SHARED_PATH") or "/dev/shm/ratelimit.sqlite3"
+RATE_LIMIT_MAX_KEYS = int(os.environ.get("RATE_LIMIT_MAX_KEYS") or 100000)  # memory backend, per worker
+RATE_LIMIT_SWEEP_BATCH = 4  # Expired keys removed per check by the memory backend
+
+# One rate limit check for the backends: (bucket, key, quota, window_seconds)
+Check = tuple[str, str, float, float]
+
+# Tolerance for float rounding when N emission intervals should add up to exactly one window
+_EPSILON = 1e-6
+
+# Memory backend bytes per key besides the key strings: dict key tuple, heap tuple, TAT floats
+_ENTRY_BYTES = 2 * sys.getsizeof(("", "")) + 2 * sys.getsizeof(0.0)
+
+
+@dataclass(frozen=True, slots=True)
+class RateLimitResult:
+    """Outcome of a rate limit check."""
+
+    limited: bool
+    limit: int  # Number of hits allowed per window
+    remaining: int  # Hits still allowed right now
+    reset_after: float  # Seconds until the quota is fully restored
+    retry_after: float  # Seconds until the next hit is allowed (0 when not limited)
+
+
+def _gcra(
+    tat: float | None, now: float, quota: float, window_seconds: float, consume: bool
+) -> tuple[RateLimitResult, float]:
+    """
+    Apply one check to a stored TAT.
+
+    Returns:
+        The result and the TAT to store.
+    """
+    interval = window_seconds / quota if quota > 0 else math.inf
+    tat = max(tat or now, now)
+    # The next hit would push the TAT beyond one window ahead of now
+    allow_at = tat + interval - window_seconds
+    limited = allow_at > now + _EPSILON
+    if consume and not limited:
+        tat += interval
+    return _result(tat, now, quota, window_seconds, limited), tat
+
+
+def _result(tat: float, now: float, quota: float, window_seconds: float, limited: bool) -> RateLimitResult:
+    interval = window_seconds / quota if quota > 0 else math.inf
+    remaining = math.floor((window_seconds - (tat - now)) / interval + _EPSILON) if quota > 0 else 0
+    return RateLimitResult(
+        limited=limited,
+        limit=math.floor(quota),
+        remaining=max(0, min(remaining, math.floor(quota))),
+        reset_after=max(0.0, tat - now),
+        retry_after=max(0.0, tat + interval - window_seconds - now) if limited else 0.0,
+    )
+
+
+def _gcra_all(
+    tats: list[float | None], now: float, checks: list[Check], consume: bool
+) -> tuple[list[RateLimitResult], list[float] | None]:
+    """
+    Apply several checks at once: hits are consumed on every check, or on none if any is limited.
+
+    Returns:
+        The results and the TATs to store (None when nothing is consumed).
+    """
+    peeked = [
+        _gcra(tat, now, quota, window, consume=False)[0]
+        for tat, (_, _, quota, window) in zip(tats, checks, strict=True)
+    ]
+    if not consume or any(result.limited for result in peeked):
+        return peeked, None
+    consumed = [
+        _gcra(tat, now, quota, window, consume=True) for tat, (_, _, quota, window) in zip(tats, checks, strict=True)
+    ]
+    return [result for result, _ in consumed], [tat for _, tat in consumed]
+
+
+class RateLimitBackend(abc.ABC):
+    """Storage for rate limit state. Implementations must be safe to call from several threads."""
+
+    # Whether checks can wait (network I/O, locks held by other processes), and must run in the
+    # threadpool when called from async code
+    blocking = False
+
+    @abc.abstractmethod
+    def hit(self, checks: list[Check], consume: bool) -> list[RateLimitResult]:
+        """
+        Check the quotas of several (bucket, key), each allowing `quota` hits per `window_seconds`.
+        If `consume` is set and no quota is reached, consumes one hit on each of them, atomically.
+        """
+
+    @abc.abstractmethod
+    def cleanup(self) -> None:
+        """Remove expired state."""
+
+    def stats(self) -> dict:
+        """Memory gauges, only tracked by the in-process backend."""
+        return {"keys": None, "max_keys": None, "approx_bytes": None, "evictions": 0}
+
+
+class MemoryBackend(RateLimitBackend):
+    """
+    TATs kept in a dict of the current process, with a hard cap on the number of keys.
+
+    A min-heap orders keys by expiry, with exactly one heap entry per key: entries whose TAT moved
+    forward since they were pushed are re-pushed lazily when they reach the top. Each call sweeps a
+    few expired keys, and when the cap is reached the key closest to expiry is evicted first, so
+    rotating IPs or emails cannot grow the worker's memory without limit.
+    """
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries: dict[tuple[str, str], float] = {}  # (bucket, key) -> TAT
+        self._expiry: list[tuple[float, tuple[str, str]]] = []  # Heap of (TAT when pushed, (bucket, key))
+        self._key_bytes = 0
+
+    def hit(self, checks: list[Check], consume: bool) -> list[RateLimitResult]:
+        entries = [(bucket, key) for bucket, key, _, _ in checks]
+        now = time.time()
+        with self._lock:
+            self._sweep(now, RATE_LIMIT_SWEEP_BATCH)
+            results, tats = _gcra_all([self._entries.get(entry) for entry in entries], now, checks, consume)
+            if tats is not None:
+                for entry, tat in zip(entries, tats, strict=True):
+                    self._store(entry, tat)
+            return results
+
+    def _store(self, entry: tuple[str, str], tat: float) -> None:
+        if entry not in self._entries:
+            while len(self._entries) >= self.max_keys:
+                self._evict()
+            heapq.heappush(self._expiry, (tat, entry))
+            self._key_bytes += sys.getsizeof(entry[0]) + sys.getsizeof(entry[1])
+        self._entries[entry] = tat
+
+    def _pop(self) -> tuple[str, str] | None:
+        """Pop the top of the heap. Returns the entry if it can be removed, or None if it was re-pushed."""
+        deadline, entry = heapq.heappop(self._expiry)
+        tat = self._entries[entry]
+        if tat > deadline:
+            heapq.heappush(self._expiry, (tat, entry))
+            return None
+        return entry
+
+    def _remove(self, entry: tuple[str, str]) -> None:
+        del self._entries[entry]
+        self._key_bytes -= sys.getsizeof(entry[0]) + sys.getsizeof(entry[1])
+
+    def _sweep(self, now: float, budget: int | None) -> None:
+        """Remove up to `budget` expired keys (all of them if None): their quota is fully restored."""
+        while self._expiry and self._expiry[0][0] <= now and (budget is None or budget > 0):
+            entry = self._pop()
+            if entry is not None:
+                self._remove(entry)
+            if budget is not None:
+                budget -= 1
+
+    def _evict(self) -> None:
+        """Remove the key closest to expiry, which loses the least quota state."""
+        entry = None
+        while entry is None:
+            entry = self._pop()
+        self._remove(entry)
+        self.evictions += 1
+
+    def cleanup(self) -> None:
+        with self._lock:
+            self._sweep(time.time(), None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            keys = len(self._entries)
+            approx_bytes = (
+                sys.getsizeof(self._entries) + sys.getsizeof(self._expiry) + self._key_bytes + keys * _ENTRY_BYTES
+            )
+            return {"keys": keys, "max_keys": self.max_keys, "approx_bytes": approx_bytes, "evictions": self.evictions}
+
+
+class SharedMemoryBackend(RateLimitBackend):
+    """
+    TATs kept in a SQLite database on a RAM-backed filesystem (/dev/shm by default).
+    SQLite's file locking makes each check atomic across the worker processes of the host.
+    A check can wait up to 5 s for the write lock held by another worker or by cleanup, so
+    async callers run it in the threadpool.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        # SQLite connections cannot be shared between threads
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limits (bucket TEXT, key TEXT, tat REAL, PRIMARY KEY (bucket, key))"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS ix_rate_limits_tat ON rate_limits (tat)")
+            self._local.connection = connection
+        return connection
+
+    def hit(self, checks: list[Check], consume: bool) -> list[RateLimitResult]:
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            tats = []
+            for bucket, key, _, _ in checks:
+                row = connection.execute(
+                    "SELECT tat FROM rate_limits WHERE bucket = ? AND key = ?", (bucket, key)
+                ).fetchone()
+                tats.append(row[0] if row else None)
+            results, new_tats = _gcra_all(tats, time.time(), checks, consume)
+            if new_tats is not None:
+                for (bucket, key, _, _), tat in zip(checks, new_tats, strict=True):
+                    connection.execute("INSERT OR REPLACE INTO rate_limits VALUES (?, ?, ?)", (bucket, key, tat))
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return results
+
+    def cleanup(self) -> None:
+        self._connection().execute("DELETE FROM rate_limits WHERE tat <= ?", (time.time(),))
+
+
+class PostgresBackend(RateLimitBackend):
+    """
+    TATs kept in the UNLOGGED rate_limits table, each checked and updated with one atomic upsert.
+    Several checks run in one transaction, which is rolled back if any quota is reached.
+    """
+
+    blocking = True
+
+    # Advances the TAT unless the quota is reached, in which case no row is returned
+    _HIT = text(f"""
+        INSERT INTO {RateLimitBase.__tablename__} AS r (bucket, key, tat)
+        VALUES (:bucket, :key, CAST(:now AS float8) + :interval)
+        ON CONFLICT (bucket, key) DO UPDATE
+        SET tat = GREATEST(r.tat, :now) + :interval
+        WHERE GREATEST(r.tat, :now) + :interval - :window <= :now + :epsilon
+        RETURNING tat
+    """)
+    _GET = text(f"SELECT tat FROM {RateLimitBase.__tablename__} WHERE bucket = :bucket AND key = :key")
+    _CLEANUP = text(f"DELETE FROM {RateLimitBase.__tablename__} WHERE tat <= :now")
+
+    def hit(self, checks: list[Check], consume: bool) -> list[RateLimitResult]:
+        now = time.time()
+        with engine.connect() as connection:
+            if consume and all(quota > 0 for _, _, quota, _ in checks):
+                results = self._consume(connection, checks, now)
+                if results is not None:
+                    return results
+            # Limited, or a plain check: read the current state
+            tats = [
+                connection.execute(self._GET, {"bucket": bucket, "key": key}).scalar() for bucket, key, _, _ in checks
+            ]
+            connection.commit()
+        return _gcra_all(tats, now, checks, consume=False)[0]
 
-from fastapi import HTTPException
+    def _consume(self, connection, checks: list[Check], now: float) -> list[RateLimitResult] | None:
+        """Consume one hit per check, or none (returning None) if any quota is reached."""
+        tats = {}
+        # Same lock order in every transaction to avoid deadlocks
+        for bucket, key, quota, window_seconds in sorted(checks):
+            params = {
+                "bucket": bucket,
+                "key": key,
+                "now": now,
+                "interval": window_seconds / quota,
+                "window": window_seconds,
+                "epsilon": _EPSILON,
+            }
+            tat = connection.execute(self._HIT, params).scalar()
+            if tat is None:
+                connection.rollback()
+                return None
+            tats[(bucket, key)] = tat
+        connection.commit()
+        return [
+            _result(tats[(bucket, key)], now, quota, window_seconds, limited=False)
+            for bucket, key, quota, window_seconds in checks
+        ]
 
-entries = {
-    # duration min -> action -> key -> [timestamps]
-}
+    def cleanup(self) -> None:
+        with engine.begin() as connection:
+            connection.execute(self._CLEANUP, {"now": time.time()})
+
+
+def _create_backend(name: str) -> RateLimitBackend:
+    if name == "memory":
+        return MemoryBackend(RATE_LIMIT_MAX_KEYS)
+    if name == "shared":
+        return SharedMemoryBackend(RATE_LIMIT_SHARED_PATH)
+    if name == "postgres":
+        return PostgresBackend()
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {name}")
+
+
+backend = _create_backend(RATE_LIMIT_BACKEND)
 
 
 def cleanup_entries():
     """
-    Cleanup function. Called every minute.
+    Cleanup function. Called every 5 minutes.
+    The memory backend also sweeps a few expired keys on every check.
     """
-    for duration_minutes in entries:
-        for action in entries[duration_minutes]:
-            for key in entries[duration_minutes][action]:
-                # If latest entry is older than 1 minute, remove all
-                if (
-                    len(entries[duration_minutes][action][key]) == 0
-                    or entries[duration_minutes][action][key][-1] < time.time() - 60
-                ):
-                    del entries[duration_minutes][action][key]
+    backend.cleanup()
 
 
-def is_rate_limited(
+def get_rate_limit_stats() -> dict:
+    """Rate limit storage gauges for the current worker."""
+    return {"backend": RATE_LIMIT_BACKEND, **backend.stats()}
+
+
+@dataclass(frozen=True, slots=True)
+class RateLimitRule:
+    """Allows `quota` hits of `action` by `key` per `duration_minutes`."""
+
+    action: str
+    quota: float
+    key: str
+    duration_minutes: int = 1
+
+
+def check_rate_limits(rules: list[RateLimitRule], consume_quota: bool = False) -> list[RateLimitResult]:
+    """
+    Check several rate limits in one pass.
+    If `consume_quota` is set, consumes one hit on every rule only if none of them is exceeded.
+
+    Returns:
+        One result per rule, in order.
+    """
+    checks = [
+        (f"{rule.duration_minutes}:{rule.action}", rule.key, rule.quota, 60 * rule.duration_minutes) for rule in rules
+    ]
+    return backend.hit(checks, consume_quota)
+
+
+def check_rate_limit(
     action: str,
     quota: float,
     key: str,
     duration_minutes: int = 1,
     consume_quota: bool = False,
-) -> bool:
+) -> RateLimitResult:
     """
-    Rate limit function. Returns False is exceeding quota.
-    """
-    # Ensure that entries[duration_minutes][action][key] exists
-    if duration_minutes not in entries:
-        entries[duration_minutes] = {}
-    if action not in entries[duration_minutes]:
-        entries[duration_minutes][action] = {}
-    if key not in entries[duration_minutes][action]:
-        entries[duration_minutes][action][key] = []
-
-    # Remove obsolete entries
-    # actions[action][key] = [x for x in actions[action][key] if x > time.time() - 60 * duration_minutes] # Not done for performance reasons -> see below
-    while (
-        len(entries[duration_minutes][action][key]) > 0
-        and entries[duration_minutes][action][key][0]
-        < time.time() - 60 * duration_minutes
-    ):
-        entries[duration_minutes][action][key].pop(0)
+    Check the quota of `key` for `action`, allowing `quota` hits per `duration_minutes`.
+    Consumes one hit if `consume_quota` is set and the quota is not reached.
+    """
+    return check_rate_limits([RateLimitRule(action, quota, key, duration_minutes)], consume_quota)[0]
 
-    # Quota exceeded
-    if len(entries[duration_minutes][action][key]) >= quota:
-        return True
 
-    # Add current entry
-    if consume_quota:
-        entries[duration_minutes][action][key].append(time.time())
-    return False
+def is_rate_limited(
+    action: str,
+    quota: float,
+    key: str,
+    duration_minutes: int = 1,
+    consume_quota: bool = False,
+) -> bool:
+    """
+    Rate limit function. Returns True if the quota is exceeded.
+    """
+    return check_rate_limit(action, quota, key, duration_minutes, consume_quota).limited
 
 
-def ensure_rate_limit(
-    action: str, quota: float, key: str, duration_minutes: int = 1
-) -> None:
+def ensure_rate_limit(action: str, quota: float, key: str, duration_minutes: int = 1) -> RateLimitResult:
     """
     Ensure that the rate limit is not exceeded for a given action and key.
     If the rate limit is not reached, will consume 1 quota.
@@ -72,6 +415,161 @@ def ensure_rate_limit(
     :param action: The action to perform
     :param key: The key to use
     :param count: Maximum number of times the action can be performed per minute
+    :return: The remaining quota and reset time
+    """
+    result = check_rate_limit(action, quota, key, duration_minutes, True)
+    if result.limited:
+        raise HTTPException(status_code=429, detail="Merci de patienter un peu.", headers=rate_limit_headers(result))
+    return result
+
+
+def ensure_rate_limits(rules: list[RateLimitRule]) -> list[RateLimitResult]:
     """
-    if is_rate_limited(action, quota, key, duration_minutes, True):
-        raise HTTPException(status_code=429, detail="Merci de patienter un peu.")
+    Ensure that none of the rate limits is exceeded, then consume 1 quota on each of them.
+    If any is exceeded, consumes nothing and raises an exception, with the headers of the
+    rule that frees up last.
+    """
+    results = check_rate_limits(rules, consume_quota=True)
+    limited = [result for result in results if result.limited]
+    if limited:
+        result = max(limited, key=lambda result: result.retry_after)
+        raise HTTPException(status_code=429, detail="Merci de patienter un peu.", headers=rate_limit_headers(result))
+    return results
+
+
+def rate_limit_headers(result: RateLimitResult) -> dict[str, str]:
+    """RateLimit-* headers (IETF draft), plus Retry-After when limited."""
+    headers = {
+        "RateLimit-Limit": str(result.limit),
+        "RateLimit-Remaining": str(result.remaining),
+        "RateLimit-Reset": str(math.ceil(result.reset_after)),
+    }
+    if result.limited:
+        headers["Retry-After"] = str(math.ceil(result.retry_after))
+    return headers
+
+
+def get_client_ip(request: Request) -> str:
+    """
+    Client IP for rate limiting: the first X-Forwarded-For entry, as recorded in event logs.
+    Traefik drops the X-Forwarded-For sent by untrusted clients and sets it from the connection.
+    """
+    forwarded = request.headers.get("X-Forwarded-For")
+    if forwarded:
+        return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+class RateLimit:
+    """
+    Declarative rate limit for a route or a router, used as a dependency:
+
+        @router.post("/users/login", dependencies=[Depends(RateLimit("login", quota=10))])
+        router = APIRouter(dependencies=[Depends(RateLimit("admin", quota=300, key="user"))])
+
+    Dependencies listed in `dependencies=` are resolved before the endpoint's parameters, so
+    rejected requests never open a database session or hash a password. The caller is identified
+    from the bearer token's claims without any database lookup; requests without a valid token
+    are anonymous and keyed by IP.
+
+    Args:
+        action: Name of the limited action (the storage bucket)
+        quota: Hits allowed per `duration_minutes` for authenticated callers
+        duration_minutes: Window length
+        key: What the quota applies to: "ip", "user" (user id), "token" (access token) or "email"
+            (the `email` field of the JSON body, for anonymous endpoints; keyed by IP without one)
+        premium_quota: Quota for premium users (defaults to `quota`)
+        anonymous_quota: Quota for callers without a valid token (defaults to `quota`)
+    """
+
+    def __init__(
+        self,
+        action: str,
+        quota: float,
+        duration_minutes: int = 1,
+        key: Literal["ip", "user", "token", "email"] = "ip",
+        premium_quota: float | None = None,
+        anonymous_quota: float | None = None,
+    ):
+        self.action = action
+        self.quota = quota
+        self.duration_minutes = duration_minutes
+        self.key = key
+        self.premium_quota = premium_quota if premium_quota is not None else quota
+        self.anonymous_quota = anonymous_quota if anonymous_quota is not None else quota
+
+    async def _identify(self, request: Request) -> tuple[str, float]:
+        """Returns the rate limit key and quota for the caller."""
+        payload = None
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() == "bearer" and token:
+            try:
+                payload = get_request_token_payload(request, token)
+            except InvalidTokenException:
+                payload = None
+
+        if payload is None:
+            quota = self.anonymous_quota
+        else:
+            quota = self.premium_quota if payload["data"].get("is_premium") else self.quota
+
+        if self.key == "email":
+            # The body is already read (and cached on the request) when dependencies are resolved
+            try:
+                body = await request.json()
+            except ValueError:
+                body = None
+            email = body.get("email") if isinstance(body, dict) else None
+            if isinstance(email, str):
+                return f"email:{email.lower()}", quota
+        elif payload is not None and self.key == "user":
+            return f"user:{payload['id']}", quota
+        elif payload is not None and self.key == "token":
+            return f"token:{hashlib.sha256(token.encode()).hexdigest()}", quota
+        return f"ip:{get_client_ip(request)}", quota
+
+    async def __call__(self, request: Request, response: Response) -> RateLimitResult:
+        return (await RateLimits(self)(request, response))[0]
+
+
+class RateLimits:
+    """
+    Several rate limits checked as one dependency, consumed all-or-nothing (see ensure_rate_limits):
+
+        @router.post(
+            "/auth/request-password-reset",
+            dependencies=[
+                Depends(
+                    RateLimits(
+                        RateLimit("password-reset-request", quota=1, duration_minutes=5, key="email"),
+                        RateLimit("password-reset-request-ip-daily", quota=20, duration_minutes=60 * 24),
+                    )
+                )
+            ],
+        )
+
+    Responses carry the headers of the limit closest to exhaustion; rejections those of the limit
+    that frees up last.
+    """
+
+    def __init__(self, *limits: RateLimit):
+        self.limits = limits
+
+    async def __call__(self, request: Request, response: Response) -> list[RateLimitResult]:
+        rules = []
+        for limit in self.limits:
+            key, quota = await limit._identify(request)
+            rules.append(RateLimitRule(limit.action, quota, key, limit.duration_minutes))
+        if backend.blocking:
+            results = await run_in_threadpool(check_rate_limits, rules, True)
+        else:
+            results = check_rate_limits(rules, True)
+
+        limited = [result for result in results if result.limited]
+        if limited:
+            result = max(limited, key=lambda result: result.retry_after)
+            raise HTTPException(
+                status_code=429, detail="Merci de patienter un peu.", headers=rate_limit_headers(result)
+            )
+        response.headers.update(rate_limit_headers(min(results, key=lambda result: result.remaining)))
+        return results
@@ -3,11 +3,19 @@
 """
 Stripe integration helper.
 Provides functions for customer management, billing portal, and webhook handling.
+Functions ending in _async use the Stripe client's async methods (HTTP through httpx) and
+do not block the event loop; independent calls can run concurrently with asyncio.gather.
+Sync and async calls share one keep-alive httpx client (set up by init_stripe), which records
+the latency of every Stripe API request per endpoint (get_stripe_stats, in the admin system stats).
 """
 
 import logging
 import os
+import re
+import threading
+import time
 from datetime import datetime
+from urllib.parse import urlsplit
 
 import stripe
 from fastapi import HTTPException
@@ -19,15 +27,135 @@ STRIPE_ENABLED = bool(os.environ.get("STRIPE_API_KEY"))
 STRIPE_API_KEY = os.environ.get("STRIPE_API_KEY", "")
 STRIPE_WEBHOOK_SECRET = os.environ.get("STRIPE_WEBHOOK_SECRET", "")
 STRIPE_PRICING_FREE = os.environ.get("STRIPE_PRICING_FREE", "")
+# When new users get their Stripe customer and free subscription:
+# "background" (right after the registration response) or "lazy" (on their first billing portal visit)
+STRIPE_SIGNUP_PROVISIONING = os.environ.get("STRIPE_SIGNUP_PROVISIONING") or "background"
+STRIPE_TIMEOUT_SECONDS = int(os.environ.get("STRIPE_TIMEOUT_SECONDS") or 30)  # Per HTTP request
+STRIPE_LATENCY_BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Object IDs in request paths (cus_Nf3..., sub_1Mx...), replaced to group calls per endpoint
+_OBJECT_ID = re.compile(r"^[a-z]+(?:_[a-z]+)*_(?=[A-Za-z0-9]*[A-Z0-9])[A-Za-z0-9]{8,}$")
+
+
+# ============================================================================
+# HTTP client
+# ============================================================================
+
+
+class LatencyHistogram:
+    """Thread-safe request latency histogram with fixed buckets (milliseconds)."""
+
+    def __init__(self, buckets_ms: tuple[int, ...]):
+        self._lock = threading.Lock()
+        self._buckets_ms = buckets_ms
+        self._counts = [0] * (len(buckets_ms) + 1)  # Last one: above the highest bucket
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, duration_ms: float, error: bool) -> None:
+        index = next((i for i, bound in enumerate(self._buckets_ms) if duration_ms <= bound), len(self._buckets_ms))
+        with self._lock:
+            self._counts[index] += 1
+            if error:
+                self.errors += 1
+            self.total_ms += duration_ms
+            self.max_ms = max(self.max_ms, duration_ms)
+
+    def stats(self) -> dict:
+        """Counters, with cumulative bucket counts ("le" semantics, as Prometheus)."""
+        with self._lock:
+            counts = list(self._counts)
+            errors, total_ms, max_ms = self.errors, self.total_ms, self.max_ms
+        count = sum(counts)
+        buckets: dict[str, int] = {}
+        cumulative = 0
+        for bound, bucket_count in zip([*map(str, self._buckets_ms), "+Inf"], counts, strict=True):
+            cumulative += bucket_count
+            buckets[bound] = cumulative
+        return {
+            "count": count,
+            "errors": errors,
+            "avg_ms": round(total_ms / count, 1) if count else 0.0,
+            "max_ms": round(max_ms, 1),
+            "buckets": buckets,
+        }
+
+
+def _endpoint(method: str, url: str) -> str:
+    """Histogram key of a request: method and path with object IDs replaced, e.g. POST /v1/customers/{id}."""
+    path = "/".join("{id}" if _OBJECT_ID.match(part) else part for part in urlsplit(url).path.split("/"))
+    return f"{method.upper()} {path}"
+
+
+class InstrumentedHTTPXClient(stripe.HTTPXClient):
+    """
+    Stripe HTTP client over httpx (one keep-alive connection pool for sync calls and one for
+    async calls) recording the latency of each request, including retries, per endpoint.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(allow_sync_methods=True, **kwargs)
+        self._histograms: dict[str, LatencyHistogram] = {}
+        self._histograms_lock = threading.Lock()
+
+    def _observe(self, method: str, url: str, started: float, error: bool) -> None:
+        key = _endpoint(method, url)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._histograms_lock:
+                histogram = self._histograms.setdefault(key, LatencyHistogram(STRIPE_LATENCY_BUCKETS_MS))
+        histogram.observe((time.perf_counter() - started) * 1000, error)
+
+    def request(self, method, url, headers, post_data=None):
+        started = time.perf_counter()
+        error = True
+        try:
+            response = super().request(method, url, headers, post_data)
+            error = response[1] >= 400
+            return response
+        finally:
+            self._observe(method, url, started, error)
+
+    async def request_async(self, method, url, headers, post_data=None):
+        started = time.perf_counter()
+        error = True
+        try:
+            response = await super().request_async(method, url, headers, post_data)
+            error = response[1] >= 400
+            return response
+        finally:
+            self._observe(method, url, started, error)
+
+    def stats(self) -> dict[str, dict]:
+        with self._histograms_lock:
+            histograms = dict(self._histograms)
+        return {key: histogram.stats() for key, histogram in sorted(histograms.items())}
 
 
 def init_stripe():
-    """Initialize Stripe with API key. Call this at app startup."""
+    """Initialize Stripe with API key and the shared HTTP client. Call this at app startup."""
     if STRIPE_ENABLED:
         stripe.api_key = STRIPE_API_KEY
+        if not isinstance(stripe.default_http_client, InstrumentedHTTPXClient):
+            stripe.default_http_client = InstrumentedHTTPXClient(timeout=STRIPE_TIMEOUT_SECONDS)
         logger.info("Stripe initialized")
 
 
+async def close_stripe():
+    """Close the shared HTTP client's connections. Call this at app shutdown."""
+    client = stripe.default_http_client
+    if isinstance(client, InstrumentedHTTPXClient):
+        client.close()
+        await client.close_async()
+
+
+def get_stripe_stats() -> dict[str, dict]:
+    """Latency histograms of the Stripe API requests of this worker, per endpoint."""
+    client = stripe.default_http_client
+    return client.stats() if isinstance(client, InstrumentedHTTPXClient) else {}
+
+
 def is_enabled() -> bool:
     """Check if Stripe is configured."""
     return STRIPE_ENABLED
@@ -74,6 +202,10 @@ def sync_customer(
             candidate = existing.data[0]
             linked_user_id = candidate.metadata.get("user_id")
 
+            # Already linked to this user (e.g. provisioning retried or raced with the billing portal)
+            if linked_user_id == str(user_id):
+                return candidate.id
+
             # Only reuse if customer has our metadata and user no longer exists
             if linked_user_id:
                 from ..crud.users import get_user_by_id
@@ -266,15 +398,54 @@ def verify_webhook_signature(payload: bytes, signature: str) -> dict:
         raise HTTPException(status_code=400, detail="Invalid webhook signature") from e
 
 
+def list_subscriptions(stripe_customer_id: str) -> list:
+    """
+    List every subscription of a customer, whatever its status, with its items.
+    Used to refresh the local subscription mirror (helpers.subscriptions).
+
+    Args:
+        stripe_customer_id: Stripe customer ID
+
+    Returns:
+        Stripe subscription objects
+
+    Raises:
+        stripe.error.StripeError on API errors
+    """
+    if not STRIPE_ENABLED or not stripe_customer_id:
+        return []
+
+    subscriptions = stripe.Subscription.list(customer=stripe_customer_id, status="all", limit=100)
+    return list(subscriptions.auto_paging_iter())
+
+
+def iter_active_subscriptions():
+    """
+    Every active or trialing subscription of the account, with its items, 100 per request.
+    Used by the premium status reconciliation (helpers.subscriptions).
+
+    Raises:
+        stripe.error.StripeError on API errors
+    """
+    if not STRIPE_ENABLED:
+        return
+    for status in ("active", "trialing"):
+        yield from stripe.Subscription.list(status=status, limit=100).auto_paging_iter()
+
+
 def get_subscription_status(stripe_customer_id: str) -> dict:
     """
-    Get the subscription status for a customer.
+    Get the subscription status for a customer from the Stripe API, in a single request.
+    GET /stripe/subscription serves the local mirror instead (helpers.subscriptions).
+
+    Listed subscriptions embed their items and prices (first 10 items), so no per-subscription
+    SubscriptionItem.list call is needed.
 
     Args:
         stripe_customer_id: Stripe customer ID
 
     Returns:
-        Dict with is_premium, plan, and expires_at
+        Dict with is_premium, plan, and expires_at (of the premium subscription if any)
     """
     if not STRIPE_ENABLED or not stripe_customer_id:
         return {"is_premium": False, "plan": None, "expires_at": None}
@@ -283,38 +454,188 @@ def get_subscription_status(stripe_customer_id: str) -> dict:
         subscriptions = stripe.Subscription.list(
             customer=stripe_customer_id,
             status="active",
-            limit=1,
+            limit=10,
         )
+    except stripe.error.StripeError as e:
+        logger.error(f"Stripe subscription check error: {e}")
+        return {"is_premium": False, "plan": None, "expires_at": None}
 
-        for sub in subscriptions.auto_paging_iter():
-            # Fetch subscription items separately (avoids items/items() conflict)
-            sub_items = stripe.SubscriptionItem.list(subscription=sub.id)
-            items_list = list(sub_items.auto_paging_iter())
-
-            price_id = items_list[0].price.id if items_list else None
-
-            # Check if this is a paid subscription (not free)
-            is_premium = False
-            for item in items_list:
-                if item.price.unit_amount and item.price.unit_amount > 0:
-                    is_premium = True
-                    break
-
-            # Get expiry date safely
-            expires_at = None
-            if hasattr(sub, "current_period_end") and sub.current_period_end:
-                expires_at = datetime.fromtimestamp(sub.current_period_end)
-            elif "current_period_end" in sub:
-                expires_at = datetime.fromtimestamp(sub["current_period_end"])
-
-            return {
-                "is_premium": is_premium,
-                "plan": price_id,
-                "expires_at": expires_at,
-            }
+    def is_premium(sub) -> bool:
+        # Subscript access: .items is the dict method
+        return any((item["price"].get("unit_amount") or 0) > 0 for item in sub["items"]["data"])
 
+    if not subscriptions.data:
         return {"is_premium": False, "plan": None, "expires_at": None}
+    sub = next((sub for sub in subscriptions.data if is_premium(sub)), subscriptions.data[0])
+    items = sub["items"]["data"]
+    # current_period_end moved from the subscription to its items in recent Stripe API versions
+    period_end = sub.get("current_period_end") or (items[0].get("current_period_end") if items else None)
+    return {
+        "is_premium": is_premium(sub),
+        "plan": items[0]["price"]["id"] if items else None,
+        "expires_at": datetime.fromtimestamp(period_end) if period_end else None,
+    }
+
+
+# ============================================================================
+# Async variants
+# ============================================================================
+
+
+async def sync_customer_async(
+    user_id: int,
+    email: str,
+    name: str,
+    existing_stripe_id: str | None = None,
+) -> str:
+    """Async variant of sync_customer."""
+    if not STRIPE_ENABLED:
+        logger.warning("Stripe not enabled, skipping customer sync")
+        return ""
+
+    try:
+        if existing_stripe_id:
+            customer = await stripe.Customer.modify_async(
+                existing_stripe_id,
+                email=email,
+                name=name,
+                metadata={"user_id": str(user_id)},
+            )
+            return customer.id
+
+        # Search for existing customer by email that we can reuse
+        existing = await stripe.Customer.list_async(email=email, limit=1)
+        if existing.data:
+            candidate = existing.data[0]
+            linked_user_id = candidate.metadata.get("user_id")
+
+            # Already linked to this user (e.g. provisioning retried or raced with the billing portal)
+            if linked_user_id == str(user_id):
+                return candidate.id
+
+            # Only reuse if customer has our metadata and user no longer exists
+            if linked_user_id:
+                from ..crud.users import get_user_by_id_async
+                from ..helpers.db import AsyncSessionLocal
+
+                async with AsyncSessionLocal() as session:
+                    user_exists = await get_user_by_id_async(session, int(linked_user_id)) is not None
+
+                if not user_exists:
+                    # Orphaned customer - safe to reuse
+                    await stripe.Customer.modify_async(
+                        candidate.id,
+                        name=name,
+                        metadata={"user_id": str(user_id)},
+                    )
+                    logger.info(f"Reused orphaned Stripe customer {candidate.id}")
+                    return candidate.id
+
+        # Create new customer (default path)
+        customer = await stripe.Customer.create_async(
+            email=email,
+            name=name,
+            metadata={"user_id": str(user_id)},
+        )
+        return customer.id
+
+    except stripe.error.StripeError as e:
+        logger.error(f"Stripe customer sync error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to sync with payment provider") from e
+
+
+async def create_subscription_async(
+    stripe_customer_id: str,
+    price_id: str | None = None,
+) -> str | None:
+    """Async variant of create_subscription."""
+    if not STRIPE_ENABLED:
+        return None
+
+    price = price_id or STRIPE_PRICING_FREE
+    if not price:
+        logger.debug("No price ID configured, skipping subscription creation")
+        return None
+
+    try:
+        subscription = await stripe.Subscription.create_async(
+            customer=stripe_customer_id,
+            items=[{"price": price}],
+        )
+        logger.info(f"Created subscription {subscription.id} for customer {stripe_customer_id}")
+        return subscription.id
+
+    except stripe.error.StripeError as e:
+        logger.error(f"Stripe subscription error: {e}")
+        return None
+
+
+async def has_active_subscription_async(stripe_customer_id: str) -> bool:
+    """Async variant of has_active_subscription."""
+    if not STRIPE_ENABLED or not stripe_customer_id:
+        return False
+
+    try:
+        subscriptions = await stripe.Subscription.list_async(
+            customer=stripe_customer_id,
+            status="active",
+            limit=1,
+        )
+        return len(subscriptions.data) > 0
 
     except stripe.error.StripeError as e:
         logger.error(f"Stripe subscription check error: {e}")
-        return {"is_premium": False, "plan": None, "expires_at": None}
+        return False
+
+
+async def create_billing_portal_session_async(
+    stripe_customer_id: str,
+    return_url: str,
+) -> str:
+    """Async variant of create_billing_portal_session."""
+    if not STRIPE_ENABLED:
+        raise HTTPException(status_code=500, detail="Payment provider not configured")
+
+    if not stripe_customer_id:
+        raise HTTPException(status_code=400, detail="No payment account linked")
+
+    try:
+        session = await stripe.billing_portal.Session.create_async(
+            customer=stripe_customer_id,
+            return_url=return_url,
+        )
+        return session.url
+
+    except stripe.error.StripeError as e:
+        logger.error(f"Stripe billing portal error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to create billing portal session") from e
+
+
+async def provision_customer_async(user_id: int) -> None:
+    """
+    Create the Stripe customer and free subscription of a new user, outside of the registration
+    request (run as a background task). Does nothing if the user already has a customer, e.g.
+    because they opened the billing portal first.
+    """
+    if not STRIPE_ENABLED:
+        return
+
+    from ..crud.users import get_user_by_id_async, update_user_async
+    from ..helpers.db import AsyncSessionLocal
+
+    try:
+        async with AsyncSessionLocal() as session:
+            user = await get_user_by_id_async(session, user_id)
+            if user is None or user.stripe_id:
+                return
+
+            user.stripe_id = await sync_customer_async(
+                user_id=user.id,
+                email=user.email,
+                name=f"{user.first_name} {user.last_name}",
+            )
+            await update_user_async(session, user)
+            await create_subscription_async(user.stripe_id)
+    except Exception as e:
+        # The customer is created on the first billing portal visit instead
+        logger.error(f"Stripe provisioning failed for user {user_id}: {e}")
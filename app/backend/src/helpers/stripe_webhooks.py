@@ -0,0 +1,193 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+"""
+Processing of Stripe webhook events stored in the stripe_webhook_events inbox.
+
+POST /stripe/webhook only verifies the signature and stores the raw event (once per Stripe event
+id), then acknowledges. Events are processed here, on a thread pool, right after the request and
+every STRIPE_WEBHOOK_POLL_SECONDS: each run claims the oldest unfinished event of each customer
+(FOR UPDATE SKIP LOCKED, so several uvicorn workers can process concurrently while the events of a
+customer stay in order), runs its handler, and records the outcome. Failed events are retried with
+exponential backoff, and block the later events of their customer until they succeed or give up
+after STRIPE_WEBHOOK_MAX_ATTEMPTS. src/stripe-replay.py queues events again for backfills.
+"""
+
+import datetime
+import logging
+import os
+import random
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.orm import Session
+
+from ..crud.stripe_webhook_events import claim_webhook_events, mark_webhook_event_failed, mark_webhook_event_processed
+from . import subscriptions
+from .db import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+STRIPE_WEBHOOK_WORKERS = int(os.environ.get("STRIPE_WEBHOOK_WORKERS") or 4)  # Events processed in parallel
+STRIPE_WEBHOOK_POLL_SECONDS = 5
+STRIPE_WEBHOOK_BATCH_SIZE = 100  # Events claimed per run
+STRIPE_WEBHOOK_LEASE_SECONDS = 300  # Claimed events are retried after this if their worker died
+STRIPE_WEBHOOK_MAX_ATTEMPTS = 10
+STRIPE_WEBHOOK_RETRY_BASE_SECONDS = 10
+STRIPE_WEBHOOK_RETRY_MAX_SECONDS = 3600
+STRIPE_WEBHOOK_RETENTION_DAYS = int(os.environ.get("STRIPE_WEBHOOK_RETENTION_DAYS") or 30)  # Processed events kept
+
+
+# ============================================================================
+# Handlers
+# ============================================================================
+
+
+def _mirror_subscription(session: Session, event: dict) -> None:
+    """
+    Write the event's subscription to the local mirror and sync the user's premium status.
+    Events older than the mirrored state (replays, redeliveries) are ignored.
+    """
+    subscription = event.get("data", {}).get("object", {})
+    if not subscription.get("customer"):
+        logger.warning("Webhook event missing customer ID")
+        return
+
+    observed_at = datetime.datetime.fromtimestamp(event.get("created") or 0, datetime.UTC)
+    subscriptions.record_subscription(session, subscription, observed_at)
+
+
+def _handle_subscription_created(session: Session, event: dict):
+    """Handle new subscription creation."""
+    subscription = event.get("data", {}).get("object", {})
+    logger.info(f"Subscription created: premium={subscriptions.is_premium_subscription(subscription)}")
+    _mirror_subscription(session, event)
+
+
+def _handle_subscription_updated(session: Session, event: dict):
+    """Handle subscription updates (plan changes, renewals)."""
+    subscription = event.get("data", {}).get("object", {})
+    logger.info(f"Subscription updated: premium={subscriptions.is_premium_subscription(subscription)}")
+    _mirror_subscription(session, event)
+
+
+def _handle_subscription_deleted(session: Session, event: dict):
+    """Handle subscription cancellation or expiration (the object's status is canceled)."""
+    logger.info("Subscription deleted")
+    _mirror_subscription(session, event)
+
+
+def _handle_payment_succeeded(_session: Session, _event: dict):
+    """Handle successful payment."""
+    pass
+
+
+def _handle_payment_failed(_session: Session, _event: dict):
+    """Handle failed payment."""
+    pass
+
+
+# Event type -> handler. Events of other types are stored and marked processed.
+EVENT_HANDLERS: dict[str, Callable[[Session, dict], None]] = {
+    "customer.subscription.created": _handle_subscription_created,
+    "customer.subscription.updated": _handle_subscription_updated,
+    "customer.subscription.deleted": _handle_subscription_deleted,
+    "invoice.payment_succeeded": _handle_payment_succeeded,
+    "invoice.payment_failed": _handle_payment_failed,
+}
+
+
+# ============================================================================
+# Worker
+# ============================================================================
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter, in seconds, after `attempts` failed attempts."""
+    return min(STRIPE_WEBHOOK_RETRY_MAX_SECONDS, STRIPE_WEBHOOK_RETRY_BASE_SECONDS * 2 ** (attempts - 1)) * (
+        random.uniform(0.5, 1)
+    )
+
+
+class StripeWebhookWorker:
+    """Processes claimed inbox events on a bounded thread pool."""
+
+    def __init__(self, workers: int):
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="stripe-webhooks")
+        self._run_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._stats_lock = threading.Lock()
+        self.processed = 0
+        self.retried = 0
+        self.failed = 0
+
+    def _process(self, event: dict) -> None:
+        handler = EVENT_HANDLERS.get(event["type"])
+        try:
+            if handler is not None:
+                with SessionLocal() as session:
+                    handler(session, event["payload"])
+        except Exception as e:
+            retry = event["attempts"] < STRIPE_WEBHOOK_MAX_ATTEMPTS
+            retry_at = (
+                datetime.datetime.now(datetime.UTC) + datetime.timedelta(seconds=retry_delay(event["attempts"]))
+                if retry
+                else None
+            )
+            logger.error(
+                f"Stripe event {event['id']} ({event['type']}) attempt {event['attempts']} failed "
+                f"({'retrying' if retry else 'giving up'}): {e}"
+            )
+            with SessionLocal() as session:
+                mark_webhook_event_failed(session, event["id"], str(e), retry_at)
+            with self._stats_lock:
+                if retry:
+                    self.retried += 1
+                else:
+                    self.failed += 1
+            return
+
+        with SessionLocal() as session:
+            mark_webhook_event_processed(session, event["id"])
+        with self._stats_lock:
+            self.processed += 1
+
+    def run(self) -> int:
+        """
+        Process due events until none is left. Returns the number of events processed.
+        Concurrent calls in the same process return immediately.
+        """
+        if not self._run_lock.acquire(blocking=False):
+            return 0
+        try:
+            processed = 0
+            while not self._stopping.is_set():
+                with SessionLocal() as session:
+                    events = claim_webhook_events(session, STRIPE_WEBHOOK_BATCH_SIZE, STRIPE_WEBHOOK_LEASE_SECONDS)
+                if not events:
+                    return processed
+                # Claimed events belong to distinct customers (or to none): they can run in parallel
+                for future in [self._executor.submit(self._process, event) for event in events]:
+                    try:
+                        future.result()
+                    except Exception as e:
+                        # Outcome not recorded: the event is retried when its lease expires
+                        logger.error(f"Stripe event processing crashed: {e}")
+                processed += len(events)
+            return processed
+        finally:
+            self._run_lock.release()
+
+    def shutdown(self) -> None:
+        """Stop after the events in flight (a run in progress claims no more)."""
+        self._stopping.set()
+        with self._run_lock:
+            self._executor.shutdown(wait=True)
+
+    def stats(self) -> dict[str, int]:
+        with self._stats_lock:
+            return {"processed": self.processed, "retried": self.retried, "failed": self.failed}
+
+
+stripe_webhook_worker = StripeWebhookWorker(STRIPE_WEBHOOK_WORKERS)
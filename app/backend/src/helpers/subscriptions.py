@@ -0,0 +1,232 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+"""
+Subscription status served from the local `subscriptions` mirror instead of the Stripe API.
+
+Stripe webhooks (controllers.stripe) write every subscription change to the mirror. Reads
+never wait on Stripe: when a customer's mirror is older than SUBSCRIPTION_MAX_AGE_SECONDS (or
+missing, e.g. for customers that existed before the mirror), the mirrored status is served and the
+customer's subscriptions are re-fetched from Stripe in the background. Each worker refreshes a
+customer at most once per SUBSCRIPTION_REFRESH_COOLDOWN_SECONDS. Fetches are recorded in
+customer_syncs, so the mirror of a customer without any subscription is fresh too.
+
+users.is_premium is also reconciled with Stripe in bulk every STRIPE_RECONCILIATION_INTERVAL_HOURS
+(tasks.subscriptions), repairing the drift left by missed webhooks without Stripe calls on user traffic.
+"""
+
+import datetime
+import logging
+import os
+import time
+
+from fastapi import BackgroundTasks
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..crud.subscriptions import (
+    get_customer_subscriptions,
+    get_customer_subscriptions_async,
+    get_customer_synced_at,
+    mark_customer_synced,
+    upsert_subscription,
+)
+from ..crud.users import (
+    get_user_by_stripe_id,
+    iter_stripe_premium_status,
+    set_user_premium_status,
+    set_users_premium_status,
+)
+from ..models.subscription import SubscriptionBase
+from ..models.user import UserBase
+from . import stripe as stripe_helper
+from .cache import TTLCache
+from .db import SessionLocal, advisory_lock
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+SUBSCRIPTION_MAX_AGE_SECONDS = int(os.environ.get("SUBSCRIPTION_MAX_AGE_SECONDS") or 3600)
+SUBSCRIPTION_REFRESH_COOLDOWN_SECONDS = 60
+STRIPE_RECONCILIATION_INTERVAL_HOURS = max(1, int(os.environ.get("STRIPE_RECONCILIATION_INTERVAL_HOURS") or 24))
+STRIPE_RECONCILIATION_BATCH_SIZE = 1000  # Users read per fetch and updated per statement
+
+ACTIVE_STATUSES = ("active", "trialing")
+
+# Customers refreshed recently by this worker
+_recent_refreshes = TTLCache(ttl=SUBSCRIPTION_REFRESH_COOLDOWN_SECONDS, maxsize=10_000)
+
+
+def is_premium_subscription(subscription) -> bool:
+    """Check if a Stripe subscription is for a premium plan (vs free)."""
+    if subscription.get("status") not in ACTIVE_STATUSES:
+        return False
+
+    # A subscription is premium if any item has a non-zero price
+    for item in subscription.get("items", {}).get("data", []):
+        if (item.get("price", {}).get("unit_amount") or 0) > 0:
+            return True
+
+    return False
+
+
+def _timestamp(value: int | None) -> datetime.datetime | None:
+    return datetime.datetime.fromtimestamp(value, datetime.UTC) if value else None
+
+
+def record_subscription(session: Session, subscription, observed_at: datetime.datetime) -> None:
+    """
+    Mirror a Stripe subscription object (from a webhook or the API) observed at `observed_at`,
+    and sync the customer's users.is_premium.
+    """
+    items = subscription.get("items", {}).get("data", [])
+    # current_period_end moved from the subscription to its items in recent Stripe API versions
+    period_end = subscription.get("current_period_end") or (items[0].get("current_period_end") if items else None)
+    written = upsert_subscription(
+        session,
+        {
+            "id": subscription["id"],
+            "customer_id": subscription["customer"],
+            "status": subscription.get("status") or "unknown",
+            "price_id": items[0].get("price", {}).get("id") if items else None,
+            "is_premium": is_premium_subscription(subscription),
+            "current_period_end": _timestamp(period_end),
+            "observed_at": observed_at,
+        },
+    )
+    if written:
+        sync_user_premium_status(session, subscription["customer"])
+
+
+def subscription_status(subscriptions: list[SubscriptionBase]) -> dict | None:
+    """Status of the customer's active subscription (premium ones first), or None without one."""
+    active = [subscription for subscription in subscriptions if subscription.status in ACTIVE_STATUSES]
+    if not active:
+        return None
+    best = max(
+        active,
+        key=lambda subscription: (
+            subscription.is_premium,
+            subscription.current_period_end or datetime.datetime.min.replace(tzinfo=datetime.UTC),
+        ),
+    )
+    return {"is_premium": best.is_premium, "plan": best.price_id, "expires_at": best.current_period_end}
+
+
+def sync_user_premium_status(session: Session, customer_id: str) -> None:
+    """Set users.is_premium from the customer's mirrored subscriptions."""
+    user = get_user_by_stripe_id(session, customer_id)
+    if not user:
+        logger.warning(f"No user found for Stripe customer {customer_id}")
+        return
+    status = subscription_status(get_customer_subscriptions(session, customer_id))
+    is_premium = bool(status and status["is_premium"])
+    if user.is_premium != is_premium:
+        set_user_premium_status(session, user, is_premium)
+        logger.info(f"Updated user {user.id} premium status to {is_premium}")
+
+
+def refresh_customer_subscriptions(customer_id: str) -> None:
+    """Re-fetch a customer's subscriptions from Stripe into the mirror. Runs as a background task."""
+    observed_at = datetime.datetime.now(datetime.UTC)
+    try:
+        subscriptions = stripe_helper.list_subscriptions(customer_id)
+    except Exception as e:
+        logger.error(f"Subscription refresh failed for {customer_id}: {e}")
+        return
+
+    with SessionLocal() as session:
+        for subscription in subscriptions:
+            record_subscription(session, subscription, observed_at)
+        sync_user_premium_status(session, customer_id)
+        # Also for customers without subscriptions, so their next reads do not call Stripe again
+        mark_customer_synced(session, customer_id)
+
+
+def get_subscription_status(session: Session, user: UserBase, background_tasks: BackgroundTasks) -> dict:
+    """
+    Subscription status of a user with a Stripe customer, from the mirror.
+    Schedules a background refresh if the mirror is stale or missing.
+    """
+    subscriptions = get_customer_subscriptions(session, user.stripe_id)
+    # Customers without subscriptions only have the time of the last fetch
+    synced_times = [subscription.synced_at for subscription in subscriptions]
+    synced_times.append(get_customer_synced_at(session, user.stripe_id))
+    synced_at = max((synced_time for synced_time in synced_times if synced_time), default=None)
+    stale = (
+        synced_at is None
+        or (datetime.datetime.now(datetime.UTC) - synced_at).total_seconds() > SUBSCRIPTION_MAX_AGE_SECONDS
+    )
+
+    if stale and stripe_helper.is_enabled() and _recent_refreshes.get(user.stripe_id) is None:
+        _recent_refreshes.set(user.stripe_id, True)
+        background_tasks.add_task(refresh_customer_subscriptions, user.stripe_id)
+
+    status = subscription_status(subscriptions)
+    if status is None:
+        # Nothing mirrored yet (refresh scheduled): fall back to is_premium as stored on the user
+        is_premium = bool(user.is_premium) if not subscriptions else False
+        return {"is_premium": is_premium, "plan": None, "expires_at": None}
+    return status
+
+
+async def has_mirrored_active_subscription_async(session: AsyncSession, customer_id: str) -> bool:
+    """
+    Check the mirror for an active subscription of a customer. Trusted when True (cancellations
+    are reported by webhooks); when False, the mirror may just be missing: ask Stripe.
+    """
+    return subscription_status(await get_customer_subscriptions_async(session, customer_id)) is not None
+
+
+def reconcile_premium_status() -> dict | None:
+    """
+    Set users.is_premium from the account's active subscriptions, listed from Stripe in bulk.
+    Only one worker runs it at a time (advisory lock); returns None if another one is running,
+    or the counts and run time.
+
+    Stripe is listed in full before anything is written: a failed listing changes nothing. Users
+    whose subscriptions were mirrored during the run keep their (newer) status.
+    """
+    with advisory_lock("premium_reconciliation") as acquired:
+        if not acquired:
+            return None
+
+        started = time.monotonic()
+        started_at = datetime.datetime.now(datetime.UTC)
+        subscription_count = 0
+        premium_customers: set[str] = set()
+        for subscription in stripe_helper.iter_active_subscriptions():
+            subscription_count += 1
+            if is_premium_subscription(subscription):
+                premium_customers.add(subscription["customer"])
+
+        checked = 0
+        grant: list[int] = []
+        revoke: list[int] = []
+        with SessionLocal() as session:
+            for user_id, stripe_id, is_premium in iter_stripe_premium_status(session, STRIPE_RECONCILIATION_BATCH_SIZE):
+                checked += 1
+                if stripe_id in premium_customers and not is_premium:
+                    grant.append(user_id)
+                elif stripe_id not in premium_customers and is_premium:
+                    revoke.append(user_id)
+
+        granted = revoked = 0
+        with SessionLocal() as session:
+            for user_ids, is_premium in ((grant, True), (revoke, False)):
+                for i in range(0, len(user_ids), STRIPE_RECONCILIATION_BATCH_SIZE):
+                    batch = user_ids[i : i + STRIPE_RECONCILIATION_BATCH_SIZE]
+                    updated = set_users_premium_status(session, batch, is_premium, mirrored_before=started_at)
+                    if is_premium:
+                        granted += updated
+                    else:
+                        revoked += updated
+
+    return {
+        "subscriptions": subscription_count,
+        "premium_customers": len(premium_customers),
+        "users_checked": checked,
+        "granted": granted,
+        "revoked": revoked,
+        "skipped": len(grant) + len(revoke) - granted - revoked,
+        "seconds": round(time.monotonic() - started, 1),
+    }
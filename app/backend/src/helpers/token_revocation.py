@@ -0,0 +1,197 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+"""
+Access token revocation.
+
+Revoking a user's tokens records a `revoked_before` time in the token_revocations table: their
+tokens issued (`iat`) before it are rejected. Each worker mirrors the table in memory, so that
+checking a token does not query the database on every request:
+- a Bloom filter of every user with a revocation younger than a token's lifetime: most requests
+  are cleared by it without any lookup
+- an exact cache of recent revocation times: revocations loaded by the periodic refresh, and
+  database lookups done on Bloom filter hits
+
+Only a Bloom filter hit missing from the exact cache queries Postgres. Other workers pick up a
+revocation at their next refresh (TOKEN_REVOCATION_REFRESH_SECONDS); the worker handling the
+revocation applies it immediately.
+"""
+
+import datetime
+import hashlib
+import os
+import threading
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..constants import JWT_ACCESS_TOKEN_EXPIRE_MINUTES
+from ..crud.token_revocations import (
+    delete_token_revocations_before,
+    get_token_revocation_async,
+    get_token_revocations_since,
+    upsert_token_revocation,
+    upsert_token_revocation_async,
+)
+from .cache import TTLCache
+from .db import AsyncSessionLocal, SessionLocal
+
+# Configuration
+TOKEN_REVOCATION_REFRESH_SECONDS = int(os.environ.get("TOKEN_REVOCATION_REFRESH_SECONDS") or 5)
+TOKEN_REVOCATION_BLOOM_BITS = int(os.environ.get("TOKEN_REVOCATION_BLOOM_BITS") or 1 << 20)  # 128 KiB
+TOKEN_REVOCATION_BLOOM_HASHES = 4  # ~1% false positives with 100k revoked users at the default size
+TOKEN_REVOCATION_CACHE_SIZE = int(os.environ.get("TOKEN_REVOCATION_CACHE_SIZE") or 10000)
+
+TOKEN_LIFETIME_SECONDS = JWT_ACCESS_TOKEN_EXPIRE_MINUTES * 60
+
+# Overlap between incremental refreshes, so revocations committed late are not missed
+_REFRESH_OVERLAP = datetime.timedelta(seconds=60)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter of integers."""
+
+    def __init__(self, bits: int, hashes: int):
+        self.bits = bits
+        self.hashes = hashes
+        self.count = 0
+        self._array = bytearray((bits + 7) // 8)
+
+    def _positions(self, item: int):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(item.to_bytes(8, "little", signed=True), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.bits for i in range(self.hashes))
+
+    def add(self, item: int) -> None:
+        for position in self._positions(item):
+            self._array[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: int) -> bool:
+        return all(self._array[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class TokenRevocationList:
+    """Per-worker mirror of the token_revocations table."""
+
+    def __init__(self, bloom_bits: int, bloom_hashes: int, cache_size: int):
+        self._bloom_bits = bloom_bits
+        self._bloom_hashes = bloom_hashes
+        self._lock = threading.Lock()
+        self._bloom = BloomFilter(bloom_bits, bloom_hashes)
+        # user_id -> revoked_before epoch (0.0: looked up, no revocation)
+        self._recent = TTLCache(ttl=TOKEN_LIFETIME_SECONDS, maxsize=cache_size)
+        self._cursor: datetime.datetime | None = None
+        self.checks = 0
+        self.bloom_hits = 0
+        self.db_lookups = 0
+        self.refreshed_at = 0.0
+
+    def _apply(self, user_id: int, revoked_before: float) -> None:
+        with self._lock:
+            self._bloom.add(user_id)
+        # Never move a known revocation backwards
+        self._recent.set(user_id, max(revoked_before, self._recent.get(user_id, 0.0)))
+
+    def refresh(self, full: bool = False) -> int:
+        """
+        Load revocations made since the last refresh, or rebuild the Bloom filter from every
+        revocation younger than a token's lifetime (dropping expired ones). Returns the rows loaded.
+        """
+        now = datetime.datetime.now(datetime.UTC)
+        if full or self._cursor is None:
+            since = now - datetime.timedelta(seconds=TOKEN_LIFETIME_SECONDS)
+        else:
+            since = self._cursor - _REFRESH_OVERLAP
+
+        with SessionLocal() as session:
+            rows = get_token_revocations_since(session, since)
+
+        if full or self._cursor is None:
+            bloom = BloomFilter(self._bloom_bits, self._bloom_hashes)
+            for user_id, _ in rows:
+                bloom.add(user_id)
+            with self._lock:
+                self._bloom = bloom
+        else:
+            for user_id, revoked_before in rows:
+                self._apply(user_id, revoked_before.timestamp())
+
+        self._cursor = max([now, *(revoked_before for _, revoked_before in rows)])
+        self.refreshed_at = time.time()
+        return len(rows)
+
+    def revoke(self, session: Session, user_id: int) -> None:
+        """Revoke every token of the user issued until now."""
+        revoked_before = datetime.datetime.now(datetime.UTC)
+        upsert_token_revocation(session, user_id, revoked_before)
+        self._apply(user_id, revoked_before.timestamp())
+
+    async def revoke_async(self, session: AsyncSession, user_id: int) -> None:
+        """Async variant of revoke."""
+        revoked_before = datetime.datetime.now(datetime.UTC)
+        await upsert_token_revocation_async(session, user_id, revoked_before)
+        self._apply(user_id, revoked_before.timestamp())
+
+    async def is_revoked(self, payload: dict) -> bool:
+        """Whether a verified access token payload was revoked."""
+        self.checks += 1
+        user_id = payload["id"]
+        with self._lock:
+            if user_id not in self._bloom:
+                return False
+        self.bloom_hits += 1
+
+        revoked_before = self._recent.get(user_id)
+        if revoked_before is None:
+            self.db_lookups += 1
+            async with AsyncSessionLocal() as session:
+                revoked_at = await get_token_revocation_async(session, user_id)
+            revoked_before = revoked_at.timestamp() if revoked_at else 0.0
+            self._recent.set(user_id, revoked_before)
+
+        # Tokens issued before iat was added: derive the issue time from the expiration
+        issued_at = payload.get("iat") or payload["exp"] - TOKEN_LIFETIME_SECONDS
+        return issued_at < revoked_before
+
+    def cleanup(self) -> int:
+        """Delete revocations older than a token's lifetime, and rebuild the Bloom filter without them."""
+        before = datetime.datetime.now(datetime.UTC) - datetime.timedelta(seconds=TOKEN_LIFETIME_SECONDS)
+        with SessionLocal() as session:
+            deleted = delete_token_revocations_before(session, before)
+        self.refresh(full=True)
+        return deleted
+
+    def stats(self) -> dict:
+        with self._lock:
+            revoked_users = self._bloom.count
+        return {
+            "revoked_users": revoked_users,
+            "bloom_bits": self._bloom_bits,
+            "cached": self._recent.stats()["size"],
+            "checks": self.checks,
+            "bloom_hits": self.bloom_hits,
+            "db_lookups": self.db_lookups,
+            "refreshed_seconds_ago": time.time() - self.refreshed_at if self.refreshed_at else None,
+        }
+
+
+# Process-wide revocation list
+token_revocations = TokenRevocationList(
+    TOKEN_REVOCATION_BLOOM_BITS, TOKEN_REVOCATION_BLOOM_HASHES, TOKEN_REVOCATION_CACHE_SIZE
+)
+
+
+def revoke_user_tokens(session: Session, user_id: int) -> None:
+    """
+    Revoke every access token of the user issued until now
+    (logout, password reset, admin demotion, deletion).
+    """
+    token_revocations.revoke(session, user_id)
+
+
+async def revoke_user_tokens_async(session: AsyncSession, user_id: int) -> None:
+    """Async variant of revoke_user_tokens."""
+    await token_revocations.revoke_async(session, user_id)
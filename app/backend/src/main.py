@@ -1,35 +1,59 @@
 # ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+import asyncio
+
 from fastapi import FastAPI, Request
-from fastapi.concurrency import asynccontextmanager
+from fastapi.concurrency import asynccontextmanager, run_in_threadpool
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
 from .constants import IS_PROD
-from .helpers.db import create_db_and_tables
+from .helpers.broadcast import broadcast_sender
+from .helpers.db import async_engine, async_replica_engine, create_db_and_tables
+from .helpers.email_outbox import email_outbox_worker
+from .helpers.event_log_buffer import event_log_buffer
+from .helpers.last_seen import last_seen_tracker
+from .helpers.password_hashing import password_hasher
 from .helpers.ratelimit import cleanup_entries
-from .helpers.stripe import init_stripe
+from .helpers.stripe import close_stripe, init_stripe
+from .helpers.stripe_webhooks import stripe_webhook_worker
+from .helpers.token_revocation import token_revocations
 from .router import router as api_router
-from .tasks import register_core_tasks
+from .tasks import start_core_tasks
+from .tasks.event_logs import maintain_event_log_partitions
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("Starting app")
     create_db_and_tables()
+    maintain_event_log_partitions()
+    token_revocations.refresh(full=True)
     cleanup_entries()
     init_stripe()
+    scheduled_tasks = start_core_tasks()
     yield
     print("Stopping app")
+    # A task run in progress ends before its loop does: the worker shutdowns below cut it short
+    for task in scheduled_tasks:
+        task.cancel()
+    await run_in_threadpool(email_outbox_worker.shutdown)
+    await run_in_threadpool(broadcast_sender.shutdown)
+    await run_in_threadpool(stripe_webhook_worker.shutdown)
+    await asyncio.gather(*scheduled_tasks, return_exceptions=True)
+    await run_in_threadpool(event_log_buffer.flush)
+    await run_in_threadpool(last_seen_tracker.flush)
+    await run_in_threadpool(password_hasher.shutdown)
+    await close_stripe()
+    await async_engine.dispose()
+    if async_replica_engine is not None:
+        await async_replica_engine.dispose()
 
 
 # Create FastAPI app instance
 app = FastAPI(debug=not IS_PROD, lifespan=lifespan)
 
-# Register scheduled tasks
-register_core_tasks(app)
-
 
 # Add CORS middleware (only needed in development when frontend runs separately)
 if not IS_PROD:
@@ -80,6 +104,7 @@ async def http_exception_handler(request: Request, exc: StarletteHTTPException):
             "detail": str(exc.detail),
         },
         status_code=exc.status_code,
+        headers=getattr(exc, "headers", None),
     )
 
 
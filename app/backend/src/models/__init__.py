@@ -2,10 +2,22 @@
 
 from .admin import (
     AdminDashboardStats,
+    AdminSystemStats,
     AdminUserListResponse,
     AdminUserRead,
     AdminUserUpdate,
+    CacheStats,
+    EmailOutboxStats,
+    EventLogBufferStats,
     ImpersonationResponse,
+    LastSeenStats,
+    PasswordHashingStats,
+    PoolStats,
+    RateLimitStats,
+    StripeCallStats,
+    StripeWebhookStats,
+    ThreadpoolStats,
+    TokenRevocationStats,
 )
 from .base import PaginatedItems
 from .user import (
@@ -28,10 +40,22 @@ from .user import (
 __all__ = [
     # Admin models
     "AdminDashboardStats",
+    "AdminSystemStats",
     "AdminUserListResponse",
     "AdminUserRead",
     "AdminUserUpdate",
+    "CacheStats",
+    "EmailOutboxStats",
+    "EventLogBufferStats",
     "ImpersonationResponse",
+    "LastSeenStats",
+    "PasswordHashingStats",
+    "PoolStats",
+    "RateLimitStats",
+    "StripeCallStats",
+    "StripeWebhookStats",
+    "ThreadpoolStats",
+    "TokenRevocationStats",
     # Base models
     "PaginatedItems",
     # User models
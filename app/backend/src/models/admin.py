@@ -5,6 +5,7 @@ Pydantic models for admin operations.
 """
 
 from datetime import datetime
+from typing import Literal
 
 from pydantic import BaseModel
 
@@ -44,6 +45,8 @@ class AdminUserListResponse(BaseModel):
 
     items: list[AdminUserRead]
     total: int
+    # exact: counted, estimate: from planner statistics, lower_bound: counting stopped at `total` (display "total+")
+    total_kind: Literal["exact", "estimate", "lower_bound"] = "exact"
     limit: int
     offset: int
 
@@ -57,6 +60,133 @@ class AdminDashboardStats(BaseModel):
     recent_events: list[EventLogRead]
 
 
+class PoolStats(BaseModel):
+    """Connection pool snapshot for one engine."""
+
+    pool_size: int
+    max_overflow: int
+    checked_out: int
+    checked_in: int
+    overflow: int
+    checkouts: int
+    timeouts: int
+    wait_avg_ms: float
+    wait_max_ms: float
+
+
+class ThreadpoolStats(BaseModel):
+    """Threadpool capacity used by sync endpoints."""
+
+    total_tokens: int
+    borrowed_tokens: int
+
+
+class EventLogBufferStats(BaseModel):
+    """Buffered event log writer counters."""
+
+    enabled: bool
+    queued: int
+    dropped: int
+    flushed: int
+    flush_failures: int
+
+
+class RateLimitStats(BaseModel):
+    """Rate limit storage gauges (key counts and memory are only tracked by the memory backend)."""
+
+    backend: str
+    keys: int | None
+    max_keys: int | None
+    approx_bytes: int | None
+    evictions: int
+
+
+class PasswordHashingStats(BaseModel):
+    """Password hashing pool counters."""
+
+    workers: int
+    max_queue: int
+    in_flight: int
+    completed: int
+    rejected: int
+
+
+class CacheStats(BaseModel):
+    """In-process cache counters since startup."""
+
+    size: int
+    maxsize: int
+    hits: int
+    misses: int
+    evictions: int
+    hit_rate: float
+
+
+class TokenRevocationStats(BaseModel):
+    """Worker's token revocation list: size, and how checks were resolved since startup."""
+
+    revoked_users: int
+    bloom_bits: int
+    cached: int
+    checks: int
+    bloom_hits: int
+    db_lookups: int
+    refreshed_seconds_ago: float | None
+
+
+class LastSeenStats(BaseModel):
+    """Coalesced last_seen_at writer counters."""
+
+    pending: int
+    dropped: int
+    flushed: int
+    flush_failures: int
+
+
+class EmailOutboxStats(BaseModel):
+    """Email outbox delivery counters for this worker."""
+
+    backend: str
+    sent: int
+    retried: int
+    failed: int
+
+
+class StripeCallStats(BaseModel):
+    """Latency of the Stripe API requests of this worker to one endpoint."""
+
+    count: int
+    errors: int
+    avg_ms: float
+    max_ms: float
+    buckets: dict[str, int]  # Upper bound in ms ("+Inf" for all) -> cumulative request count
+
+
+class StripeWebhookStats(BaseModel):
+    """Stripe webhook events processed by this worker."""
+
+    processed: int
+    retried: int
+    failed: int
+
+
+class AdminSystemStats(BaseModel):
+    """Runtime statistics for the worker serving the request."""
+
+    pid: int
+    db_pools: dict[str, PoolStats]
+    threadpool: ThreadpoolStats
+    event_log_buffer: EventLogBufferStats
+    rate_limit: RateLimitStats
+    password_hashing: PasswordHashingStats
+    token_cache: CacheStats
+    token_revocations: TokenRevocationStats
+    last_seen: LastSeenStats
+    email_outbox: EmailOutboxStats
+    stripe_webhooks: StripeWebhookStats
+    stripe_calls: dict[str, StripeCallStats]  # Per endpoint, e.g. "GET /v1/subscriptions"
+
+
 class ImpersonationResponse(BaseModel):
     """Response for impersonation endpoints."""
 
@@ -0,0 +1,70 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+"""
+Newsletter broadcasts to opted-in users (see helpers.broadcast).
+"""
+
+import datetime
+
+from pydantic import BaseModel, Field
+from sqlalchemy import Column, DateTime, Float, Integer, String
+
+from ..helpers.db import Base
+
+
+class BroadcastBase(Base):
+    """
+    A broadcast and its checkpoint.
+    status: pending -> running -> done | failed | cancelled. Recipients are sent in user id order, and
+    last_user_id is the highest id whose batch (and every batch before it) has been sent, so an
+    interrupted run resumes after it. A running broadcast whose heartbeat (updated_at) is older
+    than BROADCAST_LEASE_SECONDS is taken over by another worker.
+    """
+
+    __tablename__ = "broadcasts"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    template = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    status = Column(String(16), nullable=False, default="pending", index=True)
+    created_by = Column(Integer, nullable=True)  # Admin user id (no foreign key: kept if the admin is deleted)
+    last_user_id = Column(Integer, nullable=False, default=0)
+    sent_count = Column(Integer, nullable=False, default=0)
+    failed_count = Column(Integer, nullable=False, default=0)
+    batch_count = Column(Integer, nullable=False, default=0)
+    recipients_per_second = Column(Float, nullable=True)  # Throughput of the current (or last) run
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.datetime.now(datetime.UTC))
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class BroadcastCreate(BaseModel):
+    """Input schema for a broadcast. `template` names templates/email/broadcast/<template>.txt (and .html)."""
+
+    template: str = Field(pattern=r"^[a-z0-9_-]+$")
+    subject: str = Field(min_length=1, max_length=200)
+
+
+class BroadcastRead(BaseModel):
+    """Output schema for a broadcast and its progress."""
+
+    id: int
+    template: str
+    subject: str
+    status: str
+    created_by: int | None
+    last_user_id: int
+    sent_count: int
+    failed_count: int
+    batch_count: int
+    recipients_per_second: float | None
+    last_error: str | None
+    created_at: datetime.datetime
+    started_at: datetime.datetime | None
+    updated_at: datetime.datetime | None
+    finished_at: datetime.datetime | None
+
+    class Config:
+        from_attributes = True
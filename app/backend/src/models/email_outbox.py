@@ -0,0 +1,45 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+"""
+Transactional email outbox (see helpers.email_outbox).
+"""
+
+import datetime
+
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text
+
+from ..helpers.db import Base
+
+
+class EmailOutboxBase(Base):
+    """
+    An email waiting for delivery, or its delivery outcome.
+    status: pending -> sending (claimed by a worker until next_attempt_at) -> sent | failed,
+    back to pending with a later next_attempt_at after a retryable failure.
+    """
+
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    to_email = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+    html_body = Column(Text, nullable=True)
+    status = Column(String(16), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(
+        DateTime(timezone=True), nullable=False, default=lambda: datetime.datetime.now(datetime.UTC)
+    )
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.datetime.now(datetime.UTC))
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Deliverable emails, in due order
+        Index(
+            "ix_email_outbox_due",
+            "next_attempt_at",
+            postgresql_where=status.in_(["pending", "sending"]),
+        ),
+        Index("ix_email_outbox_status_created", "status", "created_at"),
+    )
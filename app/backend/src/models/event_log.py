@@ -12,24 +12,30 @@ from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Tex
 from sqlalchemy.dialects.postgresql import JSONB
 
 from ..helpers.db import Base
+from .base import PaginatedItems
 
 
 class EventLogBase(Base):
-    """SQLAlchemy model for event logs."""
+    """
+    SQLAlchemy model for event logs.
+    The table is range-partitioned by month on created_at (see crud.event_logs partition helpers),
+    so created_at is part of the primary key.
+    """
 
     __tablename__ = "event_logs"
 
-    id = Column(Integer, primary_key=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True, index=True)
     action = Column(String(100), nullable=False, index=True)
     details = Column(JSONB, default=dict)
     ip_address = Column(String(45), nullable=True)
     user_agent = Column(Text, nullable=True)
-    created_at = Column(DateTime, default=datetime.datetime.now, index=True)
+    created_at = Column(DateTime, primary_key=True, default=datetime.datetime.now, index=True)
 
-    # Composite index for user event history queries
     __table_args__ = (
+        # Composite index for user event history queries
         Index("idx_event_logs_user_created", "user_id", created_at.desc()),
+        {"postgresql_partition_by": "RANGE (created_at)"},
     )
 
 
@@ -72,3 +78,10 @@ class EventLogListResponse(BaseModel):
     total: int
     limit: int
     offset: int
+
+
+class EventLogCursorPage(PaginatedItems[EventLogRead]):
+    """Keyset-paginated response for event logs (cursor mode)."""
+
+    next_cursor: str | None = None
+    total: int | None = None  # Only computed when requested
@@ -0,0 +1,24 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+"""
+Storage for the Postgres rate limit backend (RATE_LIMIT_BACKEND=postgres).
+"""
+
+from sqlalchemy import Column, Float, String
+
+from ..helpers.db import Base
+
+
+class RateLimitBase(Base):
+    """
+    GCRA state per (bucket, key).
+    UNLOGGED: skips the WAL for faster writes; contents are lost on a crash, which only resets quotas.
+    """
+
+    __tablename__ = "rate_limits"
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    bucket = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    # Theoretical arrival time (epoch seconds): the quota is full again at this time, and the row can then be deleted
+    tat = Column(Float, nullable=False, index=True)
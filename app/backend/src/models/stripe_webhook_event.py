@@ -0,0 +1,55 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+"""
+Inbox of received Stripe webhook events (see helpers.stripe_webhooks).
+"""
+
+import datetime
+
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text
+from sqlalchemy.dialects.postgresql import JSONB
+
+from ..helpers.db import Base
+
+
+class StripeWebhookEventBase(Base):
+    """
+    A verified Stripe event, stored raw before processing. The Stripe event id is the primary
+    key, so redeliveries are stored (and processed) once.
+    status: pending -> processing (claimed until next_attempt_at) -> processed | failed,
+    back to pending with a later next_attempt_at after a failed attempt.
+    """
+
+    __tablename__ = "stripe_webhook_events"
+
+    id = Column(String, primary_key=True)  # Stripe event ID
+    type = Column(String, nullable=False)
+    customer_id = Column(String, nullable=True)  # Events of a customer are processed in creation order
+    payload = Column(JSONB, nullable=False)
+    stripe_created_at = Column(DateTime(timezone=True), nullable=False)
+    received_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.datetime.now(datetime.UTC))
+    status = Column(String(16), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(
+        DateTime(timezone=True), nullable=False, default=lambda: datetime.datetime.now(datetime.UTC)
+    )
+    last_error = Column(Text, nullable=True)
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Unfinished events per customer, in processing order
+        Index(
+            "ix_stripe_webhook_events_customer_order",
+            "customer_id",
+            "stripe_created_at",
+            "id",
+            postgresql_where=status.in_(["pending", "processing"]),
+        ),
+        # Due events
+        Index(
+            "ix_stripe_webhook_events_due",
+            "next_attempt_at",
+            postgresql_where=status.in_(["pending", "processing"]),
+        ),
+        Index("ix_stripe_webhook_events_status_processed", "status", "processed_at"),
+    )
@@ -0,0 +1,40 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+"""
+Local mirror of Stripe subscriptions (see helpers.subscriptions).
+"""
+
+from sqlalchemy import Boolean, Column, DateTime, String
+
+from ..helpers.db import Base
+
+
+class SubscriptionBase(Base):
+    """
+    A Stripe subscription, as last reported by a webhook or fetched from the Stripe API.
+    observed_at is when Stripe reported that state (event creation or fetch time): older webhooks
+    delivered out of order do not overwrite it. synced_at is when the row was last written.
+    """
+
+    __tablename__ = "subscriptions"
+
+    id = Column(String, primary_key=True)  # Stripe subscription ID
+    customer_id = Column(String, nullable=False, index=True)  # Stripe customer ID (users.stripe_id)
+    status = Column(String(32), nullable=False)
+    price_id = Column(String, nullable=True)
+    is_premium = Column(Boolean, nullable=False, default=False)
+    current_period_end = Column(DateTime(timezone=True), nullable=True)
+    observed_at = Column(DateTime(timezone=True), nullable=False)
+    synced_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class CustomerSyncBase(Base):
+    """
+    When a customer's subscriptions were last fetched from the Stripe API. Customers without any
+    subscription have no subscriptions row to carry a synced_at: this one tells their mirror is fresh.
+    """
+
+    __tablename__ = "customer_syncs"
+
+    customer_id = Column(String, primary_key=True)  # Stripe customer ID (users.stripe_id)
+    synced_at = Column(DateTime(timezone=True), nullable=False)
@@ -0,0 +1,21 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+"""
+Access token revocations (see helpers.token_revocation).
+"""
+
+from sqlalchemy import Column, DateTime, Integer
+
+from ..helpers.db import Base
+
+
+class TokenRevocationBase(Base):
+    """
+    Access tokens of `user_id` issued before `revoked_before` are revoked.
+    No foreign key to users: revocations must outlive deleted users until their tokens expire.
+    """
+
+    __tablename__ = "token_revocations"
+
+    user_id = Column(Integer, primary_key=True, autoincrement=False)
+    revoked_before = Column(DateTime(timezone=True), nullable=False, index=True)
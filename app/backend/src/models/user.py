@@ -3,7 +3,7 @@
 import datetime
 
 from pydantic import BaseModel, field_validator
-from sqlalchemy import Boolean, Column, DateTime, Integer, String
+from sqlalchemy import DDL, Boolean, Column, DateTime, Index, Integer, String, event, func, literal_column
 
 from ..helpers.db import Base
 
@@ -30,6 +30,22 @@ class UserBase(Base):
     __mapper_args__ = {"polymorphic_identity": "userbase"}
 
 
+# Text matched by the admin user search: lowercased "email first_name last_name".
+# Queries must use this exact expression for Postgres to pick the trigram index below.
+user_search_text = func.lower(
+    UserBase.email + literal_column("' '") + UserBase.first_name + literal_column("' '") + UserBase.last_name
+)
+
+# Trigram GIN index: serves ILIKE '%term%' and similarity ranking on user_search_text
+Index(
+    "ix_users_search_trgm",
+    user_search_text.label("search_text"),
+    postgresql_using="gin",
+    postgresql_ops={"search_text": "gin_trgm_ops"},
+)
+event.listen(Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+
 class UserRead(BaseModel):
     id: int
     email: str
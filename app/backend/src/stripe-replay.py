@@ -0,0 +1,92 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+"""
+Queue Stripe events in the webhook inbox again, for backfills and recovery.
+The running backend processes them (helpers.stripe_webhooks), in order per customer.
+
+Usage:
+    # Fetch events from the Stripe API (Stripe keeps them 30 days); events already in the inbox are skipped
+    python -m src.stripe-replay --since 2026-10-01 [--until 2026-10-15] [--type customer.subscription.updated]
+
+    # Same, but also process again the events already in the inbox
+    python -m src.stripe-replay --since 2026-10-01 --requeue
+
+    # Retry the events that failed for good (optionally only those received since a date)
+    python -m src.stripe-replay --failed [--since 2026-10-01]
+
+From the host: npm run stripe-replay -- --since 2026-10-01
+"""
+
+import argparse
+import datetime
+import json
+import sys
+
+import stripe
+
+from .crud.stripe_webhook_events import requeue_failed_webhook_events, store_webhook_events
+from .helpers import stripe as stripe_helper
+from .helpers.db import SessionLocal
+from .helpers.stripe_webhooks import EVENT_HANDLERS
+
+PAGE_SIZE = 100
+
+
+def _parse_date(value: str) -> datetime.datetime:
+    date = datetime.datetime.fromisoformat(value)
+    return date if date.tzinfo else date.replace(tzinfo=datetime.UTC)
+
+
+def replay_from_stripe(
+    since: datetime.datetime, until: datetime.datetime | None, types: list[str], requeue: bool
+) -> tuple[int, int]:
+    """Store the matching Stripe events in the inbox. Returns (events fetched, events queued)."""
+    created = {"gte": int(since.timestamp())}
+    if until is not None:
+        created["lt"] = int(until.timestamp())
+
+    fetched = queued = 0
+    page: list[dict] = []
+    with SessionLocal() as session:
+        for event in stripe.Event.list(created=created, types=types, limit=PAGE_SIZE).auto_paging_iter():
+            # Raw JSON, as stored by the webhook endpoint
+            page.append(json.loads(str(event)))
+            fetched += 1
+            if len(page) == PAGE_SIZE:
+                queued += store_webhook_events(session, page, requeue=requeue)
+                page = []
+        queued += store_webhook_events(session, page, requeue=requeue)
+    return fetched, queued
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Queue Stripe events in the webhook inbox again.")
+    parser.add_argument("--since", type=_parse_date, help="Events created (or with --failed, received) since")
+    parser.add_argument("--until", type=_parse_date, help="Events created before")
+    parser.add_argument(
+        "--type", action="append", dest="types", help="Event type (repeatable, default: every handled type)"
+    )
+    parser.add_argument("--requeue", action="store_true", help="Also process again events already in the inbox")
+    parser.add_argument("--failed", action="store_true", help="Retry the inbox events that failed for good")
+    args = parser.parse_args()
+
+    if args.failed:
+        with SessionLocal() as session:
+            count = requeue_failed_webhook_events(session, since=args.since)
+        print(f"Queued {count} failed events again")
+        return 0
+
+    if args.since is None:
+        parser.error("--since is required unless --failed is given")
+    if not stripe_helper.is_enabled():
+        print("Stripe is not configured (STRIPE_API_KEY)", file=sys.stderr)
+        return 1
+
+    stripe_helper.init_stripe()
+    fetched, queued = replay_from_stripe(args.since, args.until, args.types or list(EVENT_HANDLERS), args.requeue)
+    print(f"Fetched {fetched} events from Stripe, queued {queued}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
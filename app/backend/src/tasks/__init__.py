@@ -2,21 +2,48 @@
 
 """
 Scheduled tasks module.
-Provides periodic background tasks using fastapi-utils.
+Each task module returns the loops of its periodic tasks (tasks.scheduler.every); main.lifespan
+schedules them on the event loop at startup and cancels them at shutdown.
 
 Usage:
-    from .tasks import register_core_tasks
+    from .tasks import start_core_tasks
 
-    # In main.py, after app creation:
-    register_core_tasks(app)
+    # In main.lifespan:
+    scheduled_tasks = start_core_tasks()
+    yield
+    for task in scheduled_tasks:
+        task.cancel()
+    # ... stop the workers, then wait for runs in progress:
+    await asyncio.gather(*scheduled_tasks, return_exceptions=True)
 """
 
-from .cleanup import register_cleanup_tasks
+import asyncio
+from collections.abc import Coroutine
 
+from .broadcasts import broadcast_tasks
+from .cleanup import cleanup_tasks
+from .email_outbox import email_outbox_tasks
+from .event_logs import event_log_tasks
+from .last_seen import last_seen_tasks
+from .stripe_webhooks import stripe_webhook_tasks
+from .subscriptions import subscription_tasks
+from .token_revocations import token_revocation_tasks
 
-def register_core_tasks(app):
-    """
-    Register all core scheduled tasks with the FastAPI app.
-    Call this after creating the app instance.
-    """
-    register_cleanup_tasks(app)
+
+def core_tasks() -> list[Coroutine]:
+    """Loops of all core scheduled tasks."""
+    return [
+        *cleanup_tasks(),
+        *event_log_tasks(),
+        *token_revocation_tasks(),
+        *last_seen_tasks(),
+        *email_outbox_tasks(),
+        *broadcast_tasks(),
+        *stripe_webhook_tasks(),
+        *subscription_tasks(),
+    ]
+
+
+def start_core_tasks() -> list[asyncio.Task]:
+    """Schedule all core tasks on the running event loop. Call this from main.lifespan."""
+    return [asyncio.create_task(loop) for loop in core_tasks()]
@@ -0,0 +1,33 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+"""
+Newsletter broadcast tasks.
+"""
+
+import logging
+from collections.abc import Coroutine
+
+from ..helpers.broadcast import BROADCAST_POLL_SECONDS, broadcast_sender
+from .scheduler import every
+
+logger = logging.getLogger(__name__)
+
+
+def periodic_broadcast_sending():
+    """Claim and send one broadcast, if any."""
+    try:
+        broadcast_id = broadcast_sender.run()
+        if broadcast_id is not None:
+            logger.info(f"Broadcast {broadcast_id} run finished")
+    except Exception as e:
+        logger.error(f"Broadcast sending failed: {e}")
+
+
+def broadcast_tasks() -> list[Coroutine]:
+    """
+    Loops of the broadcast tasks, scheduled by main.lifespan.
+
+    Tasks:
+    - Sending of pending (or abandoned) broadcasts: Every BROADCAST_POLL_SECONDS
+    """
+    return [every(BROADCAST_POLL_SECONDS, periodic_broadcast_sending)]
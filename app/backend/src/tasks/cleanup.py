@@ -5,28 +5,28 @@ Cleanup tasks for periodic maintenance.
 """
 
 import logging
-
-from fastapi_utils.tasks import repeat_every
+from collections.abc import Coroutine
 
 from ..helpers.ratelimit import cleanup_entries as cleanup_ratelimit_entries
+from .scheduler import every
 
 logger = logging.getLogger(__name__)
 
 
-def register_cleanup_tasks(app):
+def periodic_ratelimit_cleanup():
+    """Clean up expired rate limit entries."""
+    try:
+        cleanup_ratelimit_entries()
+        logger.debug("Rate limit cleanup completed")
+    except Exception as e:
+        logger.error(f"Rate limit cleanup failed: {e}")
+
+
+def cleanup_tasks() -> list[Coroutine]:
     """
-    Register cleanup tasks with the FastAPI app.
+    Loops of the cleanup tasks, scheduled by main.lifespan.
 
     Tasks:
     - Rate limit cleanup: Every 5 minutes
     """
-
-    @app.on_event("startup")
-    @repeat_every(wait_first=True, seconds=300)  # Every 5 minutes
-    def periodic_ratelimit_cleanup():
-        """Clean up expired rate limit entries."""
-        try:
-            cleanup_ratelimit_entries()
-            logger.debug("Rate limit cleanup completed")
-        except Exception as e:
-            logger.error(f"Rate limit cleanup failed: {e}")
+    return [every(300, periodic_ratelimit_cleanup)]  # Every 5 minutes
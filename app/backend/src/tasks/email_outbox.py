@@ -0,0 +1,52 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+"""
+Email outbox tasks.
+"""
+
+import datetime
+import logging
+from collections.abc import Coroutine
+
+from ..crud.email_outbox import delete_sent_outbox_emails
+from ..helpers.db import SessionLocal
+from ..helpers.email_outbox import EMAIL_OUTBOX_POLL_SECONDS, EMAIL_OUTBOX_RETENTION_DAYS, email_outbox_worker
+from .scheduler import every
+
+logger = logging.getLogger(__name__)
+
+
+def periodic_email_outbox_delivery():
+    """Deliver queued emails."""
+    try:
+        count = email_outbox_worker.run()
+        if count:
+            logger.debug(f"Processed {count} outbox emails")
+    except Exception as e:
+        logger.error(f"Email outbox delivery failed: {e}")
+
+
+def periodic_email_outbox_cleanup():
+    """Delete delivered emails past the retention period."""
+    try:
+        before = datetime.datetime.now(datetime.UTC) - datetime.timedelta(days=EMAIL_OUTBOX_RETENTION_DAYS)
+        with SessionLocal() as session:
+            deleted = delete_sent_outbox_emails(session, before)
+        if deleted:
+            logger.info(f"Deleted {deleted} sent outbox emails")
+    except Exception as e:
+        logger.error(f"Email outbox cleanup failed: {e}")
+
+
+def email_outbox_tasks() -> list[Coroutine]:
+    """
+    Loops of the email outbox tasks, scheduled by main.lifespan.
+
+    Tasks:
+    - Delivery of due emails: Every EMAIL_OUTBOX_POLL_SECONDS
+    - Cleanup of sent emails older than EMAIL_OUTBOX_RETENTION_DAYS: Every hour
+    """
+    return [
+        every(EMAIL_OUTBOX_POLL_SECONDS, periodic_email_outbox_delivery),
+        every(3600, periodic_email_outbox_cleanup),  # Every hour
+    ]
@@ -0,0 +1,62 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+"""
+Event log maintenance tasks.
+"""
+
+import logging
+from collections.abc import Coroutine
+
+from ..constants import EVENT_LOG_PARTITIONS_AHEAD, EVENT_LOG_RETENTION_DETACH, EVENT_LOG_RETENTION_MONTHS
+from ..crud.event_logs import drop_expired_event_log_partitions, ensure_event_log_partitions
+from ..helpers.db import SessionLocal
+from ..helpers.event_log_buffer import EVENT_LOG_BUFFERED, EVENT_LOG_FLUSH_SECONDS, event_log_buffer
+from .scheduler import every
+
+logger = logging.getLogger(__name__)
+
+
+def maintain_event_log_partitions():
+    """Create upcoming monthly partitions and remove the ones past the retention period."""
+    with SessionLocal() as session:
+        created = ensure_event_log_partitions(session, EVENT_LOG_PARTITIONS_AHEAD)
+        removed = drop_expired_event_log_partitions(
+            session, EVENT_LOG_RETENTION_MONTHS, detach=EVENT_LOG_RETENTION_DETACH
+        )
+    if created:
+        logger.info(f"Created event log partitions: {', '.join(created)}")
+    if removed:
+        action = "Detached" if EVENT_LOG_RETENTION_DETACH else "Dropped"
+        logger.info(f"{action} expired event log partitions: {', '.join(removed)}")
+
+
+def periodic_event_log_partition_maintenance():
+    """Create future partitions and apply the retention policy."""
+    try:
+        maintain_event_log_partitions()
+    except Exception as e:
+        logger.error(f"Event log partition maintenance failed: {e}")
+
+
+def periodic_event_log_flush():
+    """Write buffered events to the database."""
+    try:
+        count = event_log_buffer.flush()
+        if count:
+            logger.debug(f"Flushed {count} buffered events")
+    except Exception as e:
+        logger.error(f"Event log flush failed: {e}")
+
+
+def event_log_tasks() -> list[Coroutine]:
+    """
+    Loops of the event log tasks, scheduled by main.lifespan.
+
+    Tasks:
+    - Partition maintenance: Every 6 hours (also run at startup from main.lifespan)
+    - Buffered event flush: Every EVENT_LOG_FLUSH_SECONDS (only when EVENT_LOG_BUFFERED is on)
+    """
+    tasks = [every(6 * 3600, periodic_event_log_partition_maintenance)]
+    if EVENT_LOG_BUFFERED:
+        tasks.append(every(EVENT_LOG_FLUSH_SECONDS, periodic_event_log_flush))
+    return tasks
@@ -0,0 +1,33 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+"""
+User activity tasks.
+"""
+
+import logging
+from collections.abc import Coroutine
+
+from ..helpers.last_seen import LAST_SEEN_FLUSH_SECONDS, last_seen_tracker
+from .scheduler import every
+
+logger = logging.getLogger(__name__)
+
+
+def periodic_last_seen_flush():
+    """Write recorded user activity to the database."""
+    try:
+        count = last_seen_tracker.flush()
+        if count:
+            logger.debug(f"Updated last_seen_at of {count} users")
+    except Exception as e:
+        logger.error(f"Last seen flush failed: {e}")
+
+
+def last_seen_tasks() -> list[Coroutine]:
+    """
+    Loops of the user activity tasks, scheduled by main.lifespan.
+
+    Tasks:
+    - last_seen_at flush: Every LAST_SEEN_FLUSH_SECONDS (also run on shutdown from main.lifespan)
+    """
+    return [every(LAST_SEEN_FLUSH_SECONDS, periodic_last_seen_flush)]
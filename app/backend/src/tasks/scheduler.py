@@ -0,0 +1,29 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+"""
+Periodic task loops, scheduled on the event loop by main.lifespan (see tasks.start_core_tasks).
+"""
+
+import asyncio
+import logging
+from collections.abc import Callable
+
+from fastapi.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+
+async def every(seconds: float, func: Callable[[], None], first_delay: float | None = None) -> None:
+    """
+    Run `func` in the threadpool every `seconds` (first run after `first_delay`, `seconds` by default)
+    until cancelled. A run never starts before the previous one is over. Cancelling the loop while
+    `func` runs only takes effect once it returns.
+    """
+    delay = seconds if first_delay is None else first_delay
+    while True:
+        await asyncio.sleep(delay)
+        delay = seconds
+        try:
+            await run_in_threadpool(func)
+        except Exception as e:
+            logger.error(f"Scheduled task {func.__name__} failed: {e}")
@@ -0,0 +1,52 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+"""
+Stripe webhook inbox tasks.
+"""
+
+import datetime
+import logging
+from collections.abc import Coroutine
+
+from ..crud.stripe_webhook_events import delete_processed_webhook_events
+from ..helpers.db import SessionLocal
+from ..helpers.stripe_webhooks import STRIPE_WEBHOOK_POLL_SECONDS, STRIPE_WEBHOOK_RETENTION_DAYS, stripe_webhook_worker
+from .scheduler import every
+
+logger = logging.getLogger(__name__)
+
+
+def periodic_stripe_webhook_processing():
+    """Process stored webhook events."""
+    try:
+        count = stripe_webhook_worker.run()
+        if count:
+            logger.debug(f"Processed {count} Stripe webhook events")
+    except Exception as e:
+        logger.error(f"Stripe webhook processing failed: {e}")
+
+
+def periodic_stripe_webhook_cleanup():
+    """Delete processed events past the retention period."""
+    try:
+        before = datetime.datetime.now(datetime.UTC) - datetime.timedelta(days=STRIPE_WEBHOOK_RETENTION_DAYS)
+        with SessionLocal() as session:
+            deleted = delete_processed_webhook_events(session, before)
+        if deleted:
+            logger.info(f"Deleted {deleted} processed Stripe webhook events")
+    except Exception as e:
+        logger.error(f"Stripe webhook cleanup failed: {e}")
+
+
+def stripe_webhook_tasks() -> list[Coroutine]:
+    """
+    Loops of the Stripe webhook inbox tasks, scheduled by main.lifespan.
+
+    Tasks:
+    - Processing of due events (retries, replays, events left by other workers): Every STRIPE_WEBHOOK_POLL_SECONDS
+    - Cleanup of events processed more than STRIPE_WEBHOOK_RETENTION_DAYS ago: Every hour
+    """
+    return [
+        every(STRIPE_WEBHOOK_POLL_SECONDS, periodic_stripe_webhook_processing),
+        every(3600, periodic_stripe_webhook_cleanup),
+    ]
@@ -0,0 +1,51 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+"""
+Subscription tasks.
+"""
+
+import logging
+from collections.abc import Coroutine
+
+from ..helpers import stripe as stripe_helper
+from ..helpers.subscriptions import STRIPE_RECONCILIATION_INTERVAL_HOURS, reconcile_premium_status
+from .scheduler import every
+
+logger = logging.getLogger(__name__)
+
+# First reconciliation after startup: with a long interval, frequent deploys would otherwise keep
+# postponing it. Workers starting together run it once (advisory lock)
+STRIPE_RECONCILIATION_STARTUP_DELAY_SECONDS = 60
+
+
+def periodic_premium_reconciliation():
+    """Repair premium statuses that drifted from Stripe (e.g. missed webhooks)."""
+    try:
+        result = reconcile_premium_status()
+        if result is not None:
+            logger.info(
+                f"Premium reconciliation: {result['subscriptions']} active subscriptions, "
+                f"{result['users_checked']} users checked, {result['granted']} granted, "
+                f"{result['revoked']} revoked, {result['skipped']} skipped in {result['seconds']}s"
+            )
+    except Exception as e:
+        logger.error(f"Premium reconciliation failed: {e}")
+
+
+def subscription_tasks() -> list[Coroutine]:
+    """
+    Loops of the subscription tasks, scheduled by main.lifespan.
+
+    Tasks:
+    - Reconciliation of users.is_premium with Stripe: A minute after startup, then every
+      STRIPE_RECONCILIATION_INTERVAL_HOURS (one worker at a time; only when Stripe is configured)
+    """
+    if not stripe_helper.is_enabled():
+        return []
+    return [
+        every(
+            STRIPE_RECONCILIATION_INTERVAL_HOURS * 3600,
+            periodic_premium_reconciliation,
+            first_delay=STRIPE_RECONCILIATION_STARTUP_DELAY_SECONDS,
+        )
+    ]
@@ -0,0 +1,46 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+"""
+Token revocation list tasks.
+"""
+
+import logging
+from collections.abc import Coroutine
+
+from ..helpers.token_revocation import TOKEN_REVOCATION_REFRESH_SECONDS, token_revocations
+from .scheduler import every
+
+logger = logging.getLogger(__name__)
+
+
+def periodic_token_revocation_refresh():
+    """Load revocations made by other workers."""
+    try:
+        token_revocations.refresh()
+    except Exception as e:
+        logger.error(f"Token revocation refresh failed: {e}")
+
+
+def periodic_token_revocation_cleanup():
+    """Drop revocations whose tokens have all expired."""
+    try:
+        deleted = token_revocations.cleanup()
+        if deleted:
+            logger.info(f"Deleted {deleted} expired token revocations")
+    except Exception as e:
+        logger.error(f"Token revocation cleanup failed: {e}")
+
+
+def token_revocation_tasks() -> list[Coroutine]:
+    """
+    Loops of the token revocation tasks, scheduled by main.lifespan.
+
+    Tasks:
+    - Incremental refresh of the worker's revocation list: Every TOKEN_REVOCATION_REFRESH_SECONDS
+      (full load at startup from main.lifespan)
+    - Cleanup of expired revocations and Bloom filter rebuild: Every hour
+    """
+    return [
+        every(TOKEN_REVOCATION_REFRESH_SECONDS, periodic_token_revocation_refresh),
+        every(3600, periodic_token_revocation_cleanup),
+    ]
@@ -0,0 +1,63 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+"""
+Backend test configuration.
+Settings are read from the environment when `src` is imported: placeholders let it import
+without a .env. Most tests bind the code under test to SQLite; the ones relying on Postgres
+features (partitioned tables, JSONB) use TEST_DATABASE_URL and are skipped when it is unset.
+"""
+
+import os
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+os.environ.setdefault("APP_DB_USER", "test")
+os.environ.setdefault("APP_DB_PASSWORD", "test")
+os.environ.setdefault("APP_DB_NAME", "test")
+os.environ.setdefault("USERS_PASSWORD_HASH_SECRET_KEY", "test")
+os.environ.setdefault("TOKEN_HASH_SECRET", "test")
+os.environ.setdefault("EMAIL_BACKEND", "file")
+
+
+@pytest.fixture
+def sqlite_sessions():
+    """Returns a factory: sqlite_sessions(*tables) creates the tables in an in-memory database
+    (shared by all threads) and returns its session factory."""
+    engines = []
+
+    def create(*tables):
+        engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        for table in tables:
+            table.create(engine)
+        engines.append(engine)
+        return sessionmaker(bind=engine)
+
+    yield create
+    for engine in engines:
+        engine.dispose()
+
+
+@pytest.fixture
+def postgres_sessions():
+    """Creates the schema (and the event log partitions) in the TEST_DATABASE_URL database,
+    dropped after the test, and returns its session factory."""
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL is not set")
+
+    import src.main  # noqa: F401  Registers every model on Base.metadata
+    from src.crud.event_logs import ensure_event_log_partitions
+    from src.helpers.db import Base
+
+    engine = create_engine(url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    sessions = sessionmaker(bind=engine)
+    with sessions() as session:
+        ensure_event_log_partitions(session, months_ahead=1)
+    yield sessions
+    Base.metadata.drop_all(engine)
+    engine.dispose()
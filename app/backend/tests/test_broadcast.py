@@ -0,0 +1,58 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+import pytest
+
+from src.crud.broadcasts import create_broadcast, get_broadcast
+from src.helpers import broadcast
+from src.helpers.broadcast import BroadcastSender
+from src.helpers.email import FileBackend
+from src.models.user import UserBase
+
+
+class CrashingBackend(FileBackend):
+    def send_batch(self, recipients, subject, body, html_body):
+        raise ValueError("Invalid header value")
+
+
+@pytest.fixture
+def broadcast_sessions(postgres_sessions, monkeypatch):
+    monkeypatch.setattr(broadcast, "SessionLocal", postgres_sessions)
+    with postgres_sessions() as session:
+        for i in range(5):
+            session.add(UserBase(email=f"user{i}@example.com", first_name="A", last_name="B", hashed_password="x"))
+        broadcast_id = create_broadcast(session, "newsletter", "News", created_by=None).id
+    return postgres_sessions, broadcast_id
+
+
+def test_crashing_batch_is_recorded_as_failed(broadcast_sessions, monkeypatch, tmp_path):
+    sessions, broadcast_id = broadcast_sessions
+    monkeypatch.setattr(broadcast, "email_backend", CrashingBackend(str(tmp_path)))
+
+    sender = BroadcastSender(concurrency=2, batch_size=2)
+    assert sender.run() == broadcast_id
+    sender.shutdown()
+
+    with sessions() as session:
+        sent = get_broadcast(session, broadcast_id)
+        assert (sent.status, sent.sent_count, sent.failed_count) == ("done", 0, 5)
+        assert sent.last_error == "Invalid header value"
+
+
+def test_failing_recipient_stream_fails_the_broadcast(broadcast_sessions, monkeypatch, tmp_path):
+    sessions, broadcast_id = broadcast_sessions
+    monkeypatch.setattr(broadcast, "email_backend", FileBackend(str(tmp_path)))
+
+    def failing_stream(session, after_user_id, batch_size):
+        yield session.query(UserBase).order_by(UserBase.id).limit(batch_size).all()
+        raise RuntimeError("Connection lost")
+
+    monkeypatch.setattr(broadcast, "iter_newsletter_recipients", failing_stream)
+
+    sender = BroadcastSender(concurrency=2, batch_size=2)
+    assert sender.run() == broadcast_id
+    sender.shutdown()
+
+    with sessions() as session:
+        failed = get_broadcast(session, broadcast_id)
+        assert (failed.status, failed.sent_count) == ("failed", 2)
+        assert failed.last_error == "Sending failed: Connection lost"
@@ -0,0 +1,91 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+import asyncio
+import datetime
+
+import pytest
+from sqlalchemy import select
+
+from src.crud.email_outbox import create_outbox_email
+from src.helpers import email_outbox
+from src.helpers.email import FileBackend
+from src.models.email_outbox import EmailOutboxBase
+from src.tasks import email_outbox as email_outbox_tasks
+from src.tasks import start_core_tasks
+
+
+@pytest.fixture
+def outbox_sessions(sqlite_sessions, monkeypatch, tmp_path):
+    sessions = sqlite_sessions(EmailOutboxBase.__table__)
+    monkeypatch.setattr(email_outbox, "SessionLocal", sessions)
+    monkeypatch.setattr(email_outbox_tasks, "SessionLocal", sessions)
+    monkeypatch.setattr(email_outbox, "email_backend", FileBackend(str(tmp_path)))
+    return sessions
+
+
+def test_queued_email_is_delivered_by_the_scheduled_tasks(outbox_sessions, monkeypatch, tmp_path):
+    monkeypatch.setattr(email_outbox_tasks, "EMAIL_OUTBOX_POLL_SECONDS", 0.05)
+    with outbox_sessions() as session:
+        create_outbox_email(session, "user@example.com", "Verify your email", "Hello", None)
+
+    def status() -> str:
+        with outbox_sessions() as session:
+            return session.scalar(select(EmailOutboxBase.status))
+
+    async def run_core_tasks_until_sent():
+        # As main.lifespan does
+        scheduled_tasks = start_core_tasks()
+        try:
+            for _ in range(100):
+                await asyncio.sleep(0.05)
+                if status() == "sent":
+                    return
+        finally:
+            for task in scheduled_tasks:
+                task.cancel()
+            await asyncio.gather(*scheduled_tasks, return_exceptions=True)
+
+    asyncio.run(run_core_tasks_until_sent())
+
+    assert status() == "sent"
+    [message] = tmp_path.iterdir()
+    assert b"To: user@example.com" in message.read_bytes()
+
+
+class CrashingBackend(FileBackend):
+    def send(self, to_email, subject, body, html_body=None):
+        raise ValueError("Template rendering failed")
+
+
+def test_unexpected_delivery_error_is_recorded_and_retried(outbox_sessions, monkeypatch, tmp_path):
+    monkeypatch.setattr(email_outbox, "email_backend", CrashingBackend(str(tmp_path)))
+    with outbox_sessions() as session:
+        create_outbox_email(session, "user@example.com", "Verify your email", "Hello", None)
+
+    assert email_outbox.email_outbox_worker.run() == 1
+
+    with outbox_sessions() as session:
+        email = session.scalars(select(EmailOutboxBase)).one()
+        assert (email.status, email.attempts, email.last_error) == ("pending", 1, "Template rendering failed")
+
+
+def test_email_abandoned_on_its_last_attempt_is_failed_not_claimed_again(outbox_sessions):
+    expired_lease = datetime.datetime.now(datetime.UTC) - datetime.timedelta(seconds=1)
+    with outbox_sessions() as session:
+        session.add(
+            EmailOutboxBase(
+                to_email="user@example.com",
+                subject="Verify your email",
+                body="Hello",
+                status="sending",
+                attempts=email_outbox.EMAIL_MAX_ATTEMPTS,
+                next_attempt_at=expired_lease,
+            )
+        )
+        session.commit()
+
+    assert email_outbox.email_outbox_worker.run() == 0
+
+    with outbox_sessions() as session:
+        email = session.scalars(select(EmailOutboxBase)).one()
+        assert (email.status, email.attempts) == ("failed", email_outbox.EMAIL_MAX_ATTEMPTS)
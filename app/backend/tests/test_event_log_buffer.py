@@ -0,0 +1,52 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+import pytest
+from sqlalchemy import select
+
+from src.helpers import event_log_buffer as event_log_buffer_module
+from src.helpers.event_log_buffer import EventLogBuffer
+from src.models.event_log import EventLogBase
+from src.models.user import UserBase
+
+
+@pytest.fixture
+def event_log_sessions(postgres_sessions, monkeypatch):
+    monkeypatch.setattr(event_log_buffer_module, "engine", postgres_sessions.kw["bind"])
+    return postgres_sessions
+
+
+def _event(action: str, user_id: int | None = None) -> dict:
+    return {"action": action, "user_id": user_id, "details": {}, "ip_address": None, "user_agent": None}
+
+
+def test_event_of_a_user_deleted_before_the_flush_is_written_without_its_user(event_log_sessions):
+    with event_log_sessions() as session:
+        session.add(UserBase(id=1, email="user@example.com", first_name="A", last_name="B", hashed_password="x"))
+        session.commit()
+    buffer = EventLogBuffer(flush_size=100, max_size=100)
+    buffer.add(_event("admin.user.delete", user_id=1))
+    buffer.add(_event("user.login"))
+    with event_log_sessions() as session:
+        session.delete(session.get(UserBase, 1))
+        session.commit()
+
+    assert buffer.flush() == 2
+
+    with event_log_sessions() as session:
+        rows = session.execute(select(EventLogBase.action, EventLogBase.user_id).order_by(EventLogBase.action)).all()
+    assert rows == [("admin.user.delete", None), ("user.login", None)]
+    assert buffer.stats() == {"queued": 0, "dropped": 0, "flushed": 2, "flush_failures": 0}
+
+
+def test_rejected_row_is_dropped_instead_of_blocking_the_buffer(event_log_sessions):
+    buffer = EventLogBuffer(flush_size=100, max_size=100)
+    buffer.add(_event("user.login"))
+    buffer.add(_event(None))  # Violates NOT NULL
+    buffer.add(_event("user.logout"))
+
+    assert buffer.flush() == 2
+    assert buffer.flush() == 0
+
+    with event_log_sessions() as session:
+        assert set(session.scalars(select(EventLogBase.action))) == {"user.login", "user.logout"}
+    assert buffer.stats() == {"queued": 0, "dropped": 1, "flushed": 2, "flush_failures": 0}
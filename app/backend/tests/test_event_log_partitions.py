@@ -0,0 +1,29 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+import datetime
+
+from sqlalchemy import text
+
+from src.crud.event_logs import _month_start, _partition_name, ensure_event_log_partitions
+from src.models.event_log import EventLogBase
+
+
+def test_rows_of_a_new_month_are_moved_out_of_the_default_partition(postgres_sessions):
+    month = _month_start(datetime.date.today(), 3)
+    with postgres_sessions() as session:
+        session.add(
+            EventLogBase(action="user.login", details={}, created_at=datetime.datetime(month.year, month.month, 2))
+        )
+        session.add(EventLogBase(action="user.login", details={}, created_at=datetime.datetime(2000, 1, 1)))
+        session.commit()
+
+        created = ensure_event_log_partitions(session, months_ahead=3)
+
+        assert _partition_name(month) in created
+        rows = session.execute(
+            text("SELECT tableoid::regclass::text, created_at FROM event_logs ORDER BY created_at")
+        ).all()
+    assert rows == [
+        ("event_logs_default", datetime.datetime(2000, 1, 1)),
+        (_partition_name(month), datetime.datetime(month.year, month.month, 2)),
+    ]
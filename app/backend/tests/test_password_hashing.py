@@ -0,0 +1,33 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from src.controllers import users
+from src.helpers.password_hashing import DUMMY_PASSWORD_HASH, needs_rehash
+
+
+def test_login_with_an_unknown_email_still_verifies_a_bcrypt_hash(monkeypatch):
+    verified = []
+
+    async def no_user(session, email):
+        return None
+
+    async def verify(password, hashed_password):
+        verified.append(hashed_password)
+        return False
+
+    monkeypatch.setattr(users, "get_user_by_email_async", no_user)
+    monkeypatch.setattr(users, "verify_password_async", verify)
+    form_data = SimpleNamespace(username="nobody@example.com", password="password")
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(users.login_user(request=None, session=None, form_data=form_data))
+
+    assert exc_info.value.status_code == 401
+    assert verified == [DUMMY_PASSWORD_HASH]
+    # Same cost as real hashes
+    assert not needs_rehash(DUMMY_PASSWORD_HASH)
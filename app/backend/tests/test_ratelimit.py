@@ -0,0 +1,78 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+import threading
+import uuid
+
+from fastapi import Depends, FastAPI, Request
+from fastapi.testclient import TestClient
+
+from src.helpers import ratelimit
+from src.helpers.ratelimit import RateLimit, RateLimits, SharedMemoryBackend, get_client_ip
+
+
+def _client(*limits: RateLimit) -> TestClient:
+    app = FastAPI()
+
+    @app.post("/reset", dependencies=[Depends(RateLimits(*limits))])
+    def reset():
+        return {}
+
+    return TestClient(app)
+
+
+def test_email_key_limits_each_email_separately():
+    action = f"test-{uuid.uuid4()}"
+    client = _client(RateLimit(action, quota=1, duration_minutes=5, key="email"))
+
+    assert client.post("/reset", json={"email": "a@example.com"}).status_code == 200
+    assert client.post("/reset", json={"email": "A@example.com"}).status_code == 429
+    assert client.post("/reset", json={"email": "b@example.com"}).status_code == 200
+
+
+def test_rejected_request_consumes_none_of_the_limits():
+    action = f"test-{uuid.uuid4()}"
+    client = _client(
+        RateLimit(f"{action}-cooldown", quota=1, duration_minutes=5, key="email"),
+        RateLimit(f"{action}-daily", quota=2, duration_minutes=60 * 24),
+    )
+
+    assert client.post("/reset", json={"email": "a@example.com"}).status_code == 200
+    rejected = client.post("/reset", json={"email": "a@example.com"})
+    assert rejected.status_code == 429
+    assert "Retry-After" in rejected.headers
+    accepted = client.post("/reset", json={"email": "b@example.com"})
+    assert accepted.status_code == 200
+    assert accepted.headers["RateLimit-Remaining"] == "0"
+    assert client.post("/reset", json={"email": "c@example.com"}).status_code == 429
+
+
+def test_client_ip_is_the_first_forwarded_entry():
+    app = FastAPI()
+
+    @app.get("/ip")
+    def ip(request: Request):
+        return get_client_ip(request)
+
+    response = TestClient(app).get("/ip", headers={"X-Forwarded-For": "203.0.113.7, 10.0.0.2"})
+    assert response.json() == "203.0.113.7"
+
+
+def test_shared_backend_checks_run_off_the_event_loop(monkeypatch, tmp_path):
+    # Waiting for SQLite's write lock must not block the event loop
+    hit_threads = []
+
+    class RecordingBackend(SharedMemoryBackend):
+        def hit(self, checks, consume):
+            hit_threads.append(threading.get_ident())
+            return super().hit(checks, consume)
+
+    monkeypatch.setattr(ratelimit, "backend", RecordingBackend(str(tmp_path / "ratelimit.sqlite3")))
+    app = FastAPI()
+
+    @app.get("/loop", dependencies=[Depends(RateLimits(RateLimit(f"test-{uuid.uuid4()}", quota=1)))])
+    async def loop():
+        return threading.get_ident()
+
+    response = TestClient(app).get("/loop")
+    assert response.status_code == 200
+    assert hit_threads and hit_threads[0] != response.json()
@@ -0,0 +1,82 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import stripe
+
+from src.helpers import stripe as stripe_helper
+
+
+def _subscription(subscription_id: str, price_id: str, unit_amount: int) -> dict:
+    return {
+        "id": subscription_id,
+        "object": "subscription",
+        "status": "active",
+        "items": {
+            "object": "list",
+            "data": [
+                {
+                    "id": f"si_{subscription_id}",
+                    "object": "subscription_item",
+                    "current_period_end": 1893456000,
+                    "price": {"id": price_id, "object": "price", "unit_amount": unit_amount},
+                }
+            ],
+            "has_more": False,
+        },
+    }
+
+
+class StripeStandIn(BaseHTTPRequestHandler):
+    """Serves a customer with a free and a premium subscription, recording the requests."""
+
+    requests: list[str] = []
+
+    def do_GET(self):
+        self.requests.append(f"GET {self.path.split('?')[0]}")
+        body = {
+            "object": "list",
+            "url": "/v1/subscriptions",
+            "has_more": False,
+            "data": [_subscription("sub_free", "price_free", 0), _subscription("sub_premium", "price_premium", 900)],
+        }
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stripe_stand_in(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StripeStandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    StripeStandIn.requests = []
+    monkeypatch.setattr(stripe, "api_base", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setattr(stripe, "default_http_client", None)
+    monkeypatch.setattr(stripe_helper, "STRIPE_ENABLED", True)
+    monkeypatch.setattr(stripe_helper, "STRIPE_API_KEY", "sk_test_stand_in")
+    monkeypatch.setattr(stripe, "api_key", None)
+    stripe_helper.init_stripe()
+    yield StripeStandIn.requests
+    stripe.default_http_client.close()
+    server.shutdown()
+    server.server_close()
+
+
+def test_subscription_status_is_read_in_one_request(stripe_stand_in):
+    for _ in range(3):
+        status = stripe_helper.get_subscription_status("cus_StandIn1234")
+
+        assert status["is_premium"] is True
+        assert status["plan"] == "price_premium"
+
+    assert stripe_stand_in == ["GET /v1/subscriptions"] * 3
+    assert stripe_helper.get_stripe_stats()["GET /v1/subscriptions"]["count"] == 3
@@ -0,0 +1,39 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+import pytest
+from sqlalchemy import select
+
+from src.crud.stripe_webhook_events import store_webhook_events
+from src.helpers import stripe_webhooks
+from src.helpers.stripe_webhooks import StripeWebhookWorker
+from src.models.stripe_webhook_event import StripeWebhookEventBase
+
+
+@pytest.fixture
+def webhook_sessions(postgres_sessions, monkeypatch):
+    monkeypatch.setattr(stripe_webhooks, "SessionLocal", postgres_sessions)
+    with postgres_sessions() as session:
+        store_webhook_events(session, [{"id": "evt_1", "type": "ping", "created": 1, "data": {"object": {}}}])
+    return postgres_sessions
+
+
+def _status(sessions) -> str:
+    with sessions() as session:
+        return session.scalar(select(StripeWebhookEventBase.status))
+
+
+def test_due_events_are_processed(webhook_sessions):
+    worker = StripeWebhookWorker(workers=2)
+
+    assert worker.run() == 1
+    assert _status(webhook_sessions) == "processed"
+    worker.shutdown()
+
+
+def test_stopped_worker_claims_no_more_events(webhook_sessions):
+    worker = StripeWebhookWorker(workers=2)
+    worker.shutdown()
+
+    # A run scheduled after the response of a late webhook
+    assert worker.run() == 0
+    assert _status(webhook_sessions) == "pending"
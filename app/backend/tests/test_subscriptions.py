@@ -0,0 +1,53 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+import asyncio
+
+from fastapi import BackgroundTasks
+
+from src.helpers import stripe as stripe_helper
+from src.helpers import subscriptions
+from src.models.user import UserBase
+from src.tasks import subscriptions as subscription_tasks
+
+
+def test_reconciliation_runs_soon_after_startup(monkeypatch):
+    runs = []
+    monkeypatch.setattr(stripe_helper, "is_enabled", lambda: True)
+    monkeypatch.setattr(subscription_tasks, "STRIPE_RECONCILIATION_STARTUP_DELAY_SECONDS", 0.01)
+    monkeypatch.setattr(subscription_tasks, "reconcile_premium_status", lambda: runs.append(1))
+
+    async def run_for_a_moment():
+        [loop] = [asyncio.ensure_future(task) for task in subscription_tasks.subscription_tasks()]
+        await asyncio.sleep(0.2)
+        loop.cancel()
+        await asyncio.gather(loop, return_exceptions=True)
+
+    asyncio.run(run_for_a_moment())
+
+    # Once, not after the full STRIPE_RECONCILIATION_INTERVAL_HOURS
+    assert runs == [1]
+
+
+def test_customer_without_subscriptions_is_not_refetched_on_every_read(postgres_sessions, monkeypatch):
+    fetched = []
+    monkeypatch.setattr(subscriptions, "SessionLocal", postgres_sessions)
+    monkeypatch.setattr(stripe_helper, "is_enabled", lambda: True)
+    monkeypatch.setattr(stripe_helper, "list_subscriptions", lambda customer_id: fetched.append(customer_id) or [])
+
+    with postgres_sessions() as session:
+        user = UserBase(email="user@example.com", first_name="A", last_name="B", hashed_password="x")
+        user.stripe_id = "cus_NoSubscriptions"
+        session.add(user)
+        session.commit()
+
+        for _ in range(2):
+            # Every read after the per-worker cooldown
+            subscriptions._recent_refreshes.invalidate()
+            background_tasks = BackgroundTasks()
+            status = subscriptions.get_subscription_status(session, user, background_tasks)
+            for task in background_tasks.tasks:
+                task.func(*task.args)
+
+            assert status["is_premium"] is False
+
+    assert fetched == ["cus_NoSubscriptions"]
@@ -0,0 +1,32 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+from sqlalchemy import select
+
+from src.controllers.users import logout_user
+from src.models.token_revocation import TokenRevocationBase
+from src.models.user import UserBase, UserRead
+
+
+def _user(session) -> UserRead:
+    user = UserBase(email="user@example.com", first_name="A", last_name="B", hashed_password="x")
+    session.add(user)
+    session.commit()
+    return UserRead.model_validate(user)
+
+
+def test_logout_revokes_the_tokens_of_the_user(postgres_sessions):
+    with postgres_sessions() as session:
+        user = _user(session)
+
+        logout_user(session=session, current_user=user, real_admin_id=None)
+
+        assert session.scalars(select(TokenRevocationBase.user_id)).all() == [user.id]
+
+
+def test_logout_while_impersonating_keeps_the_impersonated_user_signed_in(postgres_sessions):
+    with postgres_sessions() as session:
+        user = _user(session)
+
+        logout_user(session=session, current_user=user, real_admin_id=user.id + 1)
+
+        assert session.scalars(select(TokenRevocationBase.user_id)).all() == []
@@ -187,8 +187,10 @@ export function useAuthActions() {
 
     /**
      * Logout and clear session.
+     * Revokes the token server-side; the local session is cleared even if that request fails.
      */
-    function logout(): void {
+    async function logout(): Promise<void> {
+        await api.post<AuthMessageResponse>('/users/logout').catch(() => {});
         auth.logout();
         toast.add({
             color: 'success',
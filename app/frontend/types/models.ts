@@ -25,7 +25,8 @@ export type Models =
   | ImpersonationResponse
   | EventLogRead
   | EventLogFilter
-  | EventLogListResponse;
+  | EventLogListResponse
+  | EventLogCursorPage;
 export type Id = number;
 export type Email = string;
 export type FirstName = string;
@@ -71,6 +72,7 @@ export type IsAdmin2 = boolean | null;
 export type IsPremium2 = boolean | null;
 export type Items = AdminUserRead[];
 export type Total = number;
+export type TotalKind = "exact" | "estimate" | "lower_bound";
 export type Limit = number;
 export type Offset = number;
 export type TotalUsers = number;
@@ -94,6 +96,10 @@ export type Items1 = EventLogRead[];
 export type Total1 = number;
 export type Limit1 = number;
 export type Offset1 = number;
+export type Items2 = EventLogRead[];
+export type HasMore = boolean;
+export type NextCursor = string | null;
+export type Total2 = number | null;
 
 export interface UserRead {
   id: Id;
@@ -177,6 +183,7 @@ export interface AdminUserUpdate {
 export interface AdminUserListResponse {
   items: Items;
   total: Total;
+  total_kind?: TotalKind;
   limit: Limit;
   offset: Offset;
 }
@@ -232,4 +239,13 @@ export interface EventLogListResponse {
   limit: Limit1;
   offset: Offset1;
 }
+/**
+ * Keyset-paginated response for event logs (cursor mode).
+ */
+export interface EventLogCursorPage {
+  items: Items2;
+  has_more: HasMore;
+  next_cursor?: NextCursor;
+  total?: Total2;
+}
 }
@@ -0,0 +1,38 @@
+#!/bin/bash
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+# Run a backend benchmark from scripts/bench in the backend container. Arguments after the name
+# are passed to the script, e.g.:
+#   npm run bench -- ratelimit-gcra
+#   npm run bench -- password-hashing --rounds 10 12
+
+NAME="$1"
+SCRIPT="scripts/bench/${NAME}.py"
+if [ -z "$NAME" ] || [ ! -f "$SCRIPT" ]; then
+  echo "Usage: npm run bench -- <name> [arguments]"
+  echo "Benchmarks: $(basename -s .py scripts/bench/*.py | tr '\n' ' ')"
+  exit 1
+fi
+shift
+
+# Get backend container using project name
+BACKEND_CONTAINER_NAME="${COMPOSE_PROJECT_NAME:-starterpack}-backend"
+BACKEND_CONTAINER=$(docker container list --filter "name=^${BACKEND_CONTAINER_NAME}$" --format "{{.ID}}" 2>/dev/null)
+# Fallback: try exact name match with docker inspect
+if [ -z "$BACKEND_CONTAINER" ]; then
+  BACKEND_CONTAINER=$(docker inspect --format '{{.Id}}' "$BACKEND_CONTAINER_NAME" 2>/dev/null)
+fi
+
+# Exit if backend container is not running
+if [ -z "$BACKEND_CONTAINER" ]; then
+  echo "Error: Backend container '$BACKEND_CONTAINER_NAME' is not running. Please start the container first."
+  exit 1
+fi
+
+# Copied rather than piped on stdin: process pools started with spawn re-import the script by path.
+# It runs from /app and imports the backend as `src`
+CONTAINER_SCRIPT="/tmp/bench-${NAME}.py"
+docker cp "$SCRIPT" "$BACKEND_CONTAINER:$CONTAINER_SCRIPT" > /dev/null || exit 1
+docker exec -w /app -e PYTHONPATH=/app "$BACKEND_CONTAINER" python "$CONTAINER_SCRIPT" "$@"
+STATUS=$?
+docker exec "$BACKEND_CONTAINER" rm -f "$CONTAINER_SCRIPT"
+exit $STATUS
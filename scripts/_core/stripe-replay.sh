@@ -0,0 +1,21 @@
+#!/bin/bash
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+# Queue Stripe events in the webhook inbox again. Arguments are passed to src/stripe-replay.py, e.g.:
+#   npm run stripe-replay -- --since 2026-10-01
+#   npm run stripe-replay -- --failed
+
+# Get backend container using project name
+BACKEND_CONTAINER_NAME="${COMPOSE_PROJECT_NAME:-starterpack}-backend"
+BACKEND_CONTAINER=$(docker container list --filter "name=^${BACKEND_CONTAINER_NAME}$" --format "{{.ID}}" 2>/dev/null)
+# Fallback: try exact name match with docker inspect
+if [ -z "$BACKEND_CONTAINER" ]; then
+  BACKEND_CONTAINER=$(docker inspect --format '{{.Id}}' "$BACKEND_CONTAINER_NAME" 2>/dev/null)
+fi
+
+# Exit if backend container is not running
+if [ -z "$BACKEND_CONTAINER" ]; then
+  echo "Error: Backend container '$BACKEND_CONTAINER_NAME' is not running. Please start the container first."
+  exit 1
+fi
+
+docker exec "$BACKEND_CONTAINER" python -m src.stripe-replay "$@"
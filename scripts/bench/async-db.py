@@ -0,0 +1,81 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+"""
+Sync vs async database path, on the user lookup done by /users/login and /users/me/token.
+
+The sync path runs each lookup in the threadpool with a psycopg2 session, as a sync `def`
+endpoint does. The async path awaits it on the event loop with an asyncpg session. Both use
+the pool settings of the environment (DB_POOL_SIZE, DB_MAX_OVERFLOW). Nothing is written.
+
+Usage:
+    npm run bench -- async-db [--requests 5000] [--concurrency 100]
+
+Without Docker, from app/backend: PYTHONPATH=. python ../../scripts/bench/async-db.py
+"""
+
+import argparse
+import asyncio
+import time
+
+from fastapi.concurrency import run_in_threadpool
+
+from src.crud.users import get_user_by_email, get_user_by_email_async
+from src.helpers.db import AsyncSessionLocal, SessionLocal, async_engine, engine
+
+# No such user: each lookup is one index probe
+EMAIL = "bench-missing-user@example.com"
+
+
+def sync_lookup() -> None:
+    with SessionLocal() as session:
+        get_user_by_email(session, EMAIL)
+
+
+async def async_lookup() -> None:
+    async with AsyncSessionLocal() as session:
+        await get_user_by_email_async(session, EMAIL)
+
+
+async def threadpool_lookup() -> None:
+    await run_in_threadpool(sync_lookup)
+
+
+async def measure(lookup, requests: int, concurrency: int) -> tuple[float, float]:
+    """Run `requests` lookups, `concurrency` at a time. Returns (lookups/s, p99 latency in ms)."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            await lookup()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return requests / elapsed, latencies[int(len(latencies) * 0.99) - 1] * 1000
+
+
+async def main(requests: int, concurrency: int) -> None:
+    paths = {
+        "sync (threadpool, psycopg2)": threadpool_lookup,
+        "async (event loop, asyncpg)": async_lookup,
+    }
+    print(f"{requests} user lookups, {concurrency} concurrent")
+    print(f"  {'path':<30} {'lookups/s':>10} {'p99 ms':>8}")
+    for name, lookup in paths.items():
+        await measure(lookup, min(requests, 500), concurrency)  # Warm-up: fill the connection pool
+        throughput, p99 = await measure(lookup, requests, concurrency)
+        print(f"  {name:<30} {throughput:>10.0f} {p99:>8.1f}")
+    await async_engine.dispose()
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
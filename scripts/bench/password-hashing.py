@@ -0,0 +1,92 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+"""
+Password verification as login runs it: --concurrency verifies at a time through the bcrypt
+process pool, for the legacy HMAC hashes and for bcrypt at each --rounds. Reports logins per
+second and the worst event loop lag meanwhile, then how long one inline checkpw would block
+the loop instead.
+
+Usage:
+    npm run bench -- password-hashing [--rounds 10 12] [--concurrency 16] [--seconds 5]
+
+Without Docker, from app/backend: PYTHONPATH=. python ../../scripts/bench/password-hashing.py
+"""
+
+import argparse
+import asyncio
+import time
+
+import bcrypt
+
+from src.helpers import password_hashing
+from src.helpers.password_hashing import PASSWORD_HASH_WORKERS, PasswordHasher, _pepper, legacy_hash_password
+
+PASSWORD = "correct horse battery staple"
+LAG_INTERVAL = 0.005
+
+
+async def monitor_lag(lags: list[float], stop: asyncio.Event) -> None:
+    """Record how late the event loop wakes up from short sleeps."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(LAG_INTERVAL)
+        lags.append(time.perf_counter() - started - LAG_INTERVAL)
+
+
+async def measure(
+    hasher: PasswordHasher, hashed_password: str, concurrency: int, seconds: float
+) -> tuple[float, float]:
+    """Logins per second and max event loop lag in ms."""
+    logins = 0
+    deadline = time.perf_counter() + seconds
+
+    async def login() -> None:
+        nonlocal logins
+        while time.perf_counter() < deadline:
+            assert await hasher.verify_async(PASSWORD, hashed_password)
+            logins += 1
+            # Legacy hashes are verified inline: give other requests their turn, as a server would
+            await asyncio.sleep(0)
+
+    lags: list[float] = []
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(monitor_lag(lags, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await monitor
+    return logins / elapsed, max(lags, default=0) * 1000
+
+
+async def main(rounds_list: list[int], workers: int, concurrency: int, seconds: float) -> None:
+    hasher = PasswordHasher(workers=workers, max_queue=concurrency)
+    try:
+        print(f"{concurrency} concurrent verifies, pool of {workers} processes, {seconds:.0f}s each")
+        throughput, lag = await measure(hasher, legacy_hash_password(PASSWORD), concurrency, seconds)
+        print(f"  {'legacy HMAC':<16} {throughput:>10.1f} logins/s, max event loop lag {lag:.1f} ms")
+
+        hashes = {}
+        for rounds in rounds_list:
+            password_hashing.PASSWORD_HASH_ROUNDS = rounds
+            hashes[rounds] = await hasher.hash_async(PASSWORD)
+            throughput, lag = await measure(hasher, hashes[rounds], concurrency, seconds)
+            print(f"  {f'bcrypt cost {rounds}':<16} {throughput:>10.1f} logins/s, max event loop lag {lag:.1f} ms")
+    finally:
+        hasher.shutdown()
+
+    print("One inline checkpw, blocking the event loop:")
+    for rounds, hashed_password in hashes.items():
+        started = time.perf_counter()
+        bcrypt.checkpw(_pepper(PASSWORD), hashed_password.encode())
+        print(f"  {f'bcrypt cost {rounds}':<16} {(time.perf_counter() - started) * 1000:>10.0f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 12])
+    parser.add_argument("--workers", type=int, default=PASSWORD_HASH_WORKERS)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.rounds, args.workers, args.concurrency, args.seconds))
@@ -0,0 +1,108 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+"""
+Rate limit backends under several worker processes, as uvicorn runs them: checks per second,
+and hits let through on one key against a quota of --quota (memory enforces it per worker,
+shared and postgres across workers).
+
+The postgres backend needs the rate_limits table, which is created if missing. Keys are
+removed at the end.
+
+Usage:
+    npm run bench -- ratelimit-backends [--workers 1 2 4] [--seconds 3] [--quota 100]
+
+Without Docker, from app/backend: PYTHONPATH=. python ../../scripts/bench/ratelimit-backends.py
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from sqlalchemy import delete
+
+from src.helpers.db import engine
+from src.helpers.ratelimit import (
+    RATE_LIMIT_MAX_KEYS,
+    MemoryBackend,
+    PostgresBackend,
+    RateLimitBackend,
+    SharedMemoryBackend,
+)
+from src.models.rate_limit import RateLimitBase
+
+DAY_SECONDS = 24 * 60 * 60
+KEYS = 1000
+
+
+def create_backend(name: str, shared_path: str) -> RateLimitBackend:
+    if name == "memory":
+        return MemoryBackend(RATE_LIMIT_MAX_KEYS)
+    if name == "shared":
+        return SharedMemoryBackend(shared_path)
+    return PostgresBackend()
+
+
+def throughput_worker(name: str, shared_path: str, run: str, seconds: float, queue) -> None:
+    # Connections inherited from the parent must not be used by the forked worker
+    engine.dispose(close=False)
+    backend = create_backend(name, shared_path)
+    checks = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        backend.hit([(f"bench-{run}", f"key-{os.getpid()}-{checks % KEYS}", 1e9, DAY_SECONDS)], True)
+        checks += 1
+    queue.put(checks)
+
+
+def quota_worker(name: str, shared_path: str, run: str, quota: int, queue) -> None:
+    engine.dispose(close=False)
+    backend = create_backend(name, shared_path)
+    allowed = 0
+    for _ in range(quota):
+        if not backend.hit([(f"bench-{run}", "shared-key", quota, DAY_SECONDS)], True)[0].limited:
+            allowed += 1
+    queue.put(allowed)
+
+
+def run_workers(target, workers: int, *args) -> list[int]:
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    processes = [context.Process(target=target, args=(*args, queue)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    results = [queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return results
+
+
+def main(backends: list[str], workers_list: list[int], seconds: float, quota: int) -> None:
+    if "postgres" in backends:
+        RateLimitBase.metadata.create_all(engine, tables=[RateLimitBase.__table__])
+        engine.dispose()
+
+    print(f"{'backend':<10} {'workers':>7} {'checks/s':>10} {'allowed':>8}")
+    with tempfile.TemporaryDirectory(dir="/dev/shm" if os.path.isdir("/dev/shm") else None) as directory:
+        for name in backends:
+            shared_path = os.path.join(directory, f"{name}.sqlite3")
+            for workers in workers_list:
+                run = f"{name}-{workers}-{time.time_ns()}"
+                checks = sum(run_workers(throughput_worker, workers, name, shared_path, run, seconds))
+                allowed = sum(run_workers(quota_worker, workers, name, shared_path, run, quota))
+                print(f"{name:<10} {workers:>7} {checks / seconds:>10.0f} {allowed:>5}/{quota}")
+
+    if "postgres" in backends:
+        with engine.begin() as connection:
+            connection.execute(delete(RateLimitBase).where(RateLimitBase.bucket.startswith("bench-")))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["memory", "shared", "postgres"])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--seconds", type=float, default=3)
+    parser.add_argument("--quota", type=int, default=100)
+    args = parser.parse_args()
+    main(args.backends, args.workers, args.seconds, args.quota)
@@ -0,0 +1,72 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+"""
+Cost of one rate limit check as the quota grows, on one key with a daily window. With GCRA
+each key holds a single TAT, so the cost should stay flat whatever the quota.
+
+Usage:
+    npm run bench -- ratelimit-gcra [--quotas 10 1000 100000] [--backends memory shared]
+
+Without Docker, from app/backend: PYTHONPATH=. python ../../scripts/bench/ratelimit-gcra.py
+"""
+
+import argparse
+import os
+import tempfile
+import timeit
+
+from sqlalchemy import delete
+
+from src.helpers.db import engine
+from src.helpers.ratelimit import (
+    RATE_LIMIT_MAX_KEYS,
+    MemoryBackend,
+    PostgresBackend,
+    RateLimitBackend,
+    SharedMemoryBackend,
+)
+from src.models.rate_limit import RateLimitBase
+
+DAY_SECONDS = 24 * 60 * 60
+
+
+def create_backend(name: str, directory: str) -> RateLimitBackend:
+    if name == "memory":
+        return MemoryBackend(RATE_LIMIT_MAX_KEYS)
+    if name == "shared":
+        return SharedMemoryBackend(os.path.join(directory, "ratelimit.sqlite3"))
+    RateLimitBase.metadata.create_all(engine, tables=[RateLimitBase.__table__])
+    return PostgresBackend()
+
+
+def check_us(backend: RateLimitBackend, quota: int, number: int, repeat: int) -> float:
+    """Best time in µs of one check, on a key that has already spent up to half of its quota."""
+    bucket = f"bench-gcra-{quota}"
+    for _ in range(max(min(quota // 2, 10000), 1)):
+        backend.hit([(bucket, "key", quota, DAY_SECONDS)], True)
+    # Plain checks do not consume, so the key stays below its quota however many runs
+    timer = timeit.Timer(lambda: backend.hit([(bucket, "key", quota, DAY_SECONDS)], False))
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+
+def main(backends: list[str], quotas: list[int], number: int, repeat: int) -> None:
+    print(f"{'quota':>8}" + "".join(f" {name:>10}" for name in backends))
+    with tempfile.TemporaryDirectory(dir="/dev/shm" if os.path.isdir("/dev/shm") else None) as directory:
+        instances = {name: create_backend(name, directory) for name in backends}
+        for quota in quotas:
+            timings = [check_us(instances[name], quota, number, repeat) for name in backends]
+            print(f"{quota:>8}" + "".join(f" {timing:>8.1f}us" for timing in timings))
+
+    if "postgres" in backends:
+        with engine.begin() as connection:
+            connection.execute(delete(RateLimitBase).where(RateLimitBase.bucket.startswith("bench-gcra-")))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["memory", "shared"], choices=["memory", "shared", "postgres"])
+    parser.add_argument("--quotas", type=int, nargs="+", default=[10, 1000, 100000])
+    parser.add_argument("--number", type=int, default=2000, help="checks per timing")
+    parser.add_argument("--repeat", type=int, default=5, help="timings, the best one is kept")
+    args = parser.parse_args()
+    main(args.backends, args.quotas, args.number, args.repeat)
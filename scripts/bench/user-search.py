@@ -0,0 +1,99 @@
+# ⚠️ STARTERPACK CORE — DO NOT MODIFY. This file is managed by the starterpack.
+
+"""
+Admin user search at scale: the former three-column ILIKE scan vs the trigram-indexed search
+of GET /admin/users (total count and first page, plus the exact email fast path).
+
+Generated users are inserted in a transaction rolled back at the end, so the database is left
+as it was. Writes to users wait for the benchmark meanwhile: run it on a development database.
+
+Usage:
+    npm run bench -- user-search [--users 1000000] [--runs 5]
+
+Without Docker, from app/backend: PYTHONPATH=. python ../../scripts/bench/user-search.py
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.controllers.admin import EMAIL_PATTERN
+from src.crud.users import get_user_by_exact_email_async, user_search_filter, user_search_rank
+from src.helpers.db import async_engine
+from src.models.user import UserBase
+
+PAGE_SIZE = 50
+TERMS = ["bench-user-123456@example.com", "bench-user-4242", "martin", "jo", "no-such-user"]
+
+_INSERT_USERS = text("""
+    INSERT INTO users (email, first_name, last_name, hashed_password, email_confirmed, is_admin,
+                       newsletter_on, is_premium, created_at, last_seen_at)
+    SELECT 'bench-user-' || i || '@example.com',
+           (ARRAY['John', 'Jane', 'Alice', 'Bob', 'Marie', 'Pierre', 'Jose', 'Anna'])[1 + i % 8],
+           (ARRAY['Smith', 'Martin', 'Dupont', 'Garcia', 'Muller', 'Rossi', 'Jones', 'Petit'])[1 + (i / 8) % 8],
+           'x', true, false, true, i % 10 = 0, now() - i * interval '1 minute', now()
+    FROM generate_series(1, :users) AS i
+""")
+
+
+async def former_search(session: AsyncSession, term: str) -> None:
+    """GET /admin/users?search= before the trigram index."""
+    pattern = f"%{term}%"
+    query = select(UserBase).filter(
+        UserBase.email.ilike(pattern) | UserBase.first_name.ilike(pattern) | UserBase.last_name.ilike(pattern)
+    )
+    await session.scalar(select(func.count()).select_from(query.subquery()))
+    (await session.scalars(query.order_by(UserBase.created_at.desc()).limit(PAGE_SIZE))).all()
+
+
+async def indexed_search(session: AsyncSession, term: str) -> None:
+    """GET /admin/users?search= now (see controllers.admin.list_users)."""
+    query = select(UserBase)
+    if EMAIL_PATTERN.match(term) and await get_user_by_exact_email_async(session, query, term):
+        return
+    query = query.filter(user_search_filter(term))
+    await session.scalar(select(func.count()).select_from(query.subquery()))
+    order_by = [user_search_rank(term).desc(), UserBase.created_at.desc()]
+    (await session.scalars(query.order_by(*order_by).limit(PAGE_SIZE))).all()
+
+
+async def median_ms(search, session: AsyncSession, term: str, runs: int) -> float:
+    durations = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        await search(session, term)
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations) * 1000
+
+
+async def main(users: int, runs: int) -> None:
+    async with async_engine.connect() as connection:
+        transaction = await connection.begin()
+        try:
+            started = time.perf_counter()
+            await connection.execute(_INSERT_USERS, {"users": users})
+            await connection.execute(text("ANALYZE users"))
+            print(f"Inserted {users} users in {time.perf_counter() - started:.0f}s (rolled back at the end)")
+
+            session = AsyncSession(bind=connection)
+            print(f"Median of {runs} runs, count and first page of {PAGE_SIZE}:")
+            print(f"  {'term':<32} {'former ms':>10} {'indexed ms':>11}")
+            for term in TERMS:
+                former = await median_ms(former_search, session, term, runs)
+                indexed = await median_ms(indexed_search, session, term, runs)
+                print(f"  {term:<32} {former:>10.1f} {indexed:>11.1f}")
+        finally:
+            await transaction.rollback()
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.runs))